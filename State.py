@@ -1,8 +1,10 @@
+import os
 from pathlib import Path
 
 import utils as U
 
 BASE_DIR = Path(__file__).resolve().parent
+CONFIG_ENV = 'WECHATBOT_CONFIG' # 指向另一份全局配置（基准测试用），默认 ./config/config.yaml
 from Wcf import Wcf
 
 
@@ -10,10 +12,14 @@ class State:
     def __init__(self):
         # 通用全局变量
         self.base_path = BASE_DIR
-        self.config = U.load_yaml(self.base_path / 'config' / 'config.yaml')
+        self.config = U.load_yaml(os.environ.get(CONFIG_ENV) or self.base_path / 'config' / 'config.yaml')
         self.group = self.config.get('group', {}) # 用户分类，比如 owner, commander
+        self._role_cache = {} # 组名 -> (列表长度, 成员集合)，插件改动 group 后调用 invalidate_roles()
         self.plugin_usable = self._init_plugin_usable()
         self.stop_requested = False
+        # 注入点：Wcf(**wcf_options)（例如模拟器后端和配置字典），插件名 -> 配置字典（代替插件自己的 config.yaml）
+        self.wcf_options = {}
+        self.plugin_configs = {}
 
 
     def _init_plugin_usable(self):
@@ -38,8 +44,41 @@ class State:
 
     def _init_wcf(self):
         # Wcf 相关，涉及到 UI 操作
-        self.wcf = Wcf()
+        self.wcf = Wcf(**self.wcf_options)
         self.friend_names = self.wcf.get_friends()
+        self.wcf.subscribe_contacts(self._on_contacts_changed)
+        # 权限组里的人在群里说话总要打开看；组成员会被插件动态增删，所以每次现查
+        self.wcf.set_triage(hook=self._triage_by_group)
+
+    def plugin_config(self, name, path):
+        if name in self.plugin_configs:
+            return self.plugin_configs[name]
+        return U.load_yaml(path)
+
+    def role_members(self, role):
+        members = self.group.get(role)
+        if not isinstance(members, list):
+            return frozenset()
+        cached = self._role_cache.get(role)
+        # 增删成员会改变长度，顺手校验一下，漏调 invalidate_roles() 也不会一直用旧集合
+        if cached is None or cached[0] != len(members):
+            # owner 只取第一个用户
+            cached = (len(members), frozenset(members[:1] if role == 'owner' else members))
+            self._role_cache[role] = cached
+        return cached[1]
+
+    def roles_of(self, name):
+        return [role for role in self.group if name in self.role_members(role)]
+
+    def invalidate_roles(self):
+        self._role_cache.clear()
+
+    def _triage_by_group(self, preview):
+        return True if self.roles_of(preview.sender) else None
+
+    def _on_contacts_changed(self, added, removed):
+        # 整体换成新列表，正在遍历旧列表的插件不受影响
+        self.friend_names = list(self.wcf.contacts.names)
 
 
     def print_state(self):
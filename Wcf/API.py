@@ -1,4 +1,3 @@
-from openai import OpenAI
 import sys
 from pathlib import Path
 import utils as U
@@ -11,16 +10,29 @@ class API:
         self.api_key = None
         self.url = None
         self.model = None
+        self.request_timeout = None
         self.init()
 
     def init(self):
         self.api_key = self.config['provider']['api_key']
         self.url = self._normalize_base_url(self.config['provider']['url'])
         self.model = self.config['provider']['model']
+        # 没有超时的话，网络卡住时润色线程会一直挂着
+        try:
+            self.request_timeout = float(self.config.get('request_timeout', 10))
+        except Exception:
+            self.request_timeout = 10.0
+
+        try:
+            from openai import OpenAI
+        except ImportError:
+            print('未安装 openai，模型请求不可用')
+            return
 
         self.client = OpenAI(
             api_key=self.api_key,
             base_url=self.url,
+            timeout=self.request_timeout,
         )
 
     def _normalize_base_url(self, url):
@@ -0,0 +1,73 @@
+import json
+import os
+import time
+import traceback
+from pathlib import Path
+from threading import Lock
+
+
+class ContactBook:
+    """
+    好友列表的本地快照：启动时直接从磁盘读上一次的结果，后台刷新完再用 update() 换成新列表。
+    列表有增删时通知订阅者 callback(added, removed)，让插件里按好友建立的结构跟着同步。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.names = []
+        self.updated_at = None
+        self._lock = Lock()
+        self._listeners = []
+
+    def load(self) -> bool:
+        if not self.path.exists():
+            return False
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+            names = [str(x) for x in data.get('names', []) if x]
+        except Exception as e:
+            print(f'[ContactBook] 读取好友快照失败：{e}')
+            return False
+        if not names:
+            return False
+        with self._lock:
+            self.names = names
+            self.updated_at = data.get('updated_at')
+        return True
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        with tmp.open('w', encoding='utf-8') as f:
+            json.dump({'updated_at': self.updated_at, 'names': self.names}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def subscribe(self, callback) -> None:
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def update(self, names) -> tuple[list, list]:
+        names = list(dict.fromkeys(n for n in names if n))
+        with self._lock:
+            old = set(self.names)
+            new = set(names)
+            added = [n for n in names if n not in old]
+            removed = [n for n in self.names if n not in new]
+            self.names = names
+            self.updated_at = time.time()
+        try:
+            self.save()
+        except Exception as e:
+            print(f'[ContactBook] 保存好友快照失败：{e}')
+        if added or removed:
+            print(f'[ContactBook] 好友列表变化：新增 {len(added)} 人，减少 {len(removed)} 人')
+            for callback in list(self._listeners):
+                try:
+                    callback(added, removed)
+                except Exception:
+                    traceback.print_exc()
+        return added, removed
@@ -0,0 +1,153 @@
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import Lock
+
+try:
+    from .Metrics import Metrics
+except ImportError:
+    from Metrics import Metrics
+
+
+class TextDecorator:
+    """
+    在 UI 线程之外润色文本。
+
+    - 润色请求在线程池里跑，调用方最多等 deadline 秒，超时或出错直接返回原文，UI 线程永远不等网络；
+    - 经常发送的固定文本（“重置成功”、帮助文档等）是“热文本”：第一次发送后在后台预先生成 variants 条改写，
+      之后发送时取走一条并在后台补货，每条改写只用一次；登记热文本本身不调用模型；
+    - 补货跑在单独的 refill_workers 个线程上，不占用前台润色的线程，发送不会因为后台补货而等到超时；
+    - 热文本按 LRU 保留 cache_size 条；同一文本发送次数达到 hot_threshold 时自动变成热文本。
+    """
+
+    def __init__(
+            self,
+            generate,
+            *,
+            workers: int = 2,
+            refill_workers: int = 1,
+            deadline: float = 3.0,
+            cache_size: int = 32,
+            variants: int = 3,
+            hot_threshold: int = 3,
+            metrics: Metrics | None = None,
+    ):
+        self.generate = generate  # text -> str | None，阻塞的网络调用
+        self.deadline = float(deadline)
+        self.cache_size = int(cache_size)
+        self.variants = int(variants)
+        self.hot_threshold = int(hot_threshold)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='Decorator')
+        self.refill_pool = ThreadPoolExecutor(max_workers=max(1, int(refill_workers)), thread_name_prefix='DecoratorRefill')
+        self._lock = Lock()
+        self._cache = OrderedDict()  # 热文本 -> deque[改写]
+        self._send_cnt = OrderedDict()  # 文本 -> 发送次数，只用来发现热文本
+        self._refilling = set()
+
+    def add_hot_text(self, text: str) -> None:
+        # 只登记，第一次真正发送时才开始补货：没用到的热文本不花模型调用
+        if not text:
+            return
+        with self._lock:
+            self._touch(text)
+
+    def decorate(self, text: str) -> str:
+        if not text:
+            return text
+        with self._lock:
+            variant = self._take(text)
+            became_hot = self._count_send(text)
+        if became_hot or text in self._cache:
+            self._refill(text)
+        if variant is not None:
+            self.metrics.incr('decorate.cache_hit')
+            return variant
+
+        self.metrics.incr('decorate.cache_miss')
+        start = time.perf_counter()
+        future = self.pool.submit(self.generate, text)
+        try:
+            res = future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            self.metrics.incr('decorate.timeout')
+            print(f'润色超过 {self.deadline}s，直接发送原文')
+            return text
+        except Exception as e:
+            print(f'润色文本时报错：{e}')
+            return text
+        finally:
+            self.metrics.observe('decorate.wait', time.perf_counter() - start)
+        return res or text
+
+    def _touch(self, text):
+        # 调用时已持有 self._lock
+        if text in self._cache:
+            self._cache.move_to_end(text)
+            return
+        self._cache[text] = deque(maxlen=self.variants)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _take(self, text):
+        variants = self._cache.get(text)
+        if not variants:
+            return None
+        self._cache.move_to_end(text)
+        return variants.popleft()
+
+    def _count_send(self, text) -> bool:
+        cnt = self._send_cnt.pop(text, 0) + 1
+        self._send_cnt[text] = cnt
+        while len(self._send_cnt) > self.cache_size * 8:
+            self._send_cnt.popitem(last=False)
+        if cnt >= self.hot_threshold and text not in self._cache:
+            self._touch(text)
+            return True
+        return False
+
+    def _refill(self, text):
+        with self._lock:
+            if text in self._refilling or text not in self._cache:
+                return
+            self._refilling.add(text)
+        self.refill_pool.submit(self._refill_job, text)
+
+    def _refill_job(self, text):
+        try:
+            while True:
+                with self._lock:
+                    variants = self._cache.get(text)
+                    if variants is None or len(variants) >= self.variants:
+                        return
+                res = self.generate(text)
+                if not res:
+                    return
+                with self._lock:
+                    variants = self._cache.get(text)
+                    if variants is None:
+                        return
+                    variants.append(res)
+        except Exception as e:
+            print(f'后台润色 {text[:10]} 时报错：{e}')
+        finally:
+            with self._lock:
+                self._refilling.discard(text)
+
+
+if __name__ == '__main__':
+    import random
+
+    def slow_generate(text):
+        time.sleep(random.uniform(0.05, 0.4))
+        return f'{text}~{random.randint(0, 999)}'
+
+    decorator = TextDecorator(slow_generate, deadline=0.2, variants=3)
+    decorator.add_hot_text('重置成功')
+    decorator.decorate('重置成功')  # 第一次发送开始补货
+    time.sleep(1.0)
+    for text in ['重置成功', '重置成功', '模型无效', '模型无效', '模型无效', '重置成功']:
+        start = time.perf_counter()
+        res = decorator.decorate(text)
+        print(f'{text} -> {res}  ({(time.perf_counter() - start) * 1000:.1f}ms)')
+    print(decorator.metrics.report())
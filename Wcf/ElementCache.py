@@ -0,0 +1,61 @@
+from threading import Lock
+
+try:
+    from .Metrics import Metrics
+except ImportError:
+    from Metrics import Metrics
+
+
+class ElementCache:
+    """
+    已解析控件（wrapper）的缓存：窗口、会话列表、消息列表、标题栏这些热点控件只在第一次用到、
+    或者失效之后才重新在 UIA 树里查找。
+
+    - call(key, resolve, fn)：用缓存的控件执行 fn，出错时认为控件已失效，重新解析后再试一次；
+    - check_layout(layout)：窗口位置 / 大小变化（重新布局）时整体失效；
+    - 命中、未命中、失效分别计入 elem.hit / elem.miss / elem.stale。
+    """
+
+    def __init__(self, metrics: Metrics | None = None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._elements = {}
+        self._layout = None
+        self._lock = Lock()
+
+    def get(self, key, resolve):
+        with self._lock:
+            elem = self._elements.get(key)
+        if elem is not None:
+            self.metrics.incr('elem.hit')
+            return elem
+        self.metrics.incr('elem.miss')
+        elem = resolve()
+        with self._lock:
+            self._elements[key] = elem
+        return elem
+
+    def call(self, key, resolve, fn):
+        elem = self.get(key, resolve)
+        try:
+            return fn(elem)
+        except Exception:
+            self.metrics.incr('elem.stale')
+            self.invalidate(key)
+        return fn(self.get(key, resolve))
+
+    def invalidate(self, key=None) -> None:
+        with self._lock:
+            if key is None:
+                self._elements.clear()
+            else:
+                self._elements.pop(key, None)
+
+    def check_layout(self, layout) -> bool:
+        """layout 是窗口矩形之类可比较的值，变化时清空缓存并返回 True"""
+        with self._lock:
+            changed = self._layout is not None and layout != self._layout
+            self._layout = layout
+        if changed:
+            self.metrics.incr('elem.relayout')
+            self.invalidate()
+        return changed
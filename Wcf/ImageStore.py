@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from .Metrics import Metrics
+    from .WxMsg import ContentRef
+except ImportError:
+    from Metrics import Metrics
+    from WxMsg import ContentRef
+
+
+MIME = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+}
+
+
+class ImageRef(ContentRef):
+    """
+    图片消息的内容引用：UI 线程只交出剪贴板原始字节，哈希、缩放、编码都在 ImageStore 的线程池里完成。
+    key 是原始字节的 sha1，第一次访问时等待哈希完成；resolve() 等待编码完成后从磁盘读出 data URL。
+    消息签名用 ident（入库时当场算好的长度 + crc32 / 文件状态），UI 线程上算 hash_id 不用等线程池。
+    """
+
+    __slots__ = ('store', '_ident', '_key_future', '_done_future')
+
+    def __init__(self, store, ident, key_future: Future, done_future: Future):
+        self.store = store
+        self._ident = ident
+        self._key_future = key_future
+        self._done_future = done_future
+        self.loader = self._load
+
+    @property
+    def ident(self):
+        return self._ident
+
+    @property
+    def key(self) -> str:
+        return self._key_future.result()
+
+    @property
+    def size(self) -> int:
+        path = self.path()
+        return path.stat().st_size if path is not None else 0
+
+    def ready(self) -> bool:
+        return self._done_future.done()
+
+    def path(self, timeout=None) -> Path | None:
+        """模型输入用的图片文件（已缩放、已编码），失败时返回 None"""
+        try:
+            return self._done_future.result(timeout=timeout)
+        except Exception as e:
+            print(f'[ImageStore] 图片处理失败：{e}')
+            return None
+
+    def __repr__(self):
+        # 打印不能等后台处理：哈希、编码没完成的部分显示 pending
+        f = self._key_future
+        key = f.result()[:12] if f.done() and f.exception() is None else 'pending'
+        f = self._done_future
+        if not f.done():
+            size = 'pending'
+        elif f.exception() is not None:
+            size = 'failed'
+        else:
+            size = f.result().stat().st_size
+        return f'<ImageRef {key} size={size}>'
+
+    def _load(self):
+        path = self.path()
+        if path is None:
+            return None
+        b64 = base64.b64encode(path.read_bytes()).decode('ascii')
+        return f'data:{MIME[self.store.fmt]};base64,{b64}'
+
+
+class ImageStore:
+    """
+    按内容寻址的图片磁盘仓库：<root>/<sha1 前两位>/<sha1>.<fmt>。
+    同一张图片（原始字节相同）只编码、只落盘一次。
+    """
+
+    def __init__(self, root, *, workers: int = 2, max_side: int = 1024, fmt: str = 'webp', metrics: Metrics | None = None):
+        self.root = Path(root)
+        self.max_side = int(max_side)
+        self.fmt = fmt.lower() if fmt and fmt.lower() in MIME else 'png'
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='ImageStore')
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def ingest(self, raw) -> ImageRef:
+        """
+        raw 是 UI 线程从剪贴板拿到的原始数据：('dib', bytes) 或 ('file', path)，
+        这里只提交任务，立刻返回引用
+        """
+        key_future = Future()
+        done_future = Future()
+        self.pool.submit(self._process, raw, key_future, done_future)
+        return ImageRef(self, self._ident(raw), key_future, done_future)
+
+    @staticmethod
+    def _ident(raw):
+        # 比 sha1 便宜得多，只用来判断 UI 上读到的两条图片消息是不是同一张
+        kind, data = raw
+        if kind == 'file':
+            try:
+                st = os.stat(data)
+                return ('file', str(data), st.st_size, st.st_mtime_ns)
+            except OSError:
+                return ('file', str(data))
+        return (kind, len(data), zlib.crc32(data))
+
+    def path_of(self, key: str) -> Path:
+        return self.root / key[:2] / f'{key}.{self.fmt}'
+
+    def _process(self, raw, key_future: Future, done_future: Future):
+        try:
+            kind, data = raw
+            if kind == 'file':
+                data = Path(data).read_bytes()
+            start = time.perf_counter()
+            key = hashlib.sha1(data).hexdigest()
+            self.metrics.observe('image.hash', time.perf_counter() - start)
+            key_future.set_result(key)
+        except Exception as e:
+            key_future.set_exception(e)
+            done_future.set_exception(e)
+            return
+
+        try:
+            path = self.path_of(key)
+            if path.exists():
+                self.metrics.incr('image.dedup')
+            else:
+                start = time.perf_counter()
+                self._encode(kind, data, path)
+                self.metrics.observe('image.encode', time.perf_counter() - start)
+            done_future.set_result(path)
+        except Exception as e:
+            done_future.set_exception(e)
+
+    def _encode(self, kind, data: bytes, path: Path):
+        from PIL import Image, BmpImagePlugin
+
+        if kind == 'dib':
+            im = BmpImagePlugin.DibImageFile(io.BytesIO(data))
+        else:
+            im = Image.open(io.BytesIO(data))
+        im.load()
+        if max(im.size) > self.max_side:
+            im.thumbnail((self.max_side, self.max_side))
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGBA' if 'A' in im.getbands() else 'RGB')
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 同一张图可能被两个线程同时处理，各写各的临时文件，最后原子替换
+        tmp = path.with_suffix(path.suffix + f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        im.save(tmp, format=self.fmt.upper())
+        os.replace(tmp, path)
+
+
+if __name__ == '__main__':
+    import tempfile
+    from PIL import Image
+
+    # 模拟剪贴板：一张 3000x2000 的图片，对比 UI 线程上的耗时
+    buf = io.BytesIO()
+    Image.effect_noise((3000, 2000), 64).convert('RGB').save(buf, format='BMP')
+    dib = buf.getvalue()[14:]
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ImageStore(root)
+        start = time.perf_counter()
+        refs = [store.ingest(('dib', dib)) for _ in range(5)]
+        print(f'UI 线程耗时：{(time.perf_counter() - start) * 1000 / len(refs):.2f}ms/张，刚入库时 {refs[-1]!r}')
+        print(f'ident 全部一致：{len({r.ident for r in refs}) == 1}')
+        start = time.perf_counter()
+        print(f'key: {refs[0].key}，全部一致：{len({r.key for r in refs}) == 1}')
+        data_url = refs[0].resolve()
+        print(f'后台处理完成：{(time.perf_counter() - start) * 1000:.1f}ms，data URL 长度 {len(data_url)}')
+        print(store.metrics.report())
@@ -0,0 +1,82 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+
+
+class Metrics:
+    """
+    线程安全的轻量指标：计数器 + 计时器（次数 / 总耗时 / 最大值 / 最近若干次样本）。
+    名字用点号分组，例如 ui.wait.send_text、ui.exec.send_text。
+    """
+
+    def __init__(self, sample_len: int = 1024):
+        self._lock = Lock()
+        self.sample_len = sample_len
+        self.start_time = time.time()
+        self.counters = {}  # name -> int
+        self.timers = {}  # name -> [count, total, max, deque(samples)]
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            t = self.timers.get(name)
+            if t is None:
+                t = self.timers[name] = [0, 0.0, 0.0, deque(maxlen=self.sample_len)]
+            t[0] += 1
+            t[1] += seconds
+            t[2] = max(t[2], seconds)
+            t[3].append(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def count(self, name: str) -> int:
+        with self._lock:
+            return self.counters.get(name, 0)
+
+    def per_hour(self, name: str) -> float:
+        hours = max(1e-9, (time.time() - self.start_time) / 3600)
+        return self.count(name) / hours
+
+    def percentile(self, name: str, q: float) -> float:
+        """最近 sample_len 次样本的分位数（秒），没有样本时返回 0"""
+        with self._lock:
+            t = self.timers.get(name)
+            samples = sorted(t[3]) if t else []
+        if not samples:
+            return 0.0
+        idx = min(len(samples) - 1, int(q * len(samples)))
+        return samples[idx]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'uptime': time.time() - self.start_time,
+                'counters': dict(self.counters),
+                'timers': {
+                    name: {'count': t[0], 'total': t[1], 'avg': t[1] / t[0] if t[0] else 0.0, 'max': t[2]}
+                    for name, t in self.timers.items()
+                },
+            }
+
+    def report(self) -> str:
+        snap = self.snapshot()
+        lines = [f'运行时长：{snap["uptime"] / 60:.1f} 分钟']
+        for name in sorted(snap['counters']):
+            lines.append(f'{name}: {snap["counters"][name]}')
+        for name in sorted(snap['timers']):
+            t = snap['timers'][name]
+            lines.append(
+                f'{name}: n={t["count"]} avg={t["avg"] * 1000:.1f}ms '
+                f'p95={self.percentile(name, 0.95) * 1000:.1f}ms max={t["max"] * 1000:.1f}ms'
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,143 @@
+from collections import OrderedDict, deque
+from threading import Lock
+
+
+class ChatHistory:
+    """一个会话最近 capacity 条消息：定长 deque，追加时自动淘汰最旧的；新消息靠 align 和界面对齐，不逐条查重"""
+
+    __slots__ = ('msgs',)
+
+    def __init__(self, capacity: int):
+        self.msgs = deque(maxlen=max(1, int(capacity)))
+
+    def append(self, msg) -> None:
+        self.msgs.append(msg)
+
+    def latest(self):
+        return self.msgs[-1] if self.msgs else None
+
+    def align(self, window, expected=None):
+        '''
+        window 是从界面上按顺序读到的消息，返回其中第一条新消息的下标；找不到缓存里的消息时返回 None。
+        用缓存末尾和 window 的最长重叠来定位，而不是逐条查重，所以连续几条一模一样的消息不会被合并掉；
+        重叠一样长时，选新消息条数最接近 expected（未读数）的位置。
+        '''
+        cached = list(self.msgs)
+        best = None  # (重叠长度, -与 expected 的差, 下标)
+        for j in range(len(window), 0, -1):
+            k = 0
+            while k < len(cached) and k < j and window[j - 1 - k] == cached[-1 - k]:
+                k += 1
+            if not k:
+                continue
+            miss = abs(len(window) - j - expected) if expected is not None else 0
+            cand = (k, -miss, j)
+            if best is None or cand[:2] > best[:2]:
+                best = cand
+        return best[2] if best is not None else None
+
+    def __len__(self) -> int:
+        return len(self.msgs)
+
+    def __iter__(self):
+        return iter(self.msgs)
+
+
+class MsgCache:
+    """
+    name -> ChatHistory，按最近使用保留最多 max_chats 个会话，避免见过的每个会话都常驻内存。
+    """
+
+    def __init__(self, memory_len: int, max_chats: int = 200):
+        self.memory_len = int(memory_len)
+        self.max_chats = max(1, int(max_chats))
+        self._chats = OrderedDict()
+        self._seqs = {}  # name -> 下一个会话内序号；会话被淘汰后序号也不回退
+        self._lock = Lock()
+
+    def history(self, name) -> ChatHistory:
+        with self._lock:
+            return self._history(name)
+
+    def _history(self, name) -> ChatHistory:
+        h = self._chats.get(name)
+        if h is None:
+            h = self._chats[name] = ChatHistory(self.memory_len)
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(name)
+        return h
+
+    def append(self, name, msg) -> int:
+        '''追加一条消息并分配会话内序号（从 1 开始递增），返回序号'''
+        with self._lock:
+            seq = self._seqs.get(name, 0) + 1
+            self._seqs[name] = seq
+            msg.seq = seq
+            self._history(name).append(msg)
+        return seq
+
+    def align(self, name, window, expected=None):
+        '''见 ChatHistory.align；这个会话还没有缓存时返回 None'''
+        with self._lock:
+            h = self._chats.get(name)
+            return h.align(window, expected) if h is not None and len(h) else None
+
+    def latest(self, name):
+        with self._lock:
+            h = self._chats.get(name)
+            return h.latest() if h is not None else None
+
+    def messages(self, name) -> list:
+        with self._lock:
+            h = self._chats.get(name)
+            return list(h) if h is not None else []
+
+    def __contains__(self, name) -> bool:
+        return name in self._chats
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    try:
+        from .WxMsg import WxMsg
+    except ImportError:
+        from WxMsg import WxMsg
+
+    def old_way(msgs, names, memory_len):
+        cache = {}
+        for name, msg in zip(names, msgs):
+            lst = cache.setdefault(name, [])
+            if msg not in lst:
+                lst.append(msg)
+            while len(lst) > memory_len:
+                lst.pop(0)
+
+    def new_way(msgs, names, memory_len, max_chats):
+        # 查重交给读取时的 align，缓存只管追加
+        cache = MsgCache(memory_len, max_chats)
+        for name, msg in zip(names, msgs):
+            cache.append(name, msg)
+
+    n = 20000
+    random.seed(0)
+    msgs = [WxMsg(type=0, sender=f'u{i % 50}', content=f'消息{i}') for i in range(n)]
+    for m in msgs:
+        m.hash_id  # 只比较缓存本身的开销
+    print(f'{"memory_len":>10} {"chats":>6} {"旧 list (us/条)":>16} {"新 deque (us/条)":>16}')
+    for memory_len in (10, 100, 1000):
+        for chat_cnt in (10, 1000):
+            names = [f'chat{random.randrange(chat_cnt)}' for _ in range(n)]
+            start = time.perf_counter()
+            old_way(msgs, names, memory_len)
+            old = (time.perf_counter() - start) / n * 1e6
+            start = time.perf_counter()
+            new_way(msgs, names, memory_len, 200)
+            new = (time.perf_counter() - start) / n * 1e6
+            print(f'{memory_len:>10} {chat_cnt:>6} {old:>16.2f} {new:>16.2f}')
@@ -0,0 +1,220 @@
+import time
+from collections import OrderedDict
+
+try:
+    from .Metrics import Metrics
+    from .utils import clean_name
+except ImportError:
+    from Metrics import Metrics
+    from utils import clean_name
+
+
+class Navigator:
+    """
+    会话切换引擎：用最少的 UI 操作打开目标会话。
+
+    ops 提供 UI 原语（Wcf 里是 WcfNavOps，基准测试里是假 UI 树）：
+      rows() -> int            读取会话列表前若干行，返回行数
+      row_text(i) -> str       第 i 行的原始文字
+      activate_row(i)          直接激活第 i 行（默认不走拟人鼠标轨迹）
+      search(name) -> bool     用快捷键打开搜索并进入 name 的会话
+
+    策略：
+      1) 位置索引：上次扫描 / 切换时记下每个会话所在行，先只核对那一行；
+      2) 最近搜索过、且不在会话列表前几行的名字，直接走搜索，不再逐行比对；
+      3) 否则逐行比对，找不到再搜索。
+    top_rows 是 ops.rows() 读得到的行数（Wcf 里是 listen_cnt），位置索引只记这几行；
+    search_cache_size 是最近搜索过的名字最多记多少个。
+    """
+
+    def __init__(self, ops, *, top_rows: int = 5, search_cache_size: int = 64, metrics: Metrics | None = None):
+        self.ops = ops
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.row_index = {}  # 会话名 -> 行号
+        self.top_rows = max(1, int(top_rows))
+        self.search_cache_size = int(search_cache_size)
+        self.recent_search = OrderedDict()  # 最近只能通过搜索打开的会话名
+
+    def index_rows(self, texts) -> None:
+        """用扫描会话列表得到的原始行文字刷新位置索引"""
+        self.row_index = {clean_name(t): i for i, t in enumerate(texts)}
+        for name in self.row_index:
+            self.recent_search.pop(name, None)
+
+    def moved_to_top(self, name: str) -> None:
+        '''给 name 发完消息后它会排到会话列表第一行，其余行相应下移'''
+        old = self.row_index.get(name)
+        for k, v in list(self.row_index.items()):
+            if old is None or v < old:
+                if v + 1 >= self.top_rows:
+                    del self.row_index[k]
+                else:
+                    self.row_index[k] = v + 1
+        self.row_index[name] = 0
+        self.recent_search.pop(name, None)
+
+    def switch(self, name: str) -> str:
+        """返回这次切换用的方式：index / row / search / miss"""
+        start = time.perf_counter()
+        how = self._switch(name)
+        self.metrics.observe('nav.switch', time.perf_counter() - start)
+        self.metrics.incr(f'nav.by_{how}')
+        return how
+
+    def _switch(self, name: str) -> str:
+        if name in self.recent_search and name not in self.row_index:
+            return self._search(name)
+
+        cnt = self.ops.rows()
+        idx = self.row_index.get(name)
+        if idx is not None and idx < cnt and clean_name(self.ops.row_text(idx)) == name:
+            self.ops.activate_row(idx)
+            return 'index'
+
+        texts = []
+        for i in range(cnt):
+            text = self.ops.row_text(i)
+            texts.append(text)
+            if clean_name(text) == name:
+                self.ops.activate_row(i)
+                self.index_rows(texts)
+                return 'row'
+        return self._search(name)
+
+    def _search(self, name: str) -> str:
+        if not self.ops.search(name):
+            return 'miss'
+        self.row_index.pop(name, None)
+        self.recent_search[name] = True
+        self.recent_search.move_to_end(name)
+        while len(self.recent_search) > self.search_cache_size:
+            self.recent_search.popitem(last=False)
+        return 'search'
+
+
+class WcfNavOps:
+    """Navigator 在微信上的 UI 原语，键盘和剪贴板都经过 Wcf 的 UI 后端"""
+
+    SEARCH_RESULT = "@str:IDS_FAV_SEARCH_RESULT:3780"
+
+    def __init__(self, wcf):
+        self.wcf = wcf
+        self._rows = []
+
+    def rows(self) -> int:
+        self._rows = self.wcf.conv_rows()
+        return len(self._rows)
+
+    def row_text(self, i) -> str:
+        return self._rows[i].window_text()
+
+    def activate_row(self, i) -> None:
+        self._activate(self._rows[i])
+
+    def _activate(self, item) -> None:
+        if self.wcf.nav_mouse_jitter:
+            self.wcf.click(item)
+        else:
+            try:
+                # SelectionItemPattern 直接选中，不动鼠标
+                item.select()
+            except Exception:
+                item.click_input()
+        self.wcf.wait_a_little_while()
+
+    def search(self, name) -> bool:
+        wcf = self.wcf
+        wcf.send_keys("^f")
+        wcf.wait_a_little_while()
+        if wcf.nav_search_paste:
+            wcf.paste_text(name)
+        else:
+            wcf.type_text(name)
+        wcf.wait_a_little_while()
+        result = wcf.win.child_window(title=self.SEARCH_RESULT, control_type="List")
+        first = result.child_window(title=name, control_type="ListItem", found_index=0)
+        if not first.exists(timeout=wcf.eps):
+            wcf.send_keys("{ESC}")
+            return False
+        self._activate(first.wrapper_object())
+        return True
+
+
+if __name__ == '__main__':
+    import random
+
+    # 假 UI 树：统计每次切换的 UI 操作数与模拟耗时（鼠标拟人移动最贵，其次是逐字键入）
+    COST = {'read': 0.002, 'activate': 0.01, 'mouse_click': 0.25, 'key': 0.01, 'type_char': 0.075}
+
+    class FakeUI:
+        def __init__(self, names, visible):
+            self.names = list(names)
+            self.visible = visible
+            self.ui_ops = 0
+            self.ui_time = 0.0
+            self.current = None
+
+        def cost(self, kind, n=1):
+            self.ui_ops += n
+            self.ui_time += COST[kind] * n
+
+        def send(self, name):
+            # 发消息后会话排到第一行
+            self.names.remove(name)
+            self.names.insert(0, name)
+
+        # Navigator 用的原语
+        def rows(self):
+            self.cost('read')
+            return min(self.visible, len(self.names))
+
+        def row_text(self, i):
+            self.cost('read')
+            return self.names[i]
+
+        def activate_row(self, i):
+            self.cost('activate')
+            self.current = self.names[i]
+
+        def search(self, name):
+            self.cost('key')  # ctrl+F
+            self.cost('key')  # 粘贴
+            self.cost('read')
+            self.cost('activate')
+            self.current = name
+            return True
+
+    def legacy_switch(ui, name):
+        # 原 switch_to_sb：逐行比对 + 鼠标点击，找不到就点搜索框、逐字键入、点第一个结果
+        cnt = ui.rows()
+        for i in range(cnt):
+            if ui.row_text(i) == name:
+                ui.cost('mouse_click')
+                ui.current = name
+                return
+        ui.cost('mouse_click')
+        ui.cost('type_char', len(name) + 1)
+        ui.cost('read')
+        ui.cost('mouse_click')
+        ui.current = name
+
+    random.seed(0)
+    names = [f'好友{i:03d}' for i in range(200)]
+    hot = names[:8]
+    trace = [random.choice(hot) if random.random() < 0.8 else random.choice(names) for _ in range(2000)]
+
+    legacy_ui = FakeUI(names, 5)
+    for name in trace:
+        legacy_switch(legacy_ui, name)
+        legacy_ui.send(name)
+
+    nav_ui = FakeUI(names, 5)
+    nav = Navigator(nav_ui, top_rows=5)
+    for name in trace:
+        nav.switch(name)
+        nav_ui.send(name)
+        nav.moved_to_top(name)
+
+    for label, ui in (('原方式', legacy_ui), ('Navigator', nav_ui)):
+        print(f'{label:>10}: {ui.ui_ops / len(trace):5.2f} 次 UI 操作/次切换，模拟耗时 {ui.ui_time / len(trace) * 1000:7.1f}ms/次切换')
+    print(nav.metrics.report())
@@ -0,0 +1,136 @@
+import re
+import time
+
+try:
+    from .Metrics import Metrics
+except ImportError:
+    from Metrics import Metrics
+
+
+OPEN = 'open'
+SKIP = 'skip'
+DEFER = 'defer'
+
+AT_ME_MARK = '[有人@我]'
+MUTED_PREFIX = re.compile(r'^\[\d+条\]\s*')
+TIME_TEXT = re.compile(r'^(?:\d{1,2}:\d{2}|\d{2,4}/\d{1,2}/\d{1,2}|昨天|前天|星期.)(?:\s+\d{1,2}:\d{2})?$')
+SENDER_SPLIT = re.compile(r'^([^:：\n]{1,40})[:：]\s?(.*)$', re.S)
+
+
+class RowPreview:
+    """会话列表里一行的预览：只有最后一条消息，群聊形如“张三: 内容”"""
+
+    __slots__ = ('name', 'unread', 'sender', 'content', 'at_me')
+
+    def __init__(self, name, unread, sender, content, at_me):
+        self.name = name
+        self.unread = unread
+        self.sender = sender    # 私聊没有发送者前缀，为 None
+        self.content = content
+        self.at_me = at_me
+
+    @property
+    def is_group(self) -> bool:
+        return self.sender is not None
+
+    def __repr__(self):
+        return f'<RowPreview {self.name} unread={self.unread} sender={self.sender!r} at_me={self.at_me} {self.content[:20]!r}>'
+
+
+def parse_preview(name: str, unread: int, texts) -> RowPreview:
+    """texts 是这一行里所有 Text 控件的文字：会话名、时间、预览（顺序不重要）"""
+    at_me = False
+    preview = ''
+    for t in texts:
+        t = (t or '').strip()
+        if not t or t == name or TIME_TEXT.fullmatch(t):
+            continue
+        if AT_ME_MARK in t:
+            at_me = True
+            t = t.replace(AT_ME_MARK, '').strip()
+        if t:
+            preview = t
+    preview = MUTED_PREFIX.sub('', preview)
+    m = SENDER_SPLIT.match(preview)
+    if m:
+        return RowPreview(name, unread, m.group(1).strip(), m.group(2).strip(), at_me)
+    return RowPreview(name, unread, None, preview, at_me)
+
+
+class Triage:
+    """
+    群聊有未读时先看会话列表里的预览，再决定要不要切过去读：
+    - ignore 里的会话直接跳过；
+    - 私聊（好友名单里的名字，或者预览没有发送者前缀）、@ 了 wx_name、发送者在权限组里、预览命中关键词、hook 返回 True 时打开；
+    - 其余的群：按上次决定以来新增的未读数判断（跳过的群红点不会消失，不能直接看累计的未读数）——
+      只新增 1 条时预览就是全部内容，跳过；新增多条时前面的消息看不到，延后，连续延后超过 defer_interval 秒再打开一次。
+    hook(preview) 返回 True / False 直接决定打开 / 跳过，返回 None 交给上面的规则。
+    决定分别计入 triage.open / triage.skip / triage.defer。
+    """
+
+    def __init__(self, wx_name: str, *, enable: bool = True, ignore=(), keywords=(), senders=(), defer_interval: float = 60.0,
+                 metrics: Metrics | None = None, clock=time.monotonic):
+        self.wx_name = wx_name
+        self.enable = bool(enable)
+        self.ignore = set(ignore)
+        self.keywords = set(keywords)
+        self.senders = set(senders)
+        self.private = set()  # 好友名单，这些会话一定是私聊
+        self.defer_interval = float(defer_interval)
+        self.hooks = []
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.clock = clock
+        self._deferred = {}  # name -> 第一次延后的时间
+        self._seen = {}      # name -> 上次跳过时的未读数，之后只看在此之上新增的
+
+    def add_keywords(self, words) -> None:
+        self.keywords = self.keywords | {w for w in words if w}
+
+    def set_senders(self, names) -> None:
+        self.senders = set(names)
+
+    def set_private(self, names) -> None:
+        self.private = set(names)
+
+    def add_ignore(self, names) -> None:
+        self.ignore = self.ignore | set(names)
+
+    def add_hook(self, hook) -> None:
+        self.hooks.append(hook)
+
+    def decide(self, preview: RowPreview) -> str:
+        name = preview.name
+        seen = self._seen.get(name, 0)
+        # 未读数变少说明在别处读过了，红点重新计数
+        fresh = preview.unread - seen if preview.unread >= seen else preview.unread
+        decision = self._decide(preview, fresh)
+        if decision == DEFER:
+            first = self._deferred.setdefault(name, self.clock())
+            if self.clock() - first >= self.defer_interval:
+                decision = OPEN
+        if decision != DEFER:
+            self._deferred.pop(name, None)
+        # 延后时基数不动，看不到的消息继续累计；打开后红点清零
+        if decision == SKIP:
+            self._seen[name] = preview.unread
+        elif decision == OPEN:
+            self._seen.pop(name, None)
+        self.metrics.incr(f'triage.{decision}')
+        return decision
+
+    def _decide(self, p: RowPreview, fresh: int) -> str:
+        if p.name in self.ignore:
+            return SKIP
+        if not self.enable or not p.is_group or p.name in self.private:
+            return OPEN
+        for hook in self.hooks:
+            verdict = hook(p)
+            if verdict is not None:
+                return OPEN if verdict else SKIP
+        if p.at_me or f'@{self.wx_name}' in p.content:
+            return OPEN
+        if p.sender in self.senders:
+            return OPEN
+        if any(kw in p.content for kw in self.keywords):
+            return OPEN
+        return SKIP if fresh <= 1 else DEFER
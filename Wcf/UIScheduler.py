@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from threading import Condition, Thread
+
+try:
+    from .Metrics import Metrics
+except ImportError:
+    from Metrics import Metrics
+
+
+# 数字越小越先执行
+PRIORITY_URGENT = 0      # owner / 指令的回复
+PRIORITY_SEND = 1        # 普通回复
+PRIORITY_READ = 2        # 读取某个会话的新消息
+PRIORITY_SCAN = 3        # 扫描会话列表
+PRIORITY_BACKGROUND = 4  # 刷新好友列表等后台任务
+
+WRITE_KINDS = {'send_text', 'send_image'}
+
+
+class UIAction:
+    __slots__ = ('priority', 'seq', 'kind', 'fn', 'args', 'kwargs', 'chat', 'future', 'enqueue_time')
+
+    def __init__(self, priority, seq, kind, fn, args, kwargs, chat):
+        self.priority = priority
+        self.seq = seq
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.chat = chat  # 需要切换到的会话，None 表示与会话无关
+        self.future = Future()
+        self.enqueue_time = time.perf_counter()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class UIScheduler:
+    """
+    唯一的 UI 所有者线程：所有 UI 操作（读会话、发文字、发图片、刷新好友）都排进优先队列，由它串行执行。
+
+    - 优先级高的先执行，同优先级先来先执行；
+    - 即将切换到别的会话前，先把队列里发往当前会话的写操作一起做完，少切一次会话；
+    - 每种操作分别统计排队时间（ui.wait.<kind>）与执行时间（ui.exec.<kind>）。
+    """
+
+    def __init__(self, metrics: Metrics | None = None, get_current_chat=None, name: str = 'UIOwnerThread'):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.get_current_chat = get_current_chat or (lambda: None)
+        self.name = name
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = Condition()
+        self._stopped = False
+        self._thread: Thread | None = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._stopped = False
+        self._thread = Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def in_ui_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def submit(self, kind, fn, *args, priority=PRIORITY_SEND, chat=None, **kwargs) -> Future:
+        action = UIAction(priority, next(self._seq), kind, fn, args, kwargs, chat)
+        if self.in_ui_thread():
+            # UI 线程里再提交 UI 操作只能就地执行，否则会自己等自己
+            self._execute(action)
+            return action.future
+        with self._cond:
+            heapq.heappush(self._heap, action)
+            self._cond.notify()
+        return action.future
+
+    def run(self, kind, fn, *args, priority=PRIORITY_SEND, chat=None, timeout=None, **kwargs):
+        """提交并等待结果，异常会在调用方线程重新抛出"""
+        return self.submit(kind, fn, *args, priority=priority, chat=chat, **kwargs).result(timeout=timeout)
+
+    def _pop_next(self) -> UIAction:
+        # 调用时已持有 self._cond
+        action = heapq.heappop(self._heap)
+        current = self.get_current_chat()
+        if current is None or action.chat == current:
+            return action
+        batched = [
+            a for a in self._heap
+            if a.kind in WRITE_KINDS and a.chat == current and a.priority <= action.priority
+        ]
+        if not batched:
+            return action
+        first = min(batched)
+        self._heap.remove(first)
+        heapq.heappush(self._heap, action)
+        heapq.heapify(self._heap)
+        self.metrics.incr('ui.batched_writes')
+        return first
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    pending, self._heap = self._heap, []
+                    break
+                action = self._pop_next()
+            self._execute(action)
+        for action in pending:
+            action.future.cancel()
+
+    def _execute(self, action: UIAction):
+        if not action.future.set_running_or_notify_cancel():
+            return
+        start = time.perf_counter()
+        self.metrics.observe(f'ui.wait.{action.kind}', start - action.enqueue_time)
+        try:
+            result = action.fn(*action.args, **action.kwargs)
+        except BaseException as e:
+            action.future.set_exception(e)
+        else:
+            action.future.set_result(result)
+        finally:
+            self.metrics.observe(f'ui.exec.{action.kind}', time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    # 无界面压测：假 UI 里切换会话、打字、读会话都只是 sleep，看排队时间与执行时间
+    class FakeUI:
+        def __init__(self):
+            self.current_chat = None
+            self.switches = 0
+
+        def switch(self, name):
+            if self.current_chat != name:
+                self.switches += 1
+                time.sleep(0.004)
+                self.current_chat = name
+
+        def read_chat(self, name):
+            self.switch(name)
+            time.sleep(0.002)
+
+        def send_text(self, name, text):
+            self.switch(name)
+            time.sleep(0.0002 * len(text))
+
+    random.seed(0)
+    ui = FakeUI()
+    scheduler = UIScheduler(get_current_chat=lambda: ui.current_chat)
+    scheduler.start()
+    chats = [f'好友{i}' for i in range(10)]
+    futures = []
+    start = time.perf_counter()
+    for i in range(400):
+        name = random.choice(chats)
+        r = random.random()
+        if r < 0.5:
+            futures.append(scheduler.submit('read_chat', ui.read_chat, name, priority=PRIORITY_READ, chat=name))
+        elif r < 0.9:
+            futures.append(scheduler.submit('send_text', ui.send_text, name, '收到' * 5, chat=name))
+        else:
+            futures.append(scheduler.submit(
+                'send_text', ui.send_text, name, '重置成功', priority=PRIORITY_URGENT, chat=name
+            ))
+    for f in futures:
+        f.result()
+    print(f'400 个操作耗时 {time.perf_counter() - start:.2f}s，切换会话 {ui.switches} 次')
+    print(scheduler.metrics.report())
+    scheduler.stop()
@@ -0,0 +1,249 @@
+import json
+from typing import NamedTuple
+
+
+class Rect(NamedTuple):
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+
+class UINode:
+    """
+    UIA 控件的纯 Python 快照：名字、控件类型、矩形、是否可见和子节点，一次取完之后不再跨进程访问。
+    提供解析消息时用到的那几个 wrapper 接口（window_text / is_visible / descendants / element_info / rectangle），
+    所以 Wcf.parse_single_msg 和 WxMsgParser 不用区分传进来的是真实控件还是快照。
+    可以用 dumps / loads 存成 JSON，在没有微信的机器上做解析测试和基准测试。
+    """
+
+    __slots__ = ('name', 'control_type', 'rect', 'visible', '_children')
+
+    def __init__(self, name='', control_type='', rect=(0, 0, 0, 0), visible=True, children=()):
+        self.name = name or ''
+        self.control_type = control_type or ''
+        self.rect = Rect(*rect)
+        self.visible = bool(visible)
+        self._children = list(children)
+
+    # ---- wrapper 接口 ----
+    @property
+    def element_info(self):
+        return self  # element_info.name / element_info.control_type
+
+    def window_text(self) -> str:
+        return self.name
+
+    def is_visible(self) -> bool:
+        return self.visible
+
+    def rectangle(self) -> Rect:
+        return self.rect
+
+    def children(self, control_type=None) -> list:
+        if control_type is None:
+            return list(self._children)
+        return [c for c in self._children if c.control_type == control_type]
+
+    def descendants(self, control_type=None) -> list:
+        out = []
+        stack = list(reversed(self._children))
+        while stack:
+            node = stack.pop()
+            if control_type is None or node.control_type == control_type:
+                out.append(node)
+            stack.extend(reversed(node._children))
+        return out
+
+    # ---- 序列化 ----
+    def to_dict(self) -> dict:
+        d = {'name': self.name, 'type': self.control_type, 'rect': list(self.rect)}
+        if not self.visible:
+            d['visible'] = False
+        if self._children:
+            d['children'] = [c.to_dict() for c in self._children]
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'UINode':
+        return cls(
+            name=d.get('name', ''),
+            control_type=d.get('type', ''),
+            rect=d.get('rect', (0, 0, 0, 0)),
+            visible=d.get('visible', True),
+            children=[cls.from_dict(c) for c in d.get('children', ())],
+        )
+
+    def __repr__(self):
+        return f'<UINode {self.control_type} {self.name[:20]!r} children={len(self._children)}>'
+
+
+def dumps(nodes) -> str:
+    return json.dumps([n.to_dict() for n in nodes], ensure_ascii=False, indent=1)
+
+
+def loads(text: str) -> list:
+    return [UINode.from_dict(d) for d in json.loads(text)]
+
+
+def snapshot_children(wrapper, last_n=None) -> list:
+    """
+    用 UIA CacheRequest 批量读取 wrapper 的最后 last_n 个子控件（连同整棵子树）：
+    先一次取出全部子控件的引用，再对每个目标子控件发一次子树缓存请求，
+    之后所有属性都从缓存里读，不再逐个控件、逐个属性地跨进程调用。
+    """
+    from pywinauto.uia_defines import IUIA
+
+    iuia = IUIA().iuia
+    UIA = IUIA().UIA_dll
+    type_names = IUIA().known_control_type_ids
+
+    refs_req = iuia.CreateCacheRequest()
+    refs_req.TreeScope = UIA.TreeScope_Element
+    tree_req = _tree_request()
+    found = wrapper.element_info.element.FindAllBuildCache(
+        UIA.TreeScope_Children, iuia.CreateTrueCondition(), refs_req
+    )
+    total = found.Length if found else 0
+    start = 0 if last_n is None else max(0, total - int(last_n))
+    return [
+        _from_cached(found.GetElement(i).BuildUpdatedCache(tree_req), type_names)
+        for i in range(start, total)
+    ]
+
+
+def snapshot_element(wrapper) -> UINode:
+    """一次缓存请求读取 wrapper 自己和整棵子树"""
+    from pywinauto.uia_defines import IUIA
+
+    elem = wrapper.element_info.element.BuildUpdatedCache(_tree_request())
+    return _from_cached(elem, IUIA().known_control_type_ids)
+
+
+def child_names(wrapper, first_n=None) -> list:
+    """一次跨进程调用取回 wrapper 全部子控件的名字（只取前 first_n 个）"""
+    from pywinauto.uia_defines import IUIA
+
+    iuia = IUIA().iuia
+    UIA = IUIA().UIA_dll
+    req = iuia.CreateCacheRequest()
+    req.AddProperty(UIA.UIA_NamePropertyId)
+    req.TreeScope = UIA.TreeScope_Element
+    found = wrapper.element_info.element.FindAllBuildCache(UIA.TreeScope_Children, iuia.CreateTrueCondition(), req)
+    total = found.Length if found else 0
+    if first_n is not None:
+        total = min(total, int(first_n))
+    return [found.GetElement(i).CachedName or '' for i in range(total)]
+
+
+def _tree_request():
+    from pywinauto.uia_defines import IUIA
+
+    UIA = IUIA().UIA_dll
+    req = IUIA().iuia.CreateCacheRequest()
+    for prop in (
+        UIA.UIA_NamePropertyId,
+        UIA.UIA_ControlTypePropertyId,
+        UIA.UIA_BoundingRectanglePropertyId,
+        UIA.UIA_IsOffscreenPropertyId,
+    ):
+        req.AddProperty(prop)
+    req.TreeScope = UIA.TreeScope_Subtree
+    return req
+
+
+def _from_cached(elem, type_names) -> UINode:
+    r = elem.CachedBoundingRectangle
+    children = []
+    kids = elem.GetCachedChildren()
+    if kids:
+        children = [_from_cached(kids.GetElement(i), type_names) for i in range(kids.Length)]
+    return UINode(
+        name=elem.CachedName,
+        control_type=type_names.get(elem.CachedControlType, ''),
+        rect=(r.left, r.top, r.right, r.bottom),
+        visible=not elem.CachedIsOffscreen,
+        children=children,
+    )
+
+
+if __name__ == '__main__':
+    import time
+
+    try:
+        from .WxMsgParser import WxMsgParser
+    except ImportError:
+        from WxMsgParser import WxMsgParser
+
+    # 假的实时控件：每次访问属性 / 子控件都算一次跨进程调用
+    COM_CALL = 0.0004  # 单次跨进程调用的大致耗时（秒）
+
+    class LiveNode:
+        calls = 0
+
+        def __init__(self, node):
+            self.node = node
+
+        def _call(self):
+            LiveNode.calls += 1
+
+        @property
+        def element_info(self):
+            self._call()
+            return self.node
+
+        def window_text(self):
+            self._call()
+            return self.node.name
+
+        def is_visible(self):
+            self._call()
+            return self.node.visible
+
+        def descendants(self, control_type=None):
+            self._call()
+            return [LiveNode(n) for n in self.node.descendants(control_type)]
+
+    def fake_item(i):
+        sender = f'群友{i % 7}'
+        text = f'第 {i} 条消息，内容随便写一点' if i % 9 else '[动画表情]'
+        return UINode(text, 'ListItem', (0, i * 60, 800, i * 60 + 60), children=[
+            UINode('', 'Pane', children=[
+                UINode(sender, 'Button', (10, i * 60, 50, i * 60 + 40)),
+                UINode('', 'Pane', children=[UINode(text, 'Text'), UINode('', 'Pane')]),
+            ]),
+        ])
+
+    items = [fake_item(i) for i in range(20)]
+    # 快照可以原样存下来当测试数据
+    items = loads(dumps(items))
+    parser = WxMsgParser()
+
+    def parse(item):
+        # 与 Wcf.parse_single_msg 的文本分支相同的访问顺序
+        if not item.is_visible():
+            return None
+        btns = item.descendants(control_type='Button')
+        sender = next((b.element_info.name for b in btns if b.element_info.name), '')
+        res = parser.parse_single_msg(item)
+        if res is not None:
+            res.sender = sender
+        return res
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        live = [parse(LiveNode(it)) for it in items]
+    live_cpu = (time.perf_counter() - start) / rounds
+    live_calls = LiveNode.calls / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        snap = [parse(it) for it in items]
+    snap_cpu = (time.perf_counter() - start) / rounds
+    snap_calls = 1 + len(items)  # FindAllBuildCache 一次 + 每个消息一次子树缓存
+
+    assert [m.hash_id for m in live] == [m.hash_id for m in snap]
+    print(f'读取 {len(items)} 条消息')
+    print(f'  逐个访问：{live_calls:5.0f} 次跨进程调用，约 {(live_calls * COM_CALL + live_cpu) * 1000:6.1f}ms')
+    print(f'  批量快照：{snap_calls:5.0f} 次跨进程调用，约 {(snap_calls * COM_CALL + snap_cpu) * 1000:6.1f}ms')
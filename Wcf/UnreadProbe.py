@@ -0,0 +1,168 @@
+import hashlib
+import time
+
+try:
+    from .Metrics import Metrics
+except ImportError:
+    from Metrics import Metrics
+
+
+class UnreadProbe:
+    """
+    扫描会话列表之前的廉价探测（基类）：read() 返回一个可比较的值，值没变就认为没有新的未读。
+    返回 None 表示读不出来，调用方应照常扫描。
+    """
+
+    name = 'none'
+
+    def read(self):
+        return None
+
+
+class BadgeProbe(UnreadProbe):
+    """
+    左侧“聊天”按钮上的未读角标：按钮自己和子控件的文字。
+    只要一次很小的子树读取，但免打扰的群不计入角标，这类群的新消息要等兜底扫描。
+    """
+
+    name = 'badge'
+
+    def __init__(self, get_button):
+        self.get_button = get_button  # () -> wrapper / UINode
+
+    def read(self):
+        btn = self.get_button()
+        return (btn.window_text(),) + tuple(c.window_text() for c in btn.descendants(control_type="Text"))
+
+
+class ListHashProbe(UnreadProbe):
+    """会话列表前若干行文字的摘要；get_names 应该一次取回全部行名（Wcf 里用 UIA 缓存请求）"""
+
+    name = 'hash'
+
+    def __init__(self, get_names):
+        self.get_names = get_names  # () -> list[str]
+
+    def read(self):
+        h = hashlib.blake2b(digest_size=8)
+        for name in self.get_names():
+            h.update(name.encode('utf-8'))
+            h.update(b'\0')
+        return h.digest()
+
+
+class ProbeGate:
+    """
+    决定这一轮要不要完整扫描会话列表：
+    - 探测值和上一次干净扫描（没发现未读）之后的值一样，就跳过；
+    - 上一次扫描发现了未读（可能还没处理完）、探测失败、或距离上次完整扫描超过 force_interval 秒时照常扫描。
+    耗时记在 probe.read，跳过 / 放行分别计入 probe.skip / probe.pass。
+    """
+
+    def __init__(self, probe: UnreadProbe, *, force_interval: float = 30.0, metrics: Metrics | None = None, clock=time.monotonic):
+        self.probe = probe
+        self.force_interval = float(force_interval)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.clock = clock
+        self._last = None      # 上一次干净扫描时的探测值
+        self._pending = None   # 这一轮放行时的探测值
+        self._last_scan = None
+
+    def should_scan(self) -> bool:
+        start = time.perf_counter()
+        try:
+            value = self.probe.read()
+        except Exception as e:
+            self.metrics.incr('probe.error')
+            print(f'[UnreadProbe] 探测失败：{e}')
+            value = None
+        self.metrics.observe('probe.read', time.perf_counter() - start)
+
+        now = self.clock()
+        stale = self._last_scan is None or now - self._last_scan >= self.force_interval
+        if value is not None and value == self._last and not stale:
+            self.metrics.incr('probe.skip')
+            return False
+        self.metrics.incr('probe.pass')
+        self._pending = value
+        return True
+
+    def scanned(self, found: bool) -> None:
+        """完整扫描之后调用：没发现未读时记住当时的探测值，发现了就下一轮照常扫描"""
+        self._last_scan = self.clock()
+        self._last = None if found else self._pending
+
+
+def build_probe(kind: str, *, get_button=None, get_names=None) -> UnreadProbe:
+    if kind == 'badge' and get_button is not None:
+        return BadgeProbe(get_button)
+    if kind == 'hash' and get_names is not None:
+        return ListHashProbe(get_names)
+    return UnreadProbe()
+
+
+if __name__ == '__main__':
+    import random
+
+    try:
+        from .UISnapshot import UINode
+    except ImportError:
+        from UISnapshot import UINode
+
+    # 假 UI 树：会话列表 + “聊天”按钮，统计每种方式的跨进程调用次数
+    COM_CALL = 0.0004
+    LISTEN_CNT = 5
+
+    class FakeTree:
+        def __init__(self, n=30):
+            self.rows = [f'好友{i}' for i in range(n)]
+            self.unread = {}
+            self.calls = 0
+
+        def push(self):
+            name = random.choice(self.rows)
+            self.rows.remove(name)
+            self.rows.insert(0, name)
+            self.unread[name] = self.unread.get(name, 0) + 1
+
+        def row_texts(self):
+            return [r + (f'{self.unread[r]}条新消息' if r in self.unread else '') for r in self.rows]
+
+        # 原方式：置前窗口 + 逐行读文字
+        def full_scan(self):
+            self.calls += 1 + 1 + LISTEN_CNT
+            found = [t for t in self.row_texts()[:LISTEN_CNT] if t.endswith('条新消息')]
+            for r in list(self.unread):
+                if r in self.rows[:LISTEN_CNT]:
+                    del self.unread[r]
+            return bool(found)
+
+        def chat_button(self):
+            self.calls += 1
+            total = sum(self.unread.values())
+            return UINode('聊天', 'Button', children=[UINode(str(total) if total else '', 'Text')])
+
+        def names(self):
+            self.calls += 1
+            return self.row_texts()[:LISTEN_CNT]
+
+    def run(label, make_gate, polls=5000, rate=0.01):
+        random.seed(0)
+        tree = FakeTree()
+        gate = make_gate(tree)
+        scans = 0
+        for _ in range(polls):
+            if random.random() < rate:
+                tree.push()
+            if gate is None or gate.should_scan():
+                scans += 1
+                found = tree.full_scan()
+                if gate is not None:
+                    gate.scanned(found)
+        left = sum(tree.unread.values())
+        print(f'{label:>8}: 完整扫描 {scans:5d} 次，跨进程调用 {tree.calls / polls:5.2f} 次/轮'
+              f'（约 {tree.calls / polls * COM_CALL * 1000:.2f}ms），遗留未读 {left}')
+
+    run('none', lambda tree: None)
+    run('badge', lambda tree: ProbeGate(BadgeProbe(tree.chat_button), force_interval=float('inf')))
+    run('hash', lambda tree: ProbeGate(ListHashProbe(tree.names), force_interval=float('inf')))
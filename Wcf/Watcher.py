@@ -0,0 +1,286 @@
+import random
+import threading
+import time
+from threading import Event, Thread
+
+
+class ConvWatcher:
+    """
+    会话列表变化通知器（基类）。
+
+    谁发现“会话”列表可能变了，谁就调用 notify()：可以是 UIA 事件回调，也可以是测试用的假 UI 树。
+    接收线程调用 wait_change(timeout) 阻塞等待，直到有通知或超时，然后扫描一次会话列表。
+    """
+
+    mode = 'manual'
+
+    def __init__(self):
+        self._changed = Event()
+        self.notify_cnt = 0
+        self.last_notify_time = None
+
+    def start(self) -> bool:
+        return True
+
+    def stop(self):
+        self.notify()
+
+    def notify(self, *_):
+        self.notify_cnt += 1
+        self.last_notify_time = time.perf_counter()
+        self._changed.set()
+
+    def scanned(self, found: bool) -> None:
+        """接收线程每扫描完一次调用，found 表示这次扫描发现了新消息"""
+
+    def boost(self) -> None:
+        """机器人刚回复过，对方很可能马上回话"""
+
+    def wait_change(self, timeout: float) -> bool:
+        """等待变化通知，返回 True 表示有通知，False 表示超时（调用方可以做一次兜底扫描）"""
+        fired = self._changed.wait(timeout)
+        if fired:
+            # 先清再扫：扫描期间到达的通知会保留到下一轮
+            self._changed.clear()
+        return fired
+
+
+class PollWatcher(ConvWatcher):
+    """原来的轮询方式：每隔 interval 秒就认为“可能有变化”"""
+
+    mode = 'poll'
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = float(interval)
+
+    def wait_change(self, timeout: float | None = None) -> bool:
+        # timeout 只是事件模式的兜底，轮询时传 None，按 interval 睡（可以超过兜底间隔，例如夜里的 30 秒）
+        self._changed.wait(self.interval if timeout is None else min(self.interval, timeout))
+        self._changed.clear()
+        return True
+
+
+class AdaptivePollWatcher(PollWatcher):
+    """
+    自适应轮询：连续扫不到新消息时间隔按 backoff 倍数增长，直到 max_interval；
+    扫到新消息或机器人刚回复时立刻回到 min_interval。
+    curves 按一天中的时段覆盖 min_interval / max_interval / backoff，例如夜里放得更慢：
+        [{'start': '00:00', 'end': '08:00', 'max_interval': 30}]
+    """
+
+    mode = 'adaptive'
+
+    def __init__(self, min_interval: float, *, max_interval: float = 5.0, backoff: float = 1.5, curves=None, clock=time.time):
+        super().__init__(min_interval)
+        self.min_interval = float(min_interval)
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.backoff = max(1.0, float(backoff))
+        self.curves = [self._parse_curve(c) for c in (curves or [])]
+        self.clock = clock
+
+    @staticmethod
+    def _parse_curve(c: dict) -> dict:
+        def minute(hhmm):
+            h, m = str(hhmm).split(':')
+            return int(h) * 60 + int(m)
+        out = {'start': minute(c['start']), 'end': minute(c['end'])}
+        for k in ('min_interval', 'max_interval', 'backoff'):
+            if k in c:
+                out[k] = float(c[k])
+        return out
+
+    def limits(self) -> tuple[float, float, float]:
+        """当前时段的 (min_interval, max_interval, backoff)"""
+        t = time.localtime(self.clock())
+        now = t.tm_hour * 60 + t.tm_min
+        lo, hi, backoff = self.min_interval, self.max_interval, self.backoff
+        for c in self.curves:
+            start, end = c['start'], c['end']
+            inside = start <= now < end if start <= end else (now >= start or now < end)  # 支持跨零点
+            if inside:
+                lo = c.get('min_interval', lo)
+                hi = c.get('max_interval', hi)
+                backoff = c.get('backoff', backoff)
+                break
+        return lo, max(lo, hi), max(1.0, backoff)
+
+    def scanned(self, found: bool) -> None:
+        lo, hi, backoff = self.limits()
+        if found:
+            self.interval = lo
+        else:
+            self.interval = min(hi, max(lo, self.interval * backoff))
+
+    def boost(self) -> None:
+        self.interval = self.limits()[0]
+        self.notify()  # 正在长睡的话马上醒来，按新间隔继续
+
+
+class UIAEventWatcher(ConvWatcher):
+    """
+    基于 UIA 事件的通知：订阅“会话”列表子树的 StructureChanged 与 Name 属性变化。
+
+    事件回调发生在 UIA 的工作线程里，回调里只做 notify()，不碰任何 UI。
+    注册失败（缺少 comtypes、微信版本不支持等）时 start() 返回 False，调用方应回退到 PollWatcher。
+    """
+
+    mode = 'event'
+
+    def __init__(self, get_element):
+        super().__init__()
+        self.get_element = get_element  # () -> pywinauto wrapper，延迟到事件线程里再解析
+        self._thread: Thread | None = None
+        self._ready = Event()
+        self._quit = Event()
+        self._ok = False
+
+    def start(self) -> bool:
+        if self._thread is not None and self._thread.is_alive():
+            return self._ok
+        self._ready.clear()
+        self._quit.clear()
+        self._thread = Thread(target=self._run, name='ConvWatcherThread', daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        return self._ok
+
+    def stop(self):
+        self._quit.set()
+        super().stop()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _run(self):
+        try:
+            import comtypes
+            from pywinauto.uia_defines import IUIA
+        except Exception as e:
+            print(f'[ConvWatcher] 无法加载 UIA 事件依赖：{e}')
+            self._ready.set()
+            return
+
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+        uia = IUIA().iuia
+        UIA = IUIA().UIA_dll
+        watcher = self
+
+        class _Handler(comtypes.COMObject):
+            _com_interfaces_ = [
+                UIA.IUIAutomationStructureChangedEventHandler,
+                UIA.IUIAutomationPropertyChangedEventHandler,
+            ]
+
+            def HandleStructureChangedEvent(self, sender, changeType, runtimeId):
+                watcher.notify()
+
+            def HandlePropertyChangedEvent(self, sender, propertyId, newValue):
+                watcher.notify()
+
+        handler = _Handler()
+        try:
+            element = self.get_element().element_info.element
+            uia.AddStructureChangedEventHandler(element, UIA.TreeScope_Subtree, None, handler)
+            uia.AddPropertyChangedEventHandler(
+                element, UIA.TreeScope_Subtree, None, handler, [UIA.UIA_NamePropertyId]
+            )
+            self._ok = True
+        except Exception as e:
+            print(f'[ConvWatcher] 注册 UIA 事件失败：{e}')
+            self._ok = False
+            self._ready.set()
+            comtypes.CoUninitialize()
+            return
+
+        self._ready.set()
+        self._quit.wait()
+        try:
+            uia.RemoveAllEventHandlers()
+        except Exception:
+            pass
+        comtypes.CoUninitialize()
+
+
+def build_conv_watcher(mode: str, *, interval: float, get_element=None, adaptive: dict | None = None, clock=None) -> ConvWatcher:
+    """
+    按配置创建 watcher；事件模式注册失败时自动回退到轮询。
+    adaptive 不为 None 时（adaptive 模式，或事件模式的回退）用自适应轮询，参数见 AdaptivePollWatcher；
+    clock 为返回当前时间戳的函数（Wcf 的 clock.time），用来判断所在时段。
+    """
+    if mode == 'event' and get_element is not None:
+        watcher = UIAEventWatcher(get_element)
+        if watcher.start():
+            print('[ConvWatcher] 已启用 UIA 事件模式')
+            return watcher
+        print('[ConvWatcher] UIA 事件模式不可用，回退到轮询模式')
+    if mode != 'poll' and adaptive is not None:
+        if clock is not None:
+            adaptive = dict(adaptive, clock=clock)
+        watcher = AdaptivePollWatcher(interval, **adaptive)
+    else:
+        watcher = PollWatcher(interval)
+    watcher.start()
+    return watcher
+
+
+if __name__ == '__main__':
+    # 用进程内的假会话列表对比“轮询”和“事件”两种模式：检测延迟 + 空转扫描次数
+    class FakeConvList:
+        def __init__(self, n, watcher=None):
+            self.rows = [f'好友{i}' for i in range(n)]
+            self.lock = threading.Lock()
+            self.watcher = watcher
+            self.arrivals = []  # 新消息到达时间
+
+        def push(self):
+            with self.lock:
+                idx = random.randrange(len(self.rows))
+                name = self.rows.pop(idx).split('1条新消息')[0]
+                self.rows.insert(0, name + '1条新消息')
+                self.arrivals.append(time.perf_counter())
+            if self.watcher is not None:
+                self.watcher.notify()
+
+        def scan(self):
+            with self.lock:
+                unread = [r for r in self.rows if r.endswith('条新消息')]
+                self.rows = [r.split('1条新消息')[0] for r in self.rows]
+                return len(unread)
+
+    def run(watcher, seconds=3.0, rate=5.0, fallback=5.0, label=None):
+        random.seed(0)
+        tree = FakeConvList(20, None if isinstance(watcher, PollWatcher) else watcher)
+        stop = Event()
+        latencies = []
+        scans = 0
+
+        def producer():
+            while not stop.is_set():
+                time.sleep(random.expovariate(rate))
+                tree.push()
+
+        t = Thread(target=producer, daemon=True)
+        t.start()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            watcher.wait_change(fallback)
+            scans += 1
+            now = time.perf_counter()
+            found = tree.scan()
+            watcher.scanned(bool(found))
+            if found:
+                with tree.lock:
+                    latencies.extend(now - a for a in tree.arrivals)
+                    tree.arrivals.clear()
+        stop.set()
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        print(f'{label or watcher.mode:>16}: scans={scans:4d}  msgs={len(latencies):3d}  '
+              f'p50 latency={p50:6.2f}ms  scans/s={scans / seconds:6.1f}')
+
+    run(PollWatcher(0.1))
+    run(ConvWatcher())
+    # 稀疏消息（平均 2 秒一条）：自适应轮询用更少的扫描换一点检测延迟
+    run(PollWatcher(0.1), rate=0.5, seconds=10.0, label='poll sparse')
+    run(AdaptivePollWatcher(0.1, max_interval=1.0), rate=0.5, seconds=10.0, label='adaptive sparse')
@@ -1,15 +1,11 @@
 import queue
-from pywinauto.application import Application
+from collections import deque
 import os
 import random
 import time
 import math
 from pathlib import Path
 from threading import Lock, Event, Thread
-from pywinauto.controls.uiawrapper import UIAWrapper
-from pywinauto import mouse
-import win32api
-import win32con
 import traceback
 import yaml
 from typing import Any
@@ -24,23 +20,66 @@ try:
     from .utils import *
     from .WxMsg import WxMsg
     from .WxMsgParser import WxMsgParser
+    from .Watcher import build_conv_watcher
+    from .Metrics import Metrics
+    from .Decorator import TextDecorator
+    from .MsgCache import MsgCache
+    from .ImageStore import ImageStore
+    from .ContactBook import ContactBook
+    from .Navigator import Navigator, WcfNavOps
+    from .ElementCache import ElementCache
+    from .UISnapshot import UINode, dumps
+    from .backend import build_backend, build_clock
+    from .UnreadProbe import ProbeGate, build_probe
+    from .Triage import Triage, RowPreview, parse_preview, OPEN, DEFER
+    from .UIScheduler import UIScheduler, PRIORITY_URGENT, PRIORITY_SEND, PRIORITY_READ, PRIORITY_SCAN, PRIORITY_BACKGROUND
 except ImportError:
     from utils import *
     from WxMsg import WxMsg
     from WxMsgParser import WxMsgParser
+    from Watcher import build_conv_watcher
+    from Metrics import Metrics
+    from Decorator import TextDecorator
+    from MsgCache import MsgCache
+    from ImageStore import ImageStore
+    from ContactBook import ContactBook
+    from Navigator import Navigator, WcfNavOps
+    from ElementCache import ElementCache
+    from UISnapshot import UINode, dumps
+    from backend import build_backend, build_clock
+    from UnreadProbe import ProbeGate, build_probe
+    from Triage import Triage, RowPreview, parse_preview, OPEN, DEFER
+    from UIScheduler import UIScheduler, PRIORITY_URGENT, PRIORITY_SEND, PRIORITY_READ, PRIORITY_SCAN, PRIORITY_BACKGROUND
 
 class Wcf:
-    def __init__(self):
-        self.load_parameters_from_yaml()
+    def __init__(self, backend=None, config: dict | None = None):
+        '''
+        backend: UI 后端（见 backend/），默认按配置 ui_backend 创建；
+        config: 直接给配置字典时不读 ./config/config.yaml，模拟器和基准测试用
+        '''
+        if config is None:
+            self.load_parameters_from_yaml()
+        else:
+            self.load_parameters(config)
         if not self.wx_name or not str(self.wx_name).strip():
             print('错误：请在 ./config/config.yaml 中设置非空的 wx_name（你当前登录微信的昵称）。')
             raise SystemExit(1)
 
-        print("Application")
-        self.app = Application(backend="uia").connect(path="WeChat.exe")
+        self.metrics = Metrics()
+        # 热点控件的已解析句柄，失效或窗口重新布局时才重新查找
+        self.elements = ElementCache(self.metrics)
+
+        print(f"Application ({self.ui_backend if backend is None else backend.name})")
+        # 所有鼠标、键盘、剪贴板和批量读取都经过 backend，所有等待都经过 clock；
+        # 拟人停顿的随机数都取自 rng，固定 random_seed 时同样的输入得到同样的节奏
+        if backend is None:
+            backend = build_backend(self.ui_backend, clock=build_clock(self.clock_mode))
+        self.backend = backend
+        self.clock = self.backend.clock
+        self.rng = random.Random(self.random_seed)
 
         print("Window")
-        self.win = self.app.window(title="微信", control_type="Window")
+        self.win = self.backend.connect()
 
         print("Regular Expressions")
         self._GROUP_RE = re.compile(r"^(?P<name>.*?)(?:\s*\((?P<count>\d+)\))?$")
@@ -49,9 +88,17 @@ class Wcf:
         self.chat = self.win.child_window(title="聊天", control_type="Button").wrapper_object()
         self.friend_list = self.win.child_window(title="通讯录", control_type="Button").wrapper_object()
         self.search = self.win.child_window(title="搜索", control_type="Edit").wrapper_object()
-        self.message_parser = WxMsgParser()
-        self.conv_list = self.win.child_window(title="会话", control_type="List")
-        self.msg_list = self.win.child_window(title="消息", control_type="List")
+        self.image_store = None
+        if self.enable_image_parse:
+            self.image_store = ImageStore(
+                self.image_store_dir,
+                workers=self.image_workers,
+                max_side=self.image_max_side,
+                fmt=self.image_format,
+            )
+        self.message_parser = WxMsgParser(image_store=self.image_store, backend=self.backend)
+        self.conv_list_spec = self.win.child_window(title="会话", control_type="List")
+        self.msg_list_spec = self.win.child_window(title="消息", control_type="List")
 
         print("Init")
         self.stay_focus()
@@ -59,14 +106,57 @@ class Wcf:
 
 
         print("Runtime elements")
-        self.wx_lock = Lock()
+        # 所有 UI 操作都交给唯一的 UI 线程按优先级执行，代替原来的 wx_lock
+        self.ui = UIScheduler(metrics=self.metrics, get_current_chat=lambda: self.current_chat_name)
+        self.navigator = Navigator(WcfNavOps(self), top_rows=self.listen_cnt, metrics=self.metrics)
+        self.decorator = TextDecorator(
+            self.decorate_text,
+            workers=self.decorate_workers,
+            refill_workers=self.decorate_refill_workers,
+            deadline=self.decorate_deadline,
+            cache_size=self.decorate_cache_size,
+            variants=self.decorate_variants,
+            metrics=self.metrics,
+        )
+        for text in self.decorate_hot_texts:
+            self.decorator.add_hot_text(text)
+        self.title_elem = None
         self.current_chat_name, self.is_room, self.room_member_cnt = self.get_current_chat_and_is_group()
         print(f'初始会话对象：{self.current_chat_name}, 是否为群聊：{self.is_room}, 有几人：{self.room_member_cnt}')
-        self.msg_cache = {} # name -> [WxMsg]
-        self.new_msg_queue = queue.Queue()
+        self.msg_cache = MsgCache(self.memory_len, self.max_cached_chats) # name -> 最近 memory_len 条 WxMsg
+        self.conv_snapshot = set() # 上一次扫描时会话列表前 listen_cnt 行的原始文字
+        self.new_msg_queue = queue.Queue() # (name, [这次读到的新消息...])
+        self.pending_msgs = deque() # 已经出队但还没交给调用方的 (name, WxMsg)，下次优先取
         self.new_msg_queue_lock = Lock()
         self.recv_stop_event = Event()
         self.recv_thread: Thread | None = None
+        self.conv_watcher = None
+        self.unread_gate = ProbeGate(
+            build_probe(
+                self.unread_probe,
+                get_button=lambda: self.chat,
+                get_names=lambda: self.elements.call(
+                    'conv_list', self.conv_list_spec.wrapper_object,
+                    lambda conv_list: self.backend.child_names(conv_list, self.listen_cnt),
+                ),
+            ),
+            force_interval=self.probe_force_interval,
+            metrics=self.metrics,
+            clock=self.clock.perf_counter,
+        )
+        self.contacts = ContactBook(self.contacts_cache)
+        self.triage = Triage(
+            self.wx_name,
+            enable=self.triage_cfg.get('enable', False),
+            ignore=self.triage_cfg.get('ignore') or (),
+            keywords=self.triage_cfg.get('keywords') or (),
+            defer_interval=self.triage_cfg.get('defer_interval', 60.0),
+            metrics=self.metrics,
+            clock=self.clock.perf_counter,
+        )
+        self.contacts.subscribe(lambda added, removed: self.triage.set_private(self.contacts.names))
+        self.contacts_thread: Thread | None = None
+        self.ui.start()
 
         print("Init finished")
 
@@ -78,8 +168,13 @@ class Wcf:
 
         with cfg_path.open('r', encoding='utf-8') as f:
             cfg = yaml.safe_load(f) or {}
+        self.load_parameters(cfg)
 
+    def load_parameters(self, cfg: dict):
         try:
+            self.ui_backend = str(cfg.get('ui_backend', 'pywinauto'))
+            self.clock_mode = str(cfg.get('clock', 'real'))
+            self.random_seed = cfg.get('random_seed')
             self.wx_name = cfg['wx_name']
             self.default_chat_name = cfg['default_chat_name']
             self.listen_cnt = int(cfg['listen_cnt'])
@@ -88,23 +183,59 @@ class Wcf:
             self.square_eps = float(cfg['square_eps'])
             self.mouse_move_speed = float(cfg['mouse_move_speed'])
             self.memory_len = int(cfg['memory_len'])
+            self.max_cached_chats = int(cfg.get('max_cached_chats', 200))
             self.max_new_msg_cnt = int(cfg['max_new_msg_cnt'])
+            self.msg_read_mode = str(cfg.get('msg_read_mode', 'snapshot'))
+            self.catchup_budget = float(cfg.get('catchup_budget', 3.0))
+            self.catchup_scroll_step = int(cfg.get('catchup_scroll_step', 5))
             self.listen_msg_interval = float(cfg['listen_msg_interval'])
+            self.receive_mode = str(cfg.get('receive_mode', 'event'))
+            self.event_fallback_interval = float(cfg.get('event_fallback_interval', 5.0))
+            self.adaptive_poll = dict(cfg.get('adaptive_poll') or {})
+            self.unread_probe = str(cfg.get('unread_probe', 'hash'))
+            self.probe_force_interval = float(cfg.get('probe_force_interval', 30.0))
+            self.triage_cfg = dict(cfg.get('triage') or {})
             self.type_min_interval = float(cfg['type_min_interval'])
             self.type_max_interval = float(cfg['type_max_interval'])
+            self.nav_mode = str(cfg.get('nav_mode', 'keyboard'))
+            self.nav_mouse_jitter = bool(cfg.get('nav_mouse_jitter', False))
+            self.nav_search_paste = bool(cfg.get('nav_search_paste', True))
             self.enable_image_parse = bool(cfg['enable_image_parse'])
+            self.image_store_dir = Path(__file__).resolve().parent / str(cfg.get('image_store_dir', 'local/images'))
+            self.contacts_cache = Path(__file__).resolve().parent / str(cfg.get('contacts_cache', 'local/contacts.json'))
+            self.contacts_pages_per_step = max(1, int(cfg.get('contacts_pages_per_step', 5)))
+            self.image_workers = int(cfg.get('image_workers', 2))
+            self.image_max_side = int(cfg.get('image_max_side', 1024))
+            self.image_format = str(cfg.get('image_format', 'webp'))
+            self.decorate_deadline = float(cfg.get('decorate_deadline', 3.0))
+            self.decorate_workers = int(cfg.get('decorate_workers', 2))
+            self.decorate_refill_workers = int(cfg.get('decorate_refill_workers', 1))
+            self.decorate_cache_size = int(cfg.get('decorate_cache_size', 32))
+            self.decorate_variants = int(cfg.get('decorate_variants', 3))
+            self.decorate_hot_texts = [str(x) for x in (cfg.get('decorate_hot_texts') or [])]
             self.llm = dict(cfg['llm'])
             self.api = API(config=self.llm)
         except KeyError as e:
             print(f'错误：配置缺少字段 {e}，请检查 ./config/config.yaml')
             raise SystemExit(1)
 
+    def report_metrics(self) -> str:
+        lines = [self.metrics.report()]
+        lines.append(f'每小时省掉的会话切换：{self.metrics.per_hour("nav.switch_skipped"):.1f}')
+        lines.append(f'会话列表扫描频率：{self.metrics.per_hour("recv.scan") / 3600:.2f} 次/秒')
+        interval = getattr(self.conv_watcher, 'interval', None)  # 事件模式没有固定间隔
+        if interval is not None:
+            lines.append(f'当前扫描间隔：{interval:.2f}s')
+        pauses = self.clock.pauses()
+        detail = ' / '.join(f'{k} {v:.1f}s' for k, v in sorted(pauses.items(), key=lambda kv: -kv[1]))
+        lines.append(f'拟人停顿累计：{self.clock.slept:.1f}s（{detail}）' + ('，虚拟时间' if self.clock.simulated else ''))
+        return '\n'.join(lines)
+
     def get_cursor_pos(self) -> tuple[int, int]:
-        x, y = win32api.GetCursorPos()
-        return int(x), int(y)
+        return self.backend.get_cursor_pos()
 
     def set_cursor_pos(self, x: int, y: int) -> None:
-        win32api.SetCursorPos((int(x), int(y)))
+        self.backend.set_cursor_pos(x, y)
 
     def mouse_move(self, target_xy: tuple[int, int], *, speed: float | None = None) -> None:
         """模拟人的鼠标移动：从当前位置出发，用随机、不平滑但整体朝向正确的曲线逐步移动到目标点。
@@ -145,8 +276,8 @@ class Wcf:
             px, py = 0.0, 0.0
 
         amp_base = min(28.0, max(3.0, dist * 0.12))
-        amp1 = random.uniform(-amp_base, amp_base)
-        amp2 = random.uniform(-amp_base, amp_base)
+        amp1 = self.rng.uniform(-amp_base, amp_base)
+        amp2 = self.rng.uniform(-amp_base, amp_base)
 
         c1x = sx + dx * 0.33 + px * amp1
         c1y = sy + dy * 0.33 + py * amp1
@@ -172,8 +303,8 @@ class Wcf:
 
             # “不平滑”：加入逐渐衰减的抖动（沿方向+垂直方向）
             jitter_scale = (1.0 - t)
-            j_perp = random.gauss(0.0, amp_base * 0.18) * jitter_scale
-            j_along = random.gauss(0.0, 1.5) * jitter_scale
+            j_perp = self.rng.gauss(0.0, amp_base * 0.18) * jitter_scale
+            j_along = self.rng.gauss(0.0, 1.5) * jitter_scale
 
             nx = bx + px * j_perp + (dx / dist) * j_along
             ny = by + py * j_perp + (dy / dist) * j_along
@@ -186,29 +317,23 @@ class Wcf:
                 last_x, last_y = ix, iy
 
             # 轻微的随机加减速（保持总体 duration 不变的同时让节奏更“人”）
-            sleep_dt = max(0.001, dt * random.uniform(0.7, 1.35))
-            time.sleep(sleep_dt)
+            sleep_dt = max(0.001, dt * self.rng.uniform(0.7, 1.35))
+            self.clock.sleep(sleep_dt, 'mouse')
 
             # 偶尔出现极短暂停（更像手在微调）
-            if i in (int(steps * 0.35), int(steps * 0.62)) and random.random() < 0.18:
+            if i in (int(steps * 0.35), int(steps * 0.62)) and self.rng.random() < 0.18:
                 self.wait_a_little_while()
 
         # 最后对齐到终点（此时距离极小，不会形成“瞬移到目标点”的观感）
         self.set_cursor_pos(tx, ty)
 
     def mouse_click_current_pos(self, *, button: str = 'left') -> None:
-        if button == 'left':
-            down, up = win32con.MOUSEEVENTF_LEFTDOWN, win32con.MOUSEEVENTF_LEFTUP
-        elif button == 'right':
-            down, up = win32con.MOUSEEVENTF_RIGHTDOWN, win32con.MOUSEEVENTF_RIGHTUP
-        elif button == 'middle':
-            down, up = win32con.MOUSEEVENTF_MIDDLEDOWN, win32con.MOUSEEVENTF_MIDDLEUP
-        else:
+        if button not in ('left', 'right', 'middle'):
             raise ValueError(f'unsupported mouse button: {button!r}')
 
-        win32api.mouse_event(down, 0, 0, 0, 0)
+        self.backend.mouse_down(button)
         self.wait_a_little_while()
-        win32api.mouse_event(up, 0, 0, 0, 0)
+        self.backend.mouse_up(button)
 
     def resolve_click_center(self, target: Any) -> tuple[int, int]:
         if target is None:
@@ -218,8 +343,7 @@ class Wcf:
             x, y = target
             return int(x), int(y)
 
-        if not isinstance(target, UIAWrapper) and hasattr(target, 'wrapper_object'):
-            target = target.wrapper_object()
+        target = self.backend.resolve(target)
 
         if not hasattr(target, 'rectangle'):
             raise TypeError(f'unsupported click target type: {type(target)!r}')
@@ -243,13 +367,36 @@ class Wcf:
             eps_val = 0.0
 
         if eps_val > 0:
-            x += int(round(random.uniform(-eps_val, eps_val)))
-            y += int(round(random.uniform(-eps_val, eps_val)))
+            x += int(round(self.rng.uniform(-eps_val, eps_val)))
+            y += int(round(self.rng.uniform(-eps_val, eps_val)))
 
         # 禁止瞬移：先用人类风格移动到目标点，再在当前位置点击
         self.mouse_move((int(x), int(y)))
         self.mouse_click_current_pos(button=button)
 
+    def send_keys(self, keys: str) -> None:
+        '''pywinauto send_keys 语法'''
+        self.backend.send_keys(keys)
+
+    def type_text(self, text: str, *, with_enter: bool = False) -> None:
+        type_text_humanlike(
+            text,
+            with_enter=with_enter,
+            min_interval=self.type_min_interval,
+            max_interval=self.type_max_interval,
+            send_keys=self.backend.send_keys,
+            sleep=lambda seconds: self.clock.sleep(seconds, 'type'),
+            rng=self.rng,
+        )
+
+    def paste_text(self, text: str, *, with_enter: bool = False) -> None:
+        self.backend.set_clipboard_text(text)
+        self.backend.send_keys("^v{ENTER}" if with_enter else "^v")
+
+    def paste_image(self, image_path: str, *, with_enter: bool = False) -> None:
+        self.backend.set_clipboard_image(image_path)
+        self.backend.send_keys("^v{ENTER}" if with_enter else "^v")
+
     def decorate_text(self, text: str) -> str:
         if text is None:
             return None
@@ -426,18 +573,78 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
         delta = self.eps / 2
         low = max(0.0, self.eps - delta)
         high = max(low, self.eps + delta)
-        time.sleep(random.uniform(low, high))
+        self.clock.sleep(self.rng.uniform(low, high), 'wait')
 
     def wait_a_large_while(self):
         delta = self.EPS / 2
         low = max(0.0, self.EPS - delta)
         high = max(low, self.EPS + delta)
-        time.sleep(random.uniform(low, high))
+        self.clock.sleep(self.rng.uniform(low, high), 'wait')
+
+    def window(self):
+        return self.elements.get('window', self.win.wrapper_object)
 
     def stay_focus(self):
-        self.win.set_focus()
+        def focus(win):
+            rect = win.rectangle()
+            if self.elements.check_layout((rect.left, rect.top, rect.right, rect.bottom)):
+                win = self.window()
+            win.set_focus()
+        self.elements.call('window', self.win.wrapper_object, focus)
+        self.wait_a_little_while()
+
+    def conv_rows(self):
+        '''会话列表前 listen_cnt 行'''
+        items = self.elements.call(
+            'conv_list',
+            self.conv_list_spec.wrapper_object,
+            lambda conv_list: conv_list.children(control_type="ListItem"),
+        )
+        return items[:self.listen_cnt]
+
+    def msg_items(self, last_n=None):
+        '''
+        当前会话消息列表里最后 last_n 个 ListItem，没有消息列表时返回 None。
+        snapshot 模式下返回一次性批量读取的 UINode 快照，失败时退回逐个访问的 wrapper。
+        '''
+        resolve = self._resolve_msg_list
+        try:
+            if self.msg_read_mode == 'snapshot':
+                try:
+                    with self.metrics.timer('read.snapshot'):
+                        return self.elements.call('msg_list', resolve, lambda msg_list: self.backend.snapshot_children(msg_list, last_n))
+                except LookupError:
+                    raise
+                except Exception as e:
+                    self.metrics.incr('read.snapshot_fallback')
+                    print(f'批量读取消息列表失败，改为逐个读取：{e}')
+            items = self.elements.call('msg_list', resolve, lambda msg_list: msg_list.children(control_type="ListItem"))
+        except LookupError:
+            return None
+        return items if last_n is None else items[-last_n:]
+
+    def _resolve_msg_list(self):
+        if not self.msg_list_spec.exists(timeout=self.eps):
+            raise LookupError('消息列表不存在')
+        return self.msg_list_spec.wrapper_object()
+
+    def scroll_msg_list(self, notches: int) -> None:
+        '''在消息列表上滚动鼠标滚轮，正数向上（更早的消息），负数向下'''
+        rect = self.elements.call('msg_list', self._resolve_msg_list, lambda msg_list: msg_list.rectangle())
+        x = int((rect.left + rect.right) / 2)
+        y = int((rect.top + rect.bottom) / 2)
+        self.mouse_move((x, y))
+        self.backend.scroll(x, y, int(notches))
         self.wait_a_little_while()
 
+    def dump_msg_snapshot(self, path, last_n=20) -> int:
+        '''把当前会话最后 last_n 条消息的快照存成 JSON，用作解析的测试数据，返回条数'''
+        items = self.ui.run('read', self.msg_items, last_n, priority=PRIORITY_READ)
+        if not items or not isinstance(items[0], UINode):
+            return 0
+        Path(path).write_text(dumps(items), encoding='utf-8')
+        return len(items)
+
     def init(self):
         self.click(self.chat)
         self.wait_a_little_while()
@@ -447,27 +654,37 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
         return: (chat_name, is_group, group_count_or_None)
         """
 
-        # 1) 锚点：标题栏的“聊天信息”
+        # 1) 锚点：标题栏的“聊天信息”；找到的标题栏容器缓存起来，之后只在它下面找文字
+        self.title_elem = None
+        try:
+            texts = self.elements.call(
+                'title_bar',
+                self._resolve_title_bar,
+                lambda bar: bar.descendants(control_type="Text"),
+            )
+        except LookupError:
+            return self.default_chat_name, False, None  # 只有文件传输助手才没有聊天信息
+        except Exception as e:
+            print('获取当前会话对象名称失败或者无会话对象')
+            return None, False, None
+        if not texts:
+            return None, False, None
+        self.title_elem = texts[0]  # 留着给 is_chat_open 做廉价核对
+        return self._parse_title(texts[0].window_text())
+
+    def _resolve_title_bar(self):
         info_btn = self.win.child_window(title="聊天信息", control_type="Button")
         if not info_btn.exists(timeout=self.eps):
-            return self.default_chat_name, False, None  # 只有文件传输助手才没有聊天信息
+            raise LookupError('没有聊天信息按钮')
         # 2) 找到包含标题文本的那层容器
-        info_btn = info_btn.wrapper_object()
-        bar = info_btn.parent()
-
-        texts = None
+        bar = info_btn.wrapper_object().parent()
         for _ in range(3): # 亲测 3 层就够了
-            try:
-                texts = bar.descendants(control_type="Text")  # 只取直接 children，别用 descendants
-                if texts:
-                    break
-                bar = bar.parent()
-            except Exception as e:
-                print('获取当前会话对象名称失败或者无会话对象')
-                return None, False, None
-        if not texts:
-            return None, False, None
-        title_text = texts[0].window_text()
+            if bar.descendants(control_type="Text"):
+                return bar
+            bar = bar.parent()
+        return bar
+
+    def _parse_title(self, title_text):
         # title_text 可能是 "xxx (3)" 或 "xxx"
         m = self._GROUP_RE.match(title_text)
         if not m:
@@ -477,12 +694,40 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
         is_room = count is not None
         return name, is_room, (int(count) if count else None)
 
-    def switch_to_sb(self, name):
-        # 调用时请确保已经 stay_focus 并且 init
+    def is_chat_open(self, name) -> bool:
+        '''只读一次缓存的标题控件，确认 name 的会话确实还开着'''
+        if self.current_chat_name != name:
+            return False
+        if self.title_elem is None:
+            # 没有标题控件可核对（例如默认会话文件传输助手），老老实实切换
+            return False
+        try:
+            title, _, _ = self._parse_title(self.title_elem.window_text())
+        except Exception:
+            self.title_elem = None
+            return False
+        return title == name
+
+    def switch_to_sb(self, name, force=False):
+        '''
+        调用时请确保已经 stay_focus 并且 init
+        目标会话已经开着时跳过切换；force=True 时仍然重新激活，用于读消息时顺便把小红点点掉
+        '''
         name = clean_name(name)
-        # if self.current_chat_name == name: # 牺牲一点效率，换来把小红点点掉
-        #     return
-        exist_names = self.conv_list.children(control_type="ListItem")[:self.listen_cnt]
+        if not force and self.is_chat_open(name):
+            self.metrics.incr('nav.switch_skipped')
+            return
+        if self.nav_mode == 'keyboard':
+            how = self.navigator.switch(name)
+            self.current_chat_name, self.is_room, self.room_member_cnt = self.get_current_chat_and_is_group()
+            if how != 'miss' and self.current_chat_name == name:
+                return
+            # 直接激活没有生效（例如控件不支持选中），退回拟人鼠标方式
+            self.metrics.incr('nav.fallback')
+        self._switch_to_sb_by_mouse(name)
+
+    def _switch_to_sb_by_mouse(self, name):
+        exist_names = self.conv_rows()
         for exist_name in exist_names:
             cln_name, _, _ = analysis_name(exist_name.window_text())
             if cln_name == name:
@@ -492,12 +737,7 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
                 return
         self.click(self.search)
         self.wait_a_little_while()
-        type_text_humanlike(
-            name,
-            with_enter=True,
-            min_interval=self.type_min_interval,
-            max_interval=self.type_max_interval
-        )
+        self.type_text(name, with_enter=True)
         self.wait_a_little_while()
         search_result = self.win.child_window(title="@str:IDS_FAV_SEARCH_RESULT:3780", control_type="List")
         first_result = search_result.child_window(title=name, control_type="ListItem", found_index=0).wrapper_object()
@@ -506,162 +746,283 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
         self.current_chat_name, self.is_room, self.room_member_cnt = self.get_current_chat_and_is_group()
 
     def get_friends(self):
-        with self.wx_lock:
-            self.stay_focus()
-            self.click(self.friend_list)
-            self.wait_a_little_while()
-
-            contacts = self.win.child_window(title="联系人", control_type="List")
-            if not contacts.exists(timeout=self.eps):
-                return []
-            contacts = contacts.wrapper_object()
-
-            skip_names = {
-                "新的朋友",
-                "公众号",
-                "群聊",
-                "标签",
-                "企业微信联系人",
-                "通讯录管理",
-            }
-            friends = []
-            seen = set()
-
-            last_signature = None
+        '''
+        有本地快照时立刻返回快照，再通过 UI 线程在后台分批刷新；没有快照（第一次启动）时同步爬一遍通讯录
+        刷新后好友有增删时，通过 subscribe_contacts 注册的回调收到 (added, removed)
+        '''
+        if self.contacts.load():
+            print(f'从快照加载了 {len(self.contacts.names)} 个好友，后台刷新中')
+            self.triage.set_private(self.contacts.names)
+            self.refresh_friends_async()
+            return list(self.contacts.names)
+        friends = self.ui.run('refresh_friends', self._get_friends, priority=PRIORITY_BACKGROUND)
+        if friends:
+            self.contacts.update(friends)
+        return friends
+
+    def subscribe_contacts(self, callback):
+        self.contacts.subscribe(callback)
+
+    def unsubscribe_contacts(self, callback):
+        self.contacts.unsubscribe(callback)
+
+    def set_triage(self, *, keywords=None, senders=None, ignore=None, hook=None):
+        '''
+        配置群聊预览分诊（见 Triage.py）：keywords / ignore 追加，senders 整体替换，
+        hook(preview) 返回 True / False / None 表示打开 / 跳过 / 交给默认规则
+        '''
+        if keywords is not None:
+            self.triage.add_keywords(keywords)
+        if senders is not None:
+            self.triage.set_senders(senders)
+        if ignore is not None:
+            self.triage.add_ignore(ignore)
+        if hook is not None:
+            self.triage.add_hook(hook)
+
+    def refresh_friends_async(self) -> bool:
+        if self.contacts_thread is not None and self.contacts_thread.is_alive():
+            return False
+        self.contacts_thread = Thread(
+            target=self._refresh_friends_in_background,
+            name="ContactRefreshThread",
+            daemon=True,
+        )
+        self.contacts_thread.start()
+        return True
 
+    def _refresh_friends_in_background(self):
+        # 每次只翻 contacts_pages_per_step 页，中间把 UI 让给收发消息
+        friends = []
+        page = 0
+        while True:
             try:
-                items = contacts.children(control_type="ListItem")
-                if not items:
-                    raise RuntimeError("联系人列表为空")
-                self.click(items[0])
+                names, reached_end = self.ui.run(
+                    'refresh_friends', self._read_contact_pages, page, self.contacts_pages_per_step,
+                    priority=PRIORITY_BACKGROUND,
+                )
             except Exception as e:
                 traceback.print_exc()
-                print("聚焦通讯录失败！！！", e)
-                self.init()
-                return []
-            self.wait_a_little_while()
-            send_keys("{HOME}", with_spaces=True)
-            self.wait_a_little_while()
+                print(f'后台刷新好友列表失败：{e}')
+                return
+            if names is None:
+                return
+            friends.extend(names)
+            if reached_end:
+                break
+            page += self.contacts_pages_per_step
+        self.contacts.update(friends)
 
-            while True:
-                items = contacts.children(control_type="ListItem")
-                visible_names = []
-                for item in items:
-                    try:
-                        name = clean_name(item.window_text())
-                    except Exception:
-                        continue
-                    if name:
-                        visible_names.append(name)
-                    if not name or name in skip_names or re.fullmatch(r"[A-Z#]", name):
-                        continue
-                    if name not in seen:
-                        seen.add(name)
-                        friends.append(name)
-
-                signature = visible_names[-1] if visible_names else None
-                if signature == last_signature:
-                    break
-                last_signature = signature
-                send_keys("{PGDN}", with_spaces=True)
-                self.wait_a_large_while()
-            send_keys("{HOME}", with_spaces=True)
-            self.wait_a_large_while()
+    def _get_friends(self):
+        names, _ = self._read_contact_pages(0, None)
+        return names or []
+
+    def _read_contact_pages(self, start_page: int, page_cnt: int | None):
+        '''
+        从通讯录第 start_page 页开始读 page_cnt 页（None 表示读到底），返回 (好友名列表, 是否已到底)
+        失败时返回 (None, True)
+        '''
+        self.stay_focus()
+        self.click(self.friend_list)
+        self.wait_a_little_while()
+
+        contacts = self.win.child_window(title="联系人", control_type="List")
+        if not contacts.exists(timeout=self.eps):
+            return None, True
+        contacts = contacts.wrapper_object()
+
+        skip_names = {
+            "新的朋友",
+            "公众号",
+            "群聊",
+            "标签",
+            "企业微信联系人",
+            "通讯录管理",
+        }
+        friends = []
+        seen = set()
+
+        last_signature = None
+
+        try:
+            items = contacts.children(control_type="ListItem")
+            if not items:
+                raise RuntimeError("联系人列表为空")
+            self.click(items[0])
+        except Exception as e:
+            traceback.print_exc()
+            print("聚焦通讯录失败！！！", e)
             self.init()
-            return friends
+            return None, True
+        self.wait_a_little_while()
+        self.send_keys("{HOME}")
+        self.wait_a_little_while()
+        if start_page > 0:
+            # 上一批已经读过的页快速翻过去，只在最后等它渲染
+            self.send_keys("{PGDN}" * start_page)
+            self.wait_a_large_while()
+
+        reached_end = False
+        read_pages = 0
+        while page_cnt is None or read_pages < page_cnt:
+            items = contacts.children(control_type="ListItem")
+            visible_names = []
+            for item in items:
+                try:
+                    name = clean_name(item.window_text())
+                except Exception:
+                    continue
+                if name:
+                    visible_names.append(name)
+                if not name or name in skip_names or re.fullmatch(r"[A-Z#]", name):
+                    continue
+                if name not in seen:
+                    seen.add(name)
+                    friends.append(name)
+
+            signature = visible_names[-1] if visible_names else None
+            if signature == last_signature:
+                reached_end = True
+                break
+            last_signature = signature
+            self.send_keys("{PGDN}")
+            self.wait_a_large_while()
+            read_pages += 1
+        self.send_keys("{HOME}")
+        self.wait_a_large_while()
+        self.init()
+        return friends, reached_end
         
 
     def jump_to_top_of_chatlist(self):
         return # TODO: 被动接受消息时，理论上一直会在最上面呆着，所以暂时不做处理，如果您不放心，就设置好唯一置顶，并 switch 过去
         self.switch_to_sb(self.default_chat_name)
 
-    def send_text(self, text: str, receiver: str, need_decorate: bool = True) -> int:
-        with self.wx_lock:
-            self.stay_focus()
-            receiver = clean_name(receiver)
-            try:
-                if need_decorate:
-                    decorated = self.decorate_text(text)
-                    if decorated is not None:
-                        text = decorated
-                self.switch_to_sb(receiver)
-                type_text_humanlike(
-                    text, 
-                    with_enter=True, 
-                    min_interval=self.type_min_interval, 
-                    max_interval=self.type_max_interval
-                )
-                self.wait_a_little_while()
-                self.add_new_msg(receiver, WxMsg(
-                    type=0,
-                    sender=self.wx_name,
-                    roomid=self.current_chat_name if self.is_room else None,
-                    content=text,
-                    is_meaningful=True,
-                ))
-                return 0
-            except Exception as e:
-                print(f"发送文字时报错：{e}")
-                return 1
+    def send_text(self, text: str, receiver: str, need_decorate: bool = True, urgent: bool = False, at: str | None = None) -> int:
+        '''
+        urgent=True 时（owner / 指令回复）插队到后台扫描与普通回复前面
+        at 不为空时在群里 @ 这个人，只润色正文，方便固定文本命中润色缓存
+        润色在入队之前完成，最多等 decorate_deadline 秒，超时发原文
+        '''
+        receiver = clean_name(receiver)
+        if need_decorate:
+            text = self.decorator.decorate(text)
+        if at:
+            text = '@' + at + ' ' + text
+        priority = PRIORITY_URGENT if urgent else PRIORITY_SEND
+        return self.ui.run('send_text', self._send_text, text, receiver, priority=priority, chat=receiver)
+
+    def add_hot_text(self, text: str) -> None:
+        '''登记经常发送的固定文本，第一次发送后在后台预先生成润色改写'''
+        self.decorator.add_hot_text(text)
+
+    def _send_text(self, text: str, receiver: str) -> int:
+        self.stay_focus()
+        try:
+            self.switch_to_sb(receiver)
+            self.type_text(text, with_enter=True)
+            self.wait_a_little_while()
+            self.navigator.moved_to_top(receiver)
+            self.boost_receive()
+            self.read_back(receiver)
+            return 0
+        except Exception as e:
+            print(f"发送文字时报错：{e}")
+            return 1
 
-    def send_image(self, path: str, receiver: str) -> int:
-        with self.wx_lock:
-            self.stay_focus()
-            receiver = clean_name(receiver)
-            try:
-                if not os.path.exists(path):
-                    print('发送的图片路径不存在')
-                    return 1
-                self.switch_to_sb(receiver)
-                paste_image(path, with_enter=True)
-                self.wait_a_little_while()
-                if self.enable_image_parse:
-                    img_msg = self.message_parser.get_msg_from_image(None)
-                    if img_msg:
-                        img_msg.sender = self.wx_name
-                        img_msg.roomid = self.current_chat_name if self.is_room else None
-                        self.add_new_msg(receiver, img_msg)
-                else:
-                    self.add_new_msg(receiver, WxMsg(
-                        type=1,
-                        sender=self.wx_name,
-                        roomid=self.current_chat_name if self.is_room else None,
-                        content="这是一张图片，用户未开启图片解析功能，所以无法解析。",
-                        is_meaningful=False,
-                    ))
+    def send_image(self, path: str, receiver: str, urgent: bool = False) -> int:
+        receiver = clean_name(receiver)
+        priority = PRIORITY_URGENT if urgent else PRIORITY_SEND
+        return self.ui.run('send_image', self._send_image, path, receiver, priority=priority, chat=receiver)
 
-                return 0
-            except Exception as e:
-                print(f"发送图片时报错：{e}")
+    def _send_image(self, path: str, receiver: str) -> int:
+        self.stay_focus()
+        try:
+            if not os.path.exists(path):
+                print('发送的图片路径不存在')
                 return 1
+            self.switch_to_sb(receiver)
+            self.paste_image(path, with_enter=True)
+            self.wait_a_little_while()
+            self.boost_receive()
+            self.read_back(receiver)
+            return 0
+        except Exception as e:
+            print(f"发送图片时报错：{e}")
+            return 1
 
     def get_msg(self, timeout=1.0):
-        '''获取来信者的最新一条消息'''
+        '''按到达顺序逐条获取新消息，返回 (chat_name, WxMsg)，msg.seq 是会话内序号'''
+        with self.new_msg_queue_lock:
+            if self.pending_msgs:
+                return self.pending_msgs.popleft()
         try:
-            new_msg_name = self.new_msg_queue.get(timeout=timeout)
+            new_msg_name, msgs = self.new_msg_queue.get(timeout=timeout)
         except queue.Empty:
             return None, None
         with self.new_msg_queue_lock:
-            return new_msg_name, self.msg_cache.get(new_msg_name, [None])[-1]
+            self.pending_msgs.extend((new_msg_name, msg) for msg in msgs[1:])
+            return new_msg_name, msgs[0]
+
+    def get_msgs(self, max_batch=64, timeout=1.0) -> dict:
+        '''
+        一次取走队列里的新消息（最多 max_batch 条），返回 {chat_name: [WxMsg...]}：
+        按会话分组，组内按到达顺序，会话按第一条消息到达的顺序；等 timeout 秒仍没有新消息时返回 {}
+        '''
+        batch = {}
+        cnt = 0
+        with self.new_msg_queue_lock:
+            while self.pending_msgs and cnt < max_batch:
+                name, msg = self.pending_msgs.popleft()
+                batch.setdefault(name, []).append(msg)
+                cnt += 1
+        wait = timeout if not batch else None
+        while cnt < max_batch:
+            try:
+                if wait is not None:
+                    name, msgs = self.new_msg_queue.get(timeout=wait)
+                    wait = None
+                else:
+                    name, msgs = self.new_msg_queue.get_nowait()
+            except queue.Empty:
+                break
+            take = msgs[:max_batch - cnt]
+            batch.setdefault(name, []).extend(take)
+            cnt += len(take)
+            if len(take) < len(msgs):
+                with self.new_msg_queue_lock:
+                    # 超出 max_batch 的留给下一次，下一次会先取 pending_msgs
+                    self.pending_msgs.extend((name, msg) for msg in msgs[len(take):])
+        if cnt:
+            self.metrics.incr('recv.delivered', cnt)
+        return batch
 
     def get_msg_list(self, timeout=1.0):
         '''获取与来信者的最新 memory_len 条聊天记录，不区分哪些是新消息'''
+        with self.new_msg_queue_lock:
+            if self.pending_msgs:
+                new_msg_name, _ = self.pending_msgs.popleft()
+                # 同一批的其余消息已经包含在聊天记录里
+                while self.pending_msgs and self.pending_msgs[0][0] == new_msg_name:
+                    self.pending_msgs.popleft()
+                return new_msg_name, self.msg_cache.messages(new_msg_name)
         try:
-            new_msg_name = self.new_msg_queue.get(timeout=timeout)
+            new_msg_name, _ = self.new_msg_queue.get(timeout=timeout)
         except queue.Empty:
             return None, None
         with self.new_msg_queue_lock:
-            return new_msg_name, list(self.msg_cache.get(new_msg_name, []))
+            return new_msg_name, self.msg_cache.messages(new_msg_name)
 
     def is_msg_from_me(self, msg: WxMsg) -> bool:
         if msg is None:
             return False
         return msg.sender == self.wx_name
 
-    def parse_single_msg(self, item):
+    def parse_single_msg(self, item, include_offscreen=False):
         # print_descendants(item)
         # print('\n')
-        if not item.is_visible():
+        offscreen = not item.is_visible()
+        if offscreen and not include_offscreen:
             return None
         btns = item.descendants(control_type="Button")
         try:
@@ -674,8 +1035,12 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
             if not self.enable_image_parse:
                 res = WxMsg(type=1, content="这是一张图片，用户未开启图片解析功能，所以无法解析。", is_meaningful=False, sender=sender)
                 return res
-            if not isinstance(item, UIAWrapper):
-                item = item.wrapper_object()
+            if offscreen:
+                # 追赶读取时滚出可见区域的图片没法右键复制
+                res = WxMsg(type=1, content="这是一张图片，读取时不在可见区域，所以无法解析。", is_meaningful=False, sender=sender)
+                res.roomid = self.current_chat_name if self.is_room else None
+                return res
+            item = self.backend.resolve(item)
             # 扭曲的找图片方法
             # 1) 找所有 Button
             try:
@@ -698,12 +1063,11 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
             res.roomid = self.current_chat_name if self.is_room else None
         return res
 
-    def get_latest_n_msg(self, n=1):
-        msg_list = self.msg_list
-        if not msg_list.exists(timeout=self.eps):
+    def get_latest_n_msg(self, n=1, include_offscreen=False):
+        # 日期分隔、系统提示这类条目解析不出消息，多取一些
+        items = self.msg_items(last_n=n * 2 + 2)
+        if items is None:
             return None
-        msg_list = msg_list.wrapper_object()
-        items = msg_list.children(control_type="ListItem")
         if not items:
             print(f"当前会话消息为空")
             return None
@@ -712,7 +1076,7 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
             if len(msgs) >= n:
                 break
             try:
-                res = self.parse_single_msg(it)
+                res = self.parse_single_msg(it, include_offscreen=include_offscreen)
                 if res:
                     msgs.append(res)
             except Exception as e:
@@ -721,93 +1085,199 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
         msgs.reverse()
         return msgs
 
-    def is_new_msg(self, name, msg):
-        if name not in self.msg_cache:
-            self.msg_cache[name] = []
-            return True
-        if msg not in self.msg_cache[name]:
-            return True
-        return False
-
     def add_new_msg(self, name, msg):
-        if name not in self.msg_cache:
-            self.msg_cache[name] = []
-        self.msg_cache[name].append(msg)
-
-    def check_memory_len(self, name):
-        if name not in self.msg_cache:
-            self.msg_cache[name] = []
-        while len(self.msg_cache[name]) > self.memory_len:
-            self.msg_cache[name].pop(0)
+        self.msg_cache.append(name, msg)
 
     def get_latest_msg_in_cache(self, name):
-        if name not in self.msg_cache:
-            self.msg_cache[name] = []
-        if len(self.msg_cache[name]) == 0:
-            return None
-        return self.msg_cache[name][-1]
+        return self.msg_cache.latest(name)
 
     def get_new_msgs_from_person(self, new_msg_name, possible_new_msg_cnt):
-        self.switch_to_sb(new_msg_name)
-        possible_new_msgs = self.get_latest_n_msg(n=min(possible_new_msg_cnt, self.max_new_msg_cnt))
-        if not possible_new_msgs:
+        # 有未读标记才会来读，这里强制激活一次，由扫描循环负责把小红点点掉
+        self.switch_to_sb(new_msg_name, force=True)
+        self.read_into_cache(new_msg_name, possible_new_msg_cnt)
+
+    def read_back(self, name):
+        '''
+        发送之后从界面读回当前会话的末尾，而不是把发出的消息直接追加到缓存：
+        发送前切到这个会话会把刚到的消息的小红点点掉，扫描再也看不到它们；
+        直接追加还会让缓存和界面顺序不一致，之后按重叠对齐时把它们当成旧消息，消息就丢了。
+        '''
+        try:
+            self.read_into_cache(name, 1)
+        except Exception as e:
+            print(f'发送后读取 {name} 的消息出错：{e}')
+
+    def read_into_cache(self, new_msg_name, possible_new_msg_cnt):
+        '''读出当前会话里缓存之后的消息，追加到缓存，别人发的放进新消息队列'''
+        new_msgs = self.catch_up(new_msg_name, possible_new_msg_cnt)
+        if not new_msgs:
             return
-        is_new_msg = False
-        latest_cached_msg = self.get_latest_msg_in_cache(new_msg_name)
-        for possible_new_msg in possible_new_msgs:
-            if possible_new_msg == None:
-                continue
-            if latest_cached_msg and latest_cached_msg == possible_new_msg:
-                break
-            if not self.is_new_msg(new_msg_name, possible_new_msg):
-                continue
+        emit = []
+        for msg in new_msgs:
+            self.add_new_msg(new_msg_name, msg)
             print("新消息！！！")
-            possible_new_msg.show()
-            self.add_new_msg(new_msg_name, possible_new_msg)
-            self.check_memory_len(new_msg_name)
-            latest_cached_msg = possible_new_msg
-            is_new_msg = True
-        latest_msg = self.get_latest_msg_in_cache(new_msg_name)
-        if is_new_msg and latest_msg and not self.is_msg_from_me(latest_msg):
+            msg.show()
+            if not self.is_msg_from_me(msg):
+                emit.append(msg)
+        if emit:
             with self.new_msg_queue_lock:
-                print(f"{new_msg_name}传来新消息！！！")
-                self.new_msg_queue.put(new_msg_name)
+                print(f"{new_msg_name}传来 {len(emit)} 条新消息！！！")
+                self.new_msg_queue.put((new_msg_name, emit))
 
+    def catch_up(self, name, unread_cnt):
+        '''
+        读出 name 的全部新消息（按时间顺序）：读取窗口里要能找到缓存中最后几条消息作为锚点，
+        找不到就把消息列表往上滚，把窗口扩大一倍再读，直到找到锚点、列表到顶或用完 catchup_budget 秒。
+        未读数不超过 max_new_msg_cnt 时一般第一次就能对齐，不用滚动。
+        '''
+        start = self.clock.perf_counter()  # 滚动和等待都走 clock，预算按同一个时钟算
+        has_history = self.msg_cache.latest(name) is not None
+        want = max(1, unread_cnt) + 2  # 多读两条，用来和缓存对齐
+        scrolled = 0
+        last_len = -1
+        msgs = []
+        try:
+            while True:
+                msgs = self.get_latest_n_msg(n=want, include_offscreen=scrolled > 0) or []
+                cut = self.msg_cache.align(name, msgs, expected=unread_cnt)
+                if cut is not None:
+                    new_msgs = msgs[cut:]
+                    break
+                if not has_history:
+                    new_msgs = msgs[-unread_cnt:] if unread_cnt > 0 else msgs[-1:]
+                    if len(msgs) >= unread_cnt:
+                        break
+                if len(msgs) == last_len or self.clock.perf_counter() - start > self.catchup_budget:
+                    # 列表到顶或时间用完：只能按未读数截取，中间可能有缺口
+                    self.metrics.incr('read.catchup_gap')
+                    new_msgs = msgs[-unread_cnt:] if unread_cnt > 0 else []
+                    break
+                last_len = len(msgs)
+                if len(msgs) >= want:
+                    want *= 2
+                self.scroll_msg_list(self.catchup_scroll_step)
+                scrolled += self.catchup_scroll_step
+                self.metrics.incr('read.catchup_scroll')
+        finally:
+            if scrolled:
+                self.scroll_msg_list(-scrolled * 2) # 回到底部，多滚一些也没关系
+                self.metrics.observe('read.catchup', self.clock.perf_counter() - start)
+        return new_msgs
+
+    def scan_conv_list(self):
+        '''
+        扫描会话列表前 listen_cnt 行，返回需要读取的 [(name, new_msg_cnt, row_text)]
+        只处理与上一次快照相比文字发生变化的行，未读数多的优先，同样多时先处理排在下面（等得更久）的
+        '''
+        # 当前聊天似乎没必要特殊处理，因为当前发来也会有未读消息显示，只要不移动鼠标的话
+        self.stay_focus()
+        self.jump_to_top_of_chatlist()
+        rows = self.conv_rows()
+        snapshot = [row.window_text() for row in rows]
+
+        unread = []
+        deferred = set()
+        for pos, text in enumerate(snapshot):
+            if text in self.conv_snapshot:
+                continue
+            parsed_name, _, new_msg_cnt = analysis_name(text)
+            if new_msg_cnt <= 0:
+                continue
+            # 看一眼预览再决定要不要切过去；跳过的行留在快照里，文字变了（又来新消息）才重新判断
+            decision = self.triage.decide(self.row_preview(rows[pos], parsed_name, new_msg_cnt))
+            if decision == OPEN:
+                unread.append((-new_msg_cnt, -pos, parsed_name, text))
+            elif decision == DEFER:
+                deferred.add(text)
+        self.conv_snapshot = set(snapshot) - deferred
+        self.navigator.index_rows(snapshot)
+        return [(parsed_name, -neg_cnt, text) for neg_cnt, _, parsed_name, text in sorted(unread)]
+
+    def row_preview(self, row, name, unread) -> RowPreview:
+        '''会话列表一行的预览；没开分诊时不读子控件'''
+        if not self.triage.enable:
+            return RowPreview(name, unread, None, '', False)
+        try:
+            texts = [t.window_text() for t in self.backend.snapshot_element(row).descendants(control_type="Text")]
+        except Exception:
+            texts = [t.window_text() for t in row.descendants(control_type="Text")]
+        return parse_preview(name, unread, texts)
 
     def get_new_msg(self):
         '''
-        获取一个未读消息的人，直接放到队列里，不返回新消息，只返回错误码
-        TODO: 处理这个消息需要时间，所以目前想法只能一个一个处理，不然可能会读取过时的消息列表？
+        把所有有未读消息的人的新消息一次性放到队列里，不返回新消息，只返回错误码
+        扫描和每个会话的读取都是单独的 UI 操作，中间可以插入 owner / 指令的回复
         '''
-        with self.wx_lock:
+        try:
+            # 先做一次廉价探测，和上次干净扫描时一样就不用置前窗口、逐行读会话列表
+            if not self.ui.run('probe', self.unread_gate.should_scan, priority=PRIORITY_SCAN):
+                return 0
+            unread = self.ui.run('scan', self.scan_conv_list, priority=PRIORITY_SCAN)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"获取新消息出现错误：{e}")
+            return -1
+        self.unread_gate.scanned(bool(unread))
+        if not unread:
+            return 0
+
+        futures = []
+        for parsed_name, new_msg_cnt, text in unread:
+            # 处理过的行从快照里拿掉：下次哪怕出现一模一样的“N条新消息”文字也要重新处理
+            self.conv_snapshot.discard(text)
+            futures.append((parsed_name, self.ui.submit(
+                'read_chat', self.get_new_msgs_from_person, parsed_name, new_msg_cnt,
+                priority=PRIORITY_READ, chat=parsed_name,
+            )))
+        res = 1
+        for parsed_name, future in futures:
             try:
-                # 当前聊天似乎没必要特殊处理，因为当前发来也会有未读消息显示，只要不移动鼠标的话
-                self.stay_focus()
-                self.jump_to_top_of_chatlist()
-                names = self.conv_list.children(control_type="ListItem")[:self.listen_cnt]
-                for name in names:
-                    parsed_name, _, new_msg_cnt = analysis_name(name.window_text())
-                    if new_msg_cnt > 0:
-                        self.get_new_msgs_from_person(parsed_name, new_msg_cnt)
-                        return 1
+                future.result()
             except Exception as e:
-                traceback.print_exc()
-                print(f"获取新消息出现错误：{e}")
-                return -1
-            return 0
+                traceback.print_exception(e)
+                print(f"获取 {parsed_name} 的新消息出现错误：{e}")
+                res = -1
+        return res
+
+    def boost_receive(self) -> None:
+        '''刚回复过，对方很可能马上回话：自适应轮询回到最短间隔'''
+        if self.conv_watcher is not None:
+            self.conv_watcher.boost()
 
     def listening_to_new_msg(self):
+        # disable_receive_msg 会把 self.conv_watcher 换成 None，这个线程只用启动时的那个
+        watcher = self.conv_watcher
+        last_scan = self.clock.perf_counter()
         while not self.recv_stop_event.is_set():
             res = self.get_new_msg()
+            now = self.clock.perf_counter()
+            self.metrics.incr('recv.scan')
+            if res == 1:
+                # 扫到新消息时距上一次扫描过了多久：只是扫描间隔，不是消息从到达到被发现的延迟
+                # （消息可能在这段时间里的任何时刻到达），不要拿它当检测延迟比较轮询和事件模式
+                self.metrics.observe('recv.scan_gap_on_hit', now - last_scan)
+            last_scan = now
+            watcher.scanned(res == 1)
             # if res == 0:
             #     if self.current_chat_name != self.default_chat_name:
             #         self.switch_to_sb(self.default_chat_name)
-            self.recv_stop_event.wait(self.listen_msg_interval)
+            # 事件模式下没有通知就一直睡，event_fallback_interval 只是防止漏掉事件的兜底扫描；
+            # 轮询模式按 watcher 自己的间隔睡，不受兜底间隔限制
+            fallback = self.event_fallback_interval if watcher.mode == 'event' else None
+            watcher.wait_change(fallback)
 
     def enable_receive_msg(self):
         if self.recv_thread is not None and self.recv_thread.is_alive():
             return False
         self.recv_stop_event.clear()
+        if self.conv_watcher is None:
+            self.conv_watcher = build_conv_watcher(
+                self.receive_mode,
+                interval=self.listen_msg_interval,
+                get_element=lambda: self.elements.get('conv_list', self.conv_list_spec.wrapper_object),
+                adaptive=self.adaptive_poll,
+                clock=self.clock.time,
+            )
         self.recv_thread = Thread(
             target=self.listening_to_new_msg,
             name="MsgReceiveThread",
@@ -820,7 +1290,11 @@ Emoji 表情：可以根据文本内容和语气，在句末或句中恰当地
         if self.recv_thread is None:
             return False
         self.recv_stop_event.set()
+        watcher = self.conv_watcher
+        if watcher is not None:
+            watcher.stop()  # 叫醒正在 wait_change 的接收线程
         self.recv_thread.join(timeout=timeout)
+        self.conv_watcher = None
         return True
 
 
@@ -1,11 +1,40 @@
 import hashlib
+import sys
 
 try:
     from .utils import zip_text
 except ImportError:
     from utils import zip_text
 
+
+class ContentRef:
+    """
+    大块内容（例如图片的 data URL）的引用：内容放在消息对象外面，只有真正访问 msg.content 时才通过 loader 取回。
+    key 需要能唯一代表内容（例如内容摘要），消息的签名 / 哈希只用 key，不碰大块内容。
+    """
+
+    __slots__ = ('key', 'loader', 'size')
+
+    def __init__(self, key: str, loader, size: int = 0):
+        self.key = key
+        self.loader = loader  # () -> str
+        self.size = size
+
+    def resolve(self):
+        return self.loader()
+
+    @property
+    def ident(self):
+        """参与消息签名 / 哈希的标识，必须立刻可得；默认就是 key"""
+        return self.key
+
+    def __repr__(self):
+        return f'<ContentRef {self.key[:12]} size={self.size}>'
+
+
 class WxMsg:
+    __slots__ = ('type', 'sender', 'roomid', '_content', 'is_meaningful', 'seq', '_hash_id')
+
     def __init__(
             self,
             type = 5,
@@ -17,16 +46,50 @@ class WxMsg:
         self.type = type       # 0->文本; 1->图片; 2->视频; 3->表情; -1->链接等其他，TODO: 暂时只支持文本和图片
         self.sender = sender
         self.roomid = roomid
-        self.content = content
+        self.content = content # str，或者 ContentRef（大块内容放在对象外面）
         self.is_meaningful = is_meaningful
-        self.hash_id = self._build_hash_id()
+        self.seq = None        # 会话内序号，进缓存时由 MsgCache 分配；不参与签名 / 哈希
+
+    def __setattr__(self, name, value):
+        # 同一个人 / 群的名字会出现在成千上万条消息里，驻留后只存一份
+        if name in ('sender', 'roomid') and type(value) is str:
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+        if name not in ('_hash_id', 'seq'):
+            # 解析器会在构造之后才补 sender / roomid，任何字段变化都让哈希重新计算
+            object.__setattr__(self, '_hash_id', None)
+
+    @property
+    def content(self):
+        c = self._content
+        if isinstance(c, ContentRef):
+            return c.resolve()
+        return c
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    @property
+    def content_ref(self):
+        c = self._content
+        return c if isinstance(c, ContentRef) else None
+
+    @property
+    def hash_id(self) -> str:
+        h = self._hash_id
+        if h is None:
+            h = self._build_hash_id()
+            object.__setattr__(self, '_hash_id', h)
+        return h
 
     def _signature(self):
+        c = self._content
         return (
             self.type,
             self.sender,
             self.roomid,
-            self.content,
+            ('ref', c.ident) if isinstance(c, ContentRef) else c,
             self.is_meaningful,
         )
 
@@ -40,7 +103,7 @@ class WxMsg:
         return False
 
     def __hash__(self):
-        return hash(self._signature())
+        return hash(self.hash_id)
 
     def from_group(self) -> bool:
         return self.roomid is not None
@@ -50,4 +113,48 @@ class WxMsg:
         raise NotImplementedError()
 
     def show(self):
-        print(f'type: {self.type} | sender: {self.sender} | roomid: {self.roomid} | content: {zip_text(self.content)} | hash_id: {self.hash_id}')
\ No newline at end of file
+        ref = self.content_ref
+        content = repr(ref) if ref is not None else zip_text(self.content)
+        print(f'seq: {self.seq} | type: {self.type} | sender: {self.sender} | roomid: {self.roomid} | content: {content} | hash_id: {self.hash_id}')
+
+
+if __name__ == '__main__':
+    import base64
+    import os
+    import time
+    import tracemalloc
+
+    n = 2000
+    png = base64.b64encode(os.urandom(750_000)).decode('ascii')
+    data_url = f'data:image/png;base64,{png}'
+    digest = hashlib.sha1(data_url.encode('ascii')).hexdigest()
+
+    def build(kind, fresh=False):
+        if kind == 'text':
+            return WxMsg(type=0, sender='张三', roomid='相亲相爱一家人', content='今晚吃什么')
+        if kind == 'image':
+            # fresh=True 时每条消息持有自己的一份 data URL，和真实接收时一样
+            return WxMsg(type=1, sender='张三', roomid='相亲相爱一家人', content=(data_url + '.')[:-1] if fresh else data_url)
+        return WxMsg(type=1, sender='张三', roomid='相亲相爱一家人', content=ContentRef(digest, lambda: data_url))
+
+    print(f'{"类型":>10} {"构造 (us)":>10} {"构造+哈希 (us)":>15} {"内存/条 (B)":>12}')
+    for kind in ('text', 'image', 'image_ref'):
+        start = time.perf_counter()
+        for _ in range(n):
+            build(kind)
+        build_us = (time.perf_counter() - start) / n * 1e6
+
+        start = time.perf_counter()
+        for _ in range(n):
+            build(kind).hash_id
+        hash_us = (time.perf_counter() - start) / n * 1e6
+
+        mem_n = 50
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        keep = [build(kind, fresh=True) for _ in range(mem_n)]
+        for m in keep:
+            m.hash_id
+        per_msg = (tracemalloc.get_traced_memory()[0] - before) / mem_n
+        tracemalloc.stop()
+        print(f'{kind:>10} {build_us:>10.2f} {hash_us:>15.2f} {per_msg:>12.0f}')
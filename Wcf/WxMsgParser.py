@@ -1,15 +1,15 @@
 import base64
 import io
-import os
 import re
 from dataclasses import dataclass
 from typing import Optional, List
-from PIL import Image, ImageGrab
 
 try:
     from .WxMsg import WxMsg
+    from .utils import grab_clipboard_raw
 except ImportError:
     from WxMsg import WxMsg
+    from utils import grab_clipboard_raw
 
 
 class WxMsgParser:
@@ -23,7 +23,9 @@ class WxMsgParser:
       -2 = 假消息
     """
 
-    def __init__(self):
+    def __init__(self, image_store=None, backend=None):
+        self.image_store = image_store  # 有仓库时图片只在 UI 线程上取剪贴板原始字节，其余在后台完成
+        self.backend = backend  # 剪贴板从 UI 后端读，没有后端时直接读 Windows 剪贴板
         self.BRACKET = re.compile(r"^\[[^\]]+\]$")
         self.TIME_ONLY = re.compile(r"^\d{1,2}:\d{2}$")
         self.DATE_ONLY = re.compile(
@@ -91,6 +93,15 @@ class WxMsgParser:
         )
 
     def get_msg_from_image(self, item) -> Optional[WxMsg]:
+        if self.image_store is not None:
+            raw = self._grab_clipboard_raw()
+            if raw is None:
+                print("[消息解析失败] get_msg_from_image：图片不在剪切板")
+                return None
+            return WxMsg(
+                type=1,
+                content=self.image_store.ingest(raw)
+            )
         data_url = self._image_from_clipboard_to_data_url()
         if not data_url:
             print("[消息解析失败] get_msg_from_image：图片不在剪切板")
@@ -173,24 +184,27 @@ class WxMsgParser:
 
         return "\n".join(filtered).strip()
 
+    def _grab_clipboard_raw(self):
+        '''只取剪贴板里的原始数据，不解码：('dib', bytes) 或 ('file', path)'''
+        if self.backend is not None:
+            return self.backend.grab_clipboard_raw()
+        return grab_clipboard_raw()
+
     def _image_from_clipboard_to_data_url(self) -> Optional[str]:
-        if ImageGrab is None:
+        raw = self._grab_clipboard_raw()
+        if raw is None:
             return None
         try:
-            clip = ImageGrab.grabclipboard()
-            if clip is None:
-                return None
-            # ~/Documents/WeChat Files/wxid_xxx/FileStorage/Temp/abcd.jpg
-            if isinstance(clip, list):
-                if not clip:
-                    return None
-                path = clip[0]
-                if not isinstance(path, str) or not os.path.isfile(path):
-                    return None
-                im = Image.open(path)
-                im.load()
+            from PIL import Image, BmpImagePlugin
+        except ImportError:
+            return None
+        try:
+            kind, data = raw
+            if kind == 'dib':
+                im = BmpImagePlugin.DibImageFile(io.BytesIO(data))
             else:
-                im = clip
+                im = Image.open(data)
+            im.load()
             buf = io.BytesIO()
             im.save(buf, format="PNG")
             b64 = base64.b64encode(buf.getvalue()).decode("ascii")
@@ -0,0 +1,13 @@
+from .base import UIBackend
+from .clock import RealClock, VirtualClock, build_clock
+
+
+def build_backend(kind: str = 'pywinauto', **kwargs) -> UIBackend:
+    '''pywinauto：真实的 Windows 微信；sim：内存里的模拟微信（见 simulator.py）'''
+    if kind == 'pywinauto':
+        from .pywinauto_backend import PywinautoBackend
+        return PywinautoBackend(**kwargs)
+    if kind == 'sim':
+        from .simulator import SimBackend
+        return SimBackend(**kwargs)
+    raise ValueError(f'unknown ui backend: {kind!r}')
@@ -0,0 +1,91 @@
+try:
+    from ..UISnapshot import UINode
+except ImportError:
+    from UISnapshot import UINode
+
+from .clock import RealClock
+
+
+class UIBackend:
+    """
+    Wcf 用到的全部 UI 原语：找窗口、读列表、鼠标、键盘、剪贴板。
+
+    控件对象只需要提供 pywinauto wrapper 的那几个方法：window_text / children / descendants /
+    element_info.name / rectangle / is_visible / parent / set_focus / select / click_input；
+    connect() 返回的窗口描述还要支持 child_window(title=, control_type=, found_index=) / exists(timeout) / wrapper_object()。
+    所有等待都走 self.clock，换成 VirtualClock 就不再真的 sleep。
+    """
+
+    name = 'base'
+
+    def __init__(self, clock=None):
+        self.clock = clock if clock is not None else RealClock()
+
+    # ---- 窗口 ----
+    def connect(self):
+        """连接微信，返回主窗口的描述（spec）"""
+        raise NotImplementedError
+
+    def resolve(self, target):
+        """spec -> 控件；已经是控件时原样返回"""
+        return target
+
+    # ---- 批量读取：默认逐个访问后转成 UINode，真实 UIA 后端会换成缓存请求 ----
+    def snapshot_children(self, elem, last_n=None) -> list:
+        items = elem.children(control_type="ListItem")
+        if last_n is not None:
+            items = items[-int(last_n):] if last_n else []
+        return [to_uinode(c) for c in items]
+
+    def snapshot_element(self, elem) -> UINode:
+        return to_uinode(elem)
+
+    def child_names(self, elem, first_n=None) -> list:
+        items = elem.children()
+        if first_n is not None:
+            items = items[:int(first_n)]
+        return [c.window_text() for c in items]
+
+    # ---- 鼠标 ----
+    def get_cursor_pos(self) -> tuple[int, int]:
+        raise NotImplementedError
+
+    def set_cursor_pos(self, x: int, y: int) -> None:
+        raise NotImplementedError
+
+    def mouse_down(self, button: str = 'left') -> None:
+        raise NotImplementedError
+
+    def mouse_up(self, button: str = 'left') -> None:
+        raise NotImplementedError
+
+    def scroll(self, x: int, y: int, notches: int) -> None:
+        """在 (x, y) 滚动鼠标滚轮，正数向上"""
+        raise NotImplementedError
+
+    # ---- 键盘：pywinauto send_keys 语法 ----
+    def send_keys(self, keys: str) -> None:
+        raise NotImplementedError
+
+    # ---- 剪贴板 ----
+    def set_clipboard_text(self, text: str) -> None:
+        raise NotImplementedError
+
+    def set_clipboard_image(self, image_path: str) -> None:
+        raise NotImplementedError
+
+    def grab_clipboard_raw(self):
+        """剪贴板里的原始图片数据：('dib', bytes) 或 ('file', path)，没有时返回 None"""
+        raise NotImplementedError
+
+
+def to_uinode(elem) -> UINode:
+    """逐个访问任意 wrapper 风格的控件，转成 UINode 快照"""
+    r = elem.rectangle()
+    return UINode(
+        name=elem.window_text(),
+        control_type=elem.element_info.control_type,
+        rect=(r.left, r.top, r.right, r.bottom),
+        visible=elem.is_visible(),
+        children=[to_uinode(c) for c in elem.children()],
+    )
@@ -0,0 +1,84 @@
+import time
+from threading import Lock
+
+
+class _PauseLog:
+    """按类别累计 sleep 的时长（wait / mouse / type / ...），也就是拟人节奏花掉的 UI 时间"""
+
+    def __init__(self):
+        self.slept = 0.0
+        self.by_kind = {}
+        self._lock = Lock()
+
+    def _record(self, seconds: float, kind: str) -> None:
+        with self._lock:
+            self.slept += seconds
+            self.by_kind[kind] = self.by_kind.get(kind, 0.0) + seconds
+
+    def pauses(self) -> dict:
+        with self._lock:
+            return dict(self.by_kind)
+
+
+class RealClock(_PauseLog):
+    """真实时间：sleep 真的等待"""
+
+    simulated = False
+
+    def time(self) -> float:
+        return time.time()
+
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float, kind: str = 'other') -> None:
+        if seconds > 0:
+            self._record(seconds, kind)
+            time.sleep(seconds)
+
+
+class VirtualClock(_PauseLog):
+    """
+    虚拟时间：sleep 只把时间往前拨，不真的等待，拟人化的停顿在基准测试里不再耗费墙钟时间。
+    slept / pauses() 是这些停顿在真实环境里要花掉的时间。
+    """
+
+    simulated = True
+
+    def __init__(self, start: float = 1_700_000_000.0):
+        super().__init__()
+        self._now = float(start)
+
+    def time(self) -> float:
+        return self._now
+
+    def perf_counter(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float, kind: str = 'other') -> None:
+        if seconds <= 0:
+            return
+        self._record(seconds, kind)
+        with self._lock:
+            self._now += seconds
+
+    def advance(self, seconds: float) -> None:
+        """外部事件（例如模拟的消息到达）推进时间，不计入 slept"""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._now += seconds
+
+    def advance_to(self, t: float) -> None:
+        """拨到时刻 t；已经过了就不动"""
+        with self._lock:
+            self._now = max(self._now, float(t))
+
+
+def build_clock(kind: str = 'real'):
+    '''real：真实时间；virtual：虚拟时间，只用于模拟器和回放'''
+    if kind == 'virtual':
+        return VirtualClock()
+    if kind == 'real':
+        return RealClock()
+    raise ValueError(f'unknown clock: {kind!r}')
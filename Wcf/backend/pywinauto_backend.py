@@ -0,0 +1,92 @@
+from .base import UIBackend
+
+try:
+    from .. import UISnapshot
+    from .. import utils
+except ImportError:
+    import UISnapshot
+    import utils
+
+
+class PywinautoBackend(UIBackend):
+    """真实的 Windows 微信：pywinauto (UIA) + win32api + 剪贴板；这些依赖都在用到时才导入"""
+
+    name = 'pywinauto'
+
+    def __init__(self, clock=None, exe_path: str = "WeChat.exe"):
+        super().__init__(clock)
+        self.exe_path = exe_path
+        self.app = None
+
+    def connect(self):
+        from pywinauto.application import Application
+
+        self.app = Application(backend="uia").connect(path=self.exe_path)
+        return self.app.window(title="微信", control_type="Window")
+
+    def resolve(self, target):
+        from pywinauto.controls.uiawrapper import UIAWrapper
+
+        if not isinstance(target, (UIAWrapper, UISnapshot.UINode)) and hasattr(target, 'wrapper_object'):
+            return target.wrapper_object()
+        return target
+
+    def snapshot_children(self, elem, last_n=None) -> list:
+        return UISnapshot.snapshot_children(elem, last_n)
+
+    def snapshot_element(self, elem):
+        return UISnapshot.snapshot_element(elem)
+
+    def child_names(self, elem, first_n=None) -> list:
+        return UISnapshot.child_names(elem, first_n)
+
+    def get_cursor_pos(self) -> tuple[int, int]:
+        import win32api
+
+        x, y = win32api.GetCursorPos()
+        return int(x), int(y)
+
+    def set_cursor_pos(self, x: int, y: int) -> None:
+        import win32api
+
+        win32api.SetCursorPos((int(x), int(y)))
+
+    def _mouse_flags(self, button: str):
+        import win32con
+
+        if button == 'left':
+            return win32con.MOUSEEVENTF_LEFTDOWN, win32con.MOUSEEVENTF_LEFTUP
+        if button == 'right':
+            return win32con.MOUSEEVENTF_RIGHTDOWN, win32con.MOUSEEVENTF_RIGHTUP
+        if button == 'middle':
+            return win32con.MOUSEEVENTF_MIDDLEDOWN, win32con.MOUSEEVENTF_MIDDLEUP
+        raise ValueError(f'unsupported mouse button: {button!r}')
+
+    def mouse_down(self, button: str = 'left') -> None:
+        import win32api
+
+        win32api.mouse_event(self._mouse_flags(button)[0], 0, 0, 0, 0)
+
+    def mouse_up(self, button: str = 'left') -> None:
+        import win32api
+
+        win32api.mouse_event(self._mouse_flags(button)[1], 0, 0, 0, 0)
+
+    def scroll(self, x: int, y: int, notches: int) -> None:
+        from pywinauto import mouse
+
+        mouse.scroll(coords=(int(x), int(y)), wheel_dist=int(notches))
+
+    def send_keys(self, keys: str) -> None:
+        from pywinauto.keyboard import send_keys
+
+        send_keys(keys, pause=0, with_spaces=True)
+
+    def set_clipboard_text(self, text: str) -> None:
+        utils.set_clipboard_text(text)
+
+    def set_clipboard_image(self, image_path: str) -> None:
+        utils.set_clipboard_image(image_path)
+
+    def grab_clipboard_raw(self):
+        return utils.grab_clipboard_raw()
@@ -0,0 +1,714 @@
+import re
+import time
+from collections import Counter, deque
+from threading import RLock
+
+try:
+    from ..UISnapshot import Rect
+except ImportError:
+    from UISnapshot import Rect
+
+from .base import UIBackend
+from .clock import VirtualClock
+
+
+# 模拟窗口的布局（像素），只要求各区域互不重叠、点击能落到对应控件上
+WINDOW = Rect(0, 0, 1000, 720)
+CHAT_BUTTON = Rect(10, 70, 50, 110)
+CONTACTS_BUTTON = Rect(10, 130, 50, 170)
+SEARCH_EDIT = Rect(70, 20, 290, 50)
+SIDE_LIST = Rect(60, 60, 310, 720)   # 会话列表 / 通讯录
+ROW_H = 64
+SEARCH_RESULT = Rect(70, 50, 290, 500)
+RESULT_H = 50
+TITLE_BAR = Rect(310, 0, 1000, 60)
+MSG_LIST = Rect(310, 60, 1000, 560)
+MSG_H = 60
+INPUT_EDIT = Rect(310, 560, 1000, 720)
+
+SEARCH_RESULT_TITLE = "@str:IDS_FAV_SEARCH_RESULT:3780"
+CONTACT_HEADERS = ("新的朋友", "公众号", "群聊")
+CONTACTS_PAGE = 12
+SEPARATOR_GAP = 300  # 相邻两条消息间隔超过这么多秒时插入时间分隔条
+
+_KEY_TOKEN = re.compile(r'([\^+%]*)(\{\{\}|\{\}\}|\{[^{}]+\}|.)', re.S)
+
+
+def parse_keys(keys: str) -> list:
+    '''pywinauto send_keys 语法 -> [(修饰键, 键)]；{X} 里只有一个字符时是这个字符本身'''
+    out = []
+    for mods, key in _KEY_TOKEN.findall(keys):
+        if key.startswith('{') and len(key) > 2:
+            key = key[1:-1]
+            if len(key) > 1:
+                key = key.split(' ')[0].upper()
+        out.append((mods, key))
+    return out
+
+
+class SimMessage:
+    __slots__ = ('sender', 'content', 'image', 'time')
+
+    def __init__(self, sender, content='', image=None, time=0.0):
+        self.sender = sender
+        self.content = content
+        self.image = image  # 图片消息的文件路径
+        self.time = time
+
+    @property
+    def title(self) -> str:
+        return '[图片]' if self.image is not None else self.content
+
+
+class SimChat:
+    def __init__(self, name, members=None, history=200):
+        self.name = name
+        self.members = members  # 私聊为 None
+        self.msgs = deque(maxlen=history)
+        self.unread = 0
+        self.at_me = False
+
+    @property
+    def is_group(self) -> bool:
+        return self.members is not None
+
+
+class WeChatSim:
+    """
+    内存里的微信：会话列表、标题栏、消息列表、搜索、通讯录、输入框和右键菜单，
+    控件树与 Wcf 在真实微信上用到的名字 / 类型 / 层级一致，鼠标点击按矩形命中控件，键盘按 send_keys 语法解析。
+
+    驱动接口：
+      add_friend(name) / add_group(name, members)
+      receive(chat, sender, content, image=None, at=None)  有人发来消息，会话排到第一行、未读数加一（当前会话也一样）
+      sent                                        机器人发出的消息 [(time, chat, content)]
+      ops                                         各类 UI 操作的次数
+    所有时间取自 clock，多线程调用时由一把锁保护。
+    """
+
+    def __init__(self, self_name='hihi', default_chat='文件传输助手', *, clock=None, history=200):
+        self.clock = clock if clock is not None else VirtualClock()
+        self.self_name = self_name
+        self.default_chat = default_chat
+        self.history = int(history)
+        self.lock = RLock()
+        self.chats = {}
+        self.order = []          # 会话列表从上到下
+        self.friends = []        # 通讯录
+        self.current = None
+        self.tab = 'chat'        # chat / contacts
+        self.focus = 'input'     # input / search / contacts
+        self.search_text = None  # None 表示搜索框没打开
+        self.input = []
+        self.attachments = []
+        self.clipboard = None    # ('text', str) / ('image', path)
+        self.cursor = (0, 0)
+        self.menu = None         # 右键菜单：(x, y, SimMessage)
+        self.scroll = 0          # 消息列表向上滚过的条数
+        self.contacts_page = 0
+        self.sent = []
+        self.on_send = []        # 回调 (chat, content)
+        self.ops = Counter()
+        self._chat(default_chat)
+        self.open_chat(default_chat)
+        self.root = SimElement(self, '微信', 'Window', WINDOW, kids=self._window_kids)
+
+    # ---- 驱动接口 ----
+    def add_friend(self, name) -> None:
+        with self.lock:
+            if name not in self.friends:
+                self.friends.append(name)
+
+    def add_group(self, name, members) -> None:
+        with self.lock:
+            self._chat(name, members=list(members))
+
+    def receive(self, chat, sender=None, content='', image=None, at=None) -> SimMessage:
+        '''at 是消息的到达时刻，默认为现在；回放时 UI 忙着，消息可能早就到了'''
+        with self.lock:
+            c = self._chat(chat)
+            when = self.clock.time() if at is None else at
+            msg = SimMessage(sender if c.is_group and sender else chat, content, image, when)
+            c.msgs.append(msg)
+            c.unread += 1
+            if c.is_group and f'@{self.self_name}' in content:
+                c.at_me = True
+            self._to_top(chat)
+            return msg
+
+    def open_chat(self, name) -> None:
+        with self.lock:
+            c = self._chat(name)
+            if name not in self.order:
+                self.order.insert(0, name)
+            self.current = name
+            c.unread = 0
+            c.at_me = False
+            self.tab = 'chat'
+            self.focus = 'input'
+            self.search_text = None
+            self.menu = None
+            self.scroll = 0
+            self.input = []
+            self.attachments = []
+
+    def _chat(self, name, members=None) -> SimChat:
+        c = self.chats.get(name)
+        if c is None:
+            c = self.chats[name] = SimChat(name, members, self.history)
+            self.order.insert(0, name)
+        elif members is not None:
+            c.members = members
+        return c
+
+    def _to_top(self, name) -> None:
+        if name in self.order:
+            self.order.remove(name)
+        self.order.insert(0, name)
+
+    # ---- 输入 ----
+    def click(self, x, y, button='left') -> None:
+        with self.lock:
+            self.ops['click'] += 1
+            hit = None
+            for e in self.root.descendants():
+                if e.on_click is not None and e._visible and e.rect_contains(x, y):
+                    hit = e  # 先序遍历里越靠后越在上层
+            if self.menu is not None and (hit is None or hit.control_type != 'MenuItem'):
+                self.menu = None
+            if hit is not None:
+                hit.on_click(button)
+
+    def wheel(self, x, y, notches) -> None:
+        with self.lock:
+            self.ops['scroll'] += 1
+            if MSG_LIST.left <= x < MSG_LIST.right and MSG_LIST.top <= y < MSG_LIST.bottom:
+                top = max(0, len(self._msg_rows()) - self._visible_rows())
+                self.scroll = min(top, max(0, self.scroll + 3 * int(notches)))
+
+    def send_keys(self, keys: str) -> None:
+        with self.lock:
+            for mods, key in parse_keys(keys):
+                self.ops['key'] += 1
+                self._key(mods, key)
+
+    def _key(self, mods, key) -> None:
+        if '^' in mods:
+            if key in ('f', 'F'):
+                self._open_search()
+            elif key in ('v', 'V'):
+                self._paste()
+            elif key == 'ENTER' and self.focus == 'input':
+                self.input.append('\n')
+            return
+        if key == 'ENTER':
+            if self.focus == 'input':
+                self._send()
+            return  # 搜索框里回车不打开结果，还要点一下
+        if key == 'ESC':
+            if self.search_text is not None:
+                self.search_text = None
+                self.focus = 'input'
+            return
+        if self.focus == 'contacts':
+            pages = max(0, (len(self._contact_items()) - 1) // CONTACTS_PAGE)
+            if key == 'HOME':
+                self.contacts_page = 0
+            elif key == 'PGDN':
+                self.contacts_page = min(pages, self.contacts_page + 1)
+            elif key == 'PGUP':
+                self.contacts_page = max(0, self.contacts_page - 1)
+            return
+        if len(key) == 1:
+            self._type(key)
+
+    def _type(self, text) -> None:
+        if self.focus == 'search' and self.search_text is not None:
+            self.search_text += text
+        elif self.focus == 'input':
+            self.input.extend(text)
+
+    def _paste(self) -> None:
+        if self.clipboard is None:
+            return
+        kind, value = self.clipboard
+        if kind == 'text':
+            self._type(value)
+        elif kind == 'image' and self.focus == 'input':
+            self.attachments.append(value)
+
+    def _open_search(self) -> None:
+        self.search_text = ''
+        self.focus = 'search'
+        self.menu = None
+
+    def _send(self) -> None:
+        text = ''.join(self.input).strip()
+        if not text and not self.attachments:
+            return
+        c = self.chats[self.current]
+        now = self.clock.time()
+        out = [SimMessage(self.self_name, image=path, time=now) for path in self.attachments]
+        if text:
+            out.append(SimMessage(self.self_name, text, time=now))
+        for msg in out:
+            c.msgs.append(msg)
+            self.sent.append((now, self.current, msg.title))
+            for cb in self.on_send:
+                cb(self.current, msg.title)
+        self.input = []
+        self.attachments = []
+        self._to_top(self.current)
+
+    # ---- 控件树 ----
+    def _window_kids(self):
+        kids = [
+            SimElement(self, '导航', 'Pane', Rect(0, 60, 60, 720), kids=lambda: [
+                SimElement(self, '聊天', 'Button', CHAT_BUTTON, kids=self._badge, on_click=self._click_chat_tab),
+                SimElement(self, '通讯录', 'Button', CONTACTS_BUTTON, on_click=self._click_contacts_tab),
+            ]),
+            SimElement(self, '搜索', 'Edit', SEARCH_EDIT, on_click=lambda button: self._open_search()),
+        ]
+        if self.tab == 'chat':
+            kids.append(SimElement(self, '会话', 'List', SIDE_LIST, kids=self._conv_rows))
+        else:
+            kids.append(SimElement(self, '联系人', 'List', SIDE_LIST, kids=self._contact_rows))
+        kids.append(SimElement(self, '', 'Pane', Rect(310, 0, 1000, 720), kids=self._chat_pane))
+        if self.search_text:
+            kids.append(SimElement(self, SEARCH_RESULT_TITLE, 'List', SEARCH_RESULT, kids=self._search_rows))
+        if self.menu is not None:
+            x, y, msg = self.menu
+            kids.append(SimElement(self, '', 'Menu', Rect(x - 5, y - 5, x + 100, y + 35), kids=lambda: [
+                SimElement(self, '复制', 'MenuItem', Rect(x - 5, y - 5, x + 100, y + 35),
+                           on_click=lambda button, msg=msg: self._copy(msg)),
+            ]))
+        return kids
+
+    def _badge(self):
+        total = sum(c.unread for c in self.chats.values())
+        return [SimElement(self, str(total) if total else '', 'Text', CHAT_BUTTON)]
+
+    def _conv_rows(self):
+        if self.tab != 'chat':
+            return []
+        rows = []
+        for i, name in enumerate(self.order[:(SIDE_LIST.bottom - SIDE_LIST.top) // ROW_H]):
+            c = self.chats[name]
+            top = SIDE_LIST.top + i * ROW_H
+            rect = Rect(SIDE_LIST.left, top, SIDE_LIST.right, top + ROW_H)
+            last = c.msgs[-1] if c.msgs else None
+            preview = ''
+            if last is not None:
+                preview = f'{last.sender}: {last.title}' if c.is_group else last.title
+                if c.at_me:
+                    preview = '[有人@我]' + preview
+            when = time.strftime('%H:%M', time.localtime(last.time)) if last is not None else ''
+            text = name + (f'{c.unread}条新消息' if c.unread else '')
+            rows.append(SimElement(self, text, 'ListItem', rect, kids=[
+                SimElement(self, name, 'Text', Rect(rect.left + 60, top + 8, rect.right - 50, top + 30)),
+                SimElement(self, when, 'Text', Rect(rect.right - 50, top + 8, rect.right, top + 30)),
+                SimElement(self, preview, 'Text', Rect(rect.left + 60, top + 34, rect.right, top + 56)),
+            ], on_click=lambda button, name=name: self.open_chat(name)))
+        return rows
+
+    def _contact_items(self):
+        items = list(CONTACT_HEADERS)
+        letter = None
+        for name in sorted(self.friends):
+            head = name[0].upper() if name[0].isascii() and name[0].isalpha() else '#'
+            if head != letter:
+                items.append(head)
+                letter = head
+            items.append(name)
+        return items
+
+    def _contact_rows(self):
+        if self.tab != 'contacts':
+            return []
+        page = self._contact_items()[self.contacts_page * CONTACTS_PAGE:(self.contacts_page + 1) * CONTACTS_PAGE]
+        out = []
+        for i, name in enumerate(page):
+            top = SIDE_LIST.top + i * ROW_H // 2
+            out.append(SimElement(self, name, 'ListItem', Rect(SIDE_LIST.left, top, SIDE_LIST.right, top + ROW_H // 2),
+                                  on_click=self._focus_contacts))
+        return out
+
+    def _search_rows(self):
+        q = self.search_text or ''
+        names = list(dict.fromkeys([n for n in self.order if q in n] + [n for n in self.friends if q in n]))
+        out = []
+        for i, name in enumerate(names[:(SEARCH_RESULT.bottom - SEARCH_RESULT.top) // RESULT_H]):
+            top = SEARCH_RESULT.top + i * RESULT_H
+            out.append(SimElement(self, name, 'ListItem', Rect(SEARCH_RESULT.left, top, SEARCH_RESULT.right, top + RESULT_H),
+                                  on_click=lambda button, name=name: self.open_chat(name)))
+        return out
+
+    def _chat_pane(self):
+        if self.tab != 'chat' or self.current is None:
+            return []
+        bar_kids = [SimElement(self, self._title, 'Text', Rect(330, 15, 700, 45))]
+        if self.current != self.default_chat:
+            bar_kids.append(SimElement(self, '聊天信息', 'Button', Rect(950, 15, 990, 45)))
+        return [
+            SimElement(self, '', 'Pane', TITLE_BAR, kids=bar_kids),
+            SimElement(self, '消息', 'List', MSG_LIST, kids=self._msg_items),
+            SimElement(self, '输入', 'Edit', INPUT_EDIT, on_click=self._focus_input),
+        ]
+
+    def _title(self) -> str:
+        c = self.chats.get(self.current)
+        if c is None:
+            return ''
+        return f'{c.name} ({len(c.members)})' if c.is_group else c.name
+
+    def _msg_rows(self):
+        c = self.chats.get(self.current)
+        rows = []
+        last = None
+        for msg in (c.msgs if c is not None else ()):
+            if last is not None and msg.time - last >= SEPARATOR_GAP:
+                rows.append(time.strftime('%H:%M', time.localtime(msg.time)))
+            rows.append(msg)
+            last = msg.time
+        return rows
+
+    def _visible_rows(self) -> int:
+        return (MSG_LIST.bottom - MSG_LIST.top) // MSG_H
+
+    def _msg_items(self):
+        if self.tab != 'chat':
+            return []
+        rows = self._msg_rows()
+        end = len(rows) - self.scroll
+        first = max(0, end - self._visible_rows())
+        out = []
+        for k, row in enumerate(rows):
+            top = MSG_LIST.bottom - (end - k) * MSG_H
+            rect = Rect(MSG_LIST.left, top, MSG_LIST.right, top + MSG_H)
+            visible = first <= k < end
+            if isinstance(row, str):
+                out.append(SimElement(self, row, 'ListItem', rect, visible, kids=[SimElement(self, row, 'Text', rect, visible)]))
+                continue
+            avatar = SimElement(self, row.sender, 'Button', Rect(rect.left + 10, top + 10, rect.left + 50, top + 50), visible)
+            if row.image is not None:
+                body = SimElement(self, '', 'Button', Rect(rect.left + 60, top + 5, rect.left + 260, top + 55), visible,
+                                  on_click=lambda button, msg=row: self._right_click_image(button, msg))
+            else:
+                body = SimElement(self, '', 'Pane', Rect(rect.left + 60, top + 10, rect.right - 60, top + 50), visible, kids=[
+                    SimElement(self, row.content, 'Text', Rect(rect.left + 60, top + 10, rect.right - 60, top + 50), visible),
+                ])
+            out.append(SimElement(self, row.title, 'ListItem', rect, visible, kids=[
+                SimElement(self, '', 'Pane', rect, visible, kids=[avatar, body]),
+            ]))
+        return out
+
+    # ---- 点击回调 ----
+    def _click_chat_tab(self, button) -> None:
+        self.tab = 'chat'
+        self.focus = 'input'
+        self.search_text = None
+
+    def _click_contacts_tab(self, button) -> None:
+        self.tab = 'contacts'
+        self.focus = 'contacts'
+        self.search_text = None
+
+    def _focus_contacts(self, button) -> None:
+        self.focus = 'contacts'
+
+    def _focus_input(self, button) -> None:
+        self.focus = 'input'
+        self.search_text = None
+
+    def _right_click_image(self, button, msg) -> None:
+        if button == 'right':
+            x, y = self.cursor
+            self.menu = (x, y, msg)
+
+    def _copy(self, msg) -> None:
+        self.menu = None
+        self.clipboard = ('image', msg.image)
+
+
+class SimElement:
+    """模拟控件，接口与 pywinauto wrapper 相同；名字和子控件可以是函数，每次访问都按当前状态重新计算"""
+
+    def __init__(self, sim, name, control_type, rect, visible=True, *, kids=(), on_click=None):
+        self.sim = sim
+        self._name = name
+        self.control_type = control_type
+        self.rect = rect
+        self._visible = visible
+        self._kids = kids
+        self._parent = None
+        self.on_click = on_click
+
+    def _text(self) -> str:
+        return self._name() if callable(self._name) else self._name
+
+    def _children(self) -> list:
+        kids = self._kids() if callable(self._kids) else list(self._kids)
+        for k in kids:
+            k._parent = self
+        return kids
+
+    def rect_contains(self, x, y) -> bool:
+        r = self.rect
+        return r.left <= x < r.right and r.top <= y < r.bottom
+
+    # ---- wrapper 接口 ----
+    @property
+    def element_info(self):
+        return self
+
+    @property
+    def name(self) -> str:
+        return self.window_text()
+
+    def window_text(self) -> str:
+        with self.sim.lock:
+            self.sim.ops['read'] += 1
+            return self._text()
+
+    def rectangle(self) -> Rect:
+        return self.rect
+
+    def is_visible(self) -> bool:
+        return self._visible
+
+    def children(self, control_type=None) -> list:
+        with self.sim.lock:
+            self.sim.ops['read'] += 1
+            return [k for k in self._children() if control_type is None or k.control_type == control_type]
+
+    def descendants(self, control_type=None) -> list:
+        with self.sim.lock:
+            self.sim.ops['read'] += 1
+            out = []
+            stack = list(reversed(self._children()))
+            while stack:
+                e = stack.pop()
+                if control_type is None or e.control_type == control_type:
+                    out.append(e)
+                stack.extend(reversed(e._children()))
+            return out
+
+    def parent(self):
+        return self._parent
+
+    def set_focus(self) -> None:
+        pass
+
+    def select(self) -> None:
+        self.click_input()
+
+    def click_input(self, button='left') -> None:
+        if self.on_click is None:
+            return
+        with self.sim.lock:
+            self.sim.ops['click'] += 1
+            self.on_click(button)
+
+    def exists(self, timeout=None) -> bool:
+        return True
+
+    def wrapper_object(self):
+        return self
+
+    def __repr__(self):
+        return f'<SimElement {self.control_type} {self._text()[:20]!r}>'
+
+
+class SimSpec:
+    """child_window 返回的控件描述：每次 exists / wrapper_object 时才在当前控件树里查找"""
+
+    def __init__(self, sim, parent=None, title=None, control_type=None, found_index=0):
+        self.sim = sim
+        self.parent = parent
+        self.title = title
+        self.control_type = control_type
+        self.found_index = int(found_index or 0)
+
+    def child_window(self, title=None, control_type=None, found_index=0):
+        return SimSpec(self.sim, self, title, control_type, found_index)
+
+    def _find(self):
+        if self.parent is None:
+            return self.sim.root
+        base = self.parent._find()
+        if base is None:
+            return None
+        with self.sim.lock:
+            hits = [
+                e for e in base.descendants()
+                if (self.title is None or e._text() == self.title)
+                and (self.control_type is None or e.control_type == self.control_type)
+            ]
+        return hits[self.found_index] if len(hits) > self.found_index else None
+
+    def exists(self, timeout=None) -> bool:
+        if self._find() is not None:
+            return True
+        if timeout:
+            self.sim.clock.sleep(float(timeout), 'exists')  # 真实的 exists 找不到时会等满 timeout
+        return False
+
+    def wrapper_object(self):
+        e = self._find()
+        if e is None:
+            raise LookupError(f'控件不存在：{self.title!r} {self.control_type}')
+        return e
+
+
+class SimBackend(UIBackend):
+    """把 Wcf 接到 WeChatSim 上，鼠标、键盘、剪贴板都直接改模拟器的状态"""
+
+    name = 'sim'
+
+    def __init__(self, sim: WeChatSim | None = None, clock=None):
+        sim = sim if sim is not None else WeChatSim(clock=clock)
+        super().__init__(sim.clock)
+        self.sim = sim
+
+    def connect(self):
+        return SimSpec(self.sim)
+
+    def resolve(self, target):
+        return target.wrapper_object() if isinstance(target, SimSpec) else target
+
+    def get_cursor_pos(self) -> tuple[int, int]:
+        return self.sim.cursor
+
+    def set_cursor_pos(self, x: int, y: int) -> None:
+        self.sim.cursor = (int(x), int(y))
+
+    def mouse_down(self, button: str = 'left') -> None:
+        pass
+
+    def mouse_up(self, button: str = 'left') -> None:
+        x, y = self.sim.cursor
+        self.sim.click(x, y, button)
+
+    def scroll(self, x: int, y: int, notches: int) -> None:
+        self.sim.wheel(int(x), int(y), notches)
+
+    def send_keys(self, keys: str) -> None:
+        self.sim.send_keys(keys)
+
+    def set_clipboard_text(self, text: str) -> None:
+        self.sim.clipboard = ('text', str(text))
+
+    def set_clipboard_image(self, image_path: str) -> None:
+        self.sim.clipboard = ('image', str(image_path))
+
+    def grab_clipboard_raw(self):
+        clip = self.sim.clipboard
+        if clip is not None and clip[0] == 'image':
+            return 'file', clip[1]
+        return None
+
+
+def make_trace(friends, groups, *, minutes: float = 10, rate: float = 0.5, seed=0) -> list:
+    '''随机生成一段对话：[(相对到达时刻（秒）, 会话, 发送者, 内容)]，平均每秒 rate 条'''
+    import random
+
+    rng = random.Random(seed)
+    trace = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate)
+        if t >= minutes * 60:
+            return trace
+        chat = rng.choice(friends + groups)
+        sender = rng.choice(friends) if chat in groups else None
+        trace.append((t, chat, sender, f'第 {len(trace)} 条消息'))
+
+
+def replay(wcf, sim: WeChatSim, trace, *, poll: float = 1.0, reply=None) -> dict:
+    '''
+    在虚拟时间里回放 trace：每 poll 秒扫描一次，把已经到达的消息注入模拟器，
+    取出新消息后调用 reply(chat, msgs)（通常是 wcf.send_text）。
+    返回墙钟耗时、虚拟时间跨度、拟人停顿的模拟耗时和每条消息从到达到处理完（回复发出）的虚拟时间。
+    '''
+    clock = sim.clock
+    pending = deque(sorted(trace, key=lambda e: e[0]))
+    base = clock.time()
+    wall = time.perf_counter()
+    slept = clock.slept
+    waiting = {}  # 会话 -> 还没处理的消息的到达时刻
+    latency = []
+    received = 0
+    tick = base
+    while pending or waiting:
+        clock.advance_to(tick)
+        while pending and base + pending[0][0] <= clock.time():
+            t, chat, sender, content = pending.popleft()
+            sim.receive(chat, sender, content, at=base + t)
+            waiting.setdefault(chat, []).append(base + t)
+        wcf.get_new_msg()
+        for chat, msgs in wcf.get_msgs(timeout=0).items():
+            received += len(msgs)
+            if reply is not None:
+                reply(chat, msgs)
+            done = clock.time()
+            arrived = waiting.pop(chat, [])
+            latency.extend(done - t for t in arrived[:len(msgs)])
+            if len(arrived) > len(msgs):
+                waiting[chat] = arrived[len(msgs):]
+        tick += poll
+        if not pending and tick - base > (trace[-1][0] if trace else 0) + 60:
+            break  # 剩下的永远读不到（例如被分诊跳过），不再等
+    return {
+        'wall': time.perf_counter() - wall,
+        'virtual': clock.time() - base,
+        'modeled': clock.slept - slept,
+        'pauses': clock.pauses(),
+        'injected': len(trace),
+        'received': received,
+        'latency': sorted(latency),
+    }
+
+
+if __name__ == '__main__':
+    # 在模拟器上跑真实的 Wcf，回放 10 分钟的对话：收消息、按会话回复，所有拟人停顿都走虚拟时钟
+    import contextlib
+    import io
+    import tempfile
+    from pathlib import Path
+
+    import yaml
+
+    try:
+        from ..Wcf import Wcf
+    except ImportError:
+        from Wcf import Wcf
+
+    cfg = yaml.safe_load((Path(__file__).resolve().parents[1] / 'config' / 'config-template.yaml').read_text(encoding='utf-8'))
+    tmp = tempfile.mkdtemp()
+    cfg.update(ui_backend='sim', clock='virtual', random_seed=0, receive_mode='poll',
+               contacts_cache=f'{tmp}/contacts.json', enable_image_parse=False)
+
+    sim = WeChatSim(cfg['wx_name'], cfg['default_chat_name'])
+    # 名字不能以数字结尾，否则和“N条新消息”连在一起分不开
+    friends = [f'好友{i:02d}号' for i in range(30)]
+    for name in friends:
+        sim.add_friend(name)
+    groups = [f'第{i}群' for i in range(5)]
+    for g in groups:
+        sim.add_group(g, friends[:8] + [cfg['wx_name']])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        wcf = Wcf(backend=SimBackend(sim), config=cfg)
+        wcf.set_triage(hook=lambda p: True)  # 群消息全部打开，只测收发
+
+    trace = make_trace(friends[:10], groups, minutes=10, rate=0.3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = replay(wcf, sim, trace, reply=lambda chat, msgs: wcf.send_text(f'收到 {len(msgs)} 条', chat, need_decorate=False))
+
+    lat = res['latency'] or [0.0]
+    print(f'回放 {res["virtual"] / 60:.1f} 分钟的对话：注入 {res["injected"]} 条，收到 {res["received"]} 条，回复 {len(sim.sent)} 条')
+    print(f'墙钟耗时 {res["wall"]:.2f}s，拟人停顿的模拟耗时 {res["modeled"]:.1f}s：'
+          + ' / '.join(f'{k} {v:.1f}s' for k, v in sorted(res['pauses'].items(), key=lambda kv: -kv[1])))
+    print(f'到达 -> 回复发出（虚拟时间）：p50={lat[len(lat) // 2]:.2f}s p95={lat[int(len(lat) * 0.95)]:.2f}s max={lat[-1]:.2f}s')
+    print(f'UI 操作：{dict(sim.ops)}')
+    wcf.ui.stop()
@@ -1,11 +1,9 @@
-from pywinauto.keyboard import send_keys
-import win32clipboard
-import win32con
-from PIL import Image
 import io
+import os
 import re
 import random
 import time
+from functools import lru_cache
 
 
 def _escape_send_keys_char(ch: str) -> str:
@@ -24,17 +22,28 @@ def _escape_send_keys_char(ch: str) -> str:
     return ch
 
 
+def _send_keys(keys: str, pause: float = 0) -> None:
+    from pywinauto.keyboard import send_keys
+
+    send_keys(keys, pause=pause, with_spaces=True)
+
+
 def type_text_humanlike(
     text: str,
     *,
     with_enter: bool = False,
     min_interval: float = 0.02,
     max_interval: float = 0.12,
+    send_keys=None,
+    sleep=time.sleep,
+    rng=random,
 ):
-    """模拟人类键入：逐字符输入 + 随机间隔，不使用剪贴板。"""
+    """模拟人类键入：逐字符输入 + 随机间隔，不使用剪贴板。send_keys / sleep / rng 可以换成 UI 后端、它的时钟和带种子的随机数。"""
+    if send_keys is None:
+        send_keys = _send_keys
     if not text:
         if with_enter:
-            send_keys("{ENTER}", pause=0, with_spaces=True)
+            send_keys("{ENTER}")
         return
 
     low = max(0.0, float(min_interval))
@@ -42,14 +51,17 @@ def type_text_humanlike(
     for ch in str(text):
         seq = _escape_send_keys_char(ch)
         if seq:
-            send_keys(seq, pause=0, with_spaces=True)
-        time.sleep(random.uniform(low, high))
+            send_keys(seq)
+        sleep(rng.uniform(low, high))
 
     if with_enter:
-        time.sleep(random.uniform(low, high))
-        send_keys("{ENTER}", pause=0, with_spaces=True)
+        sleep(rng.uniform(low, high))
+        send_keys("{ENTER}")
 
 def set_clipboard_text(text: str) -> None:
+    import win32clipboard
+    import win32con
+
     win32clipboard.OpenClipboard()
     try:
         win32clipboard.EmptyClipboard()
@@ -60,6 +72,10 @@ def set_clipboard_text(text: str) -> None:
         win32clipboard.CloseClipboard()
 
 def set_clipboard_image(image_path: str) -> None:
+    import win32clipboard
+    import win32con
+    from PIL import Image
+
     image = Image.open(image_path)
     if image.mode != "RGB":
         image = image.convert("RGB")
@@ -76,28 +92,56 @@ def set_clipboard_image(image_path: str) -> None:
     finally:
         win32clipboard.CloseClipboard()
 
+def grab_clipboard_raw():
+    '''只取剪贴板里的原始数据，不解码：('dib', bytes) 或 ('file', path)'''
+    try:
+        import win32clipboard
+        import win32con
+    except ImportError:
+        return None
+    try:
+        win32clipboard.OpenClipboard()
+    except Exception:
+        return None
+    try:
+        if win32clipboard.IsClipboardFormatAvailable(win32con.CF_DIB):
+            return 'dib', win32clipboard.GetClipboardData(win32con.CF_DIB)
+        # ~/Documents/WeChat Files/wxid_xxx/FileStorage/Temp/abcd.jpg
+        if win32clipboard.IsClipboardFormatAvailable(win32con.CF_HDROP):
+            files = win32clipboard.GetClipboardData(win32con.CF_HDROP)
+            if files and os.path.isfile(files[0]):
+                return 'file', files[0]
+        return None
+    except Exception:
+        return None
+    finally:
+        win32clipboard.CloseClipboard()
+
 def paste_text(text, with_enter=False, pause=0):
     set_clipboard_text(text)
     if with_enter:
-        send_keys("^v{ENTER}", pause=pause, with_spaces=True)
+        _send_keys("^v{ENTER}", pause=pause)
     else:
-        send_keys("^v", pause=pause, with_spaces=True)
+        _send_keys("^v", pause=pause)
 
 def paste_image(image_path, with_enter=False, pause=0):
     set_clipboard_image(image_path)
     if with_enter:
-        send_keys("^v{ENTER}", pause=pause, with_spaces=True)
+        _send_keys("^v{ENTER}", pause=pause)
     else:
-        send_keys("^v", pause=pause, with_spaces=True)
+        _send_keys("^v", pause=pause)
 
 def zip_text(text: str, max_len: int=40) -> str:
     s = "".join(c for c in text if c != "\n")
     return s if len(s) < max_len else f"“{s[:10]}......{s[-10:]}”"
 
+# 会话列表每次扫描都会解析同样的行文字，按原始文字缓存解析结果
+@lru_cache(maxsize=1024)
 def clean_name(text: str) -> str:
     text = (text or "").replace("已置顶", "").strip()
     return re.sub(r"\d+条新消息$", "", text).strip()
 
+@lru_cache(maxsize=1024)
 def analysis_name(text: str) -> tuple[str, bool, int]:
     s = (text or "").strip()
     # 1) 是否置顶
@@ -1,8 +1,20 @@
 ﻿import sys
+import time
 import utils as U
 
 from State import state
-from plugins.pipeline import dispatch_msg, init_plugins, load_plugins
+from plugins import aio
+from plugins.dispatcher import ShardedDispatcher
+from plugins.pipeline import dispatch_msgs, dispatch_one, init_plugins, load_plugins, report_plugin_times, warm_up
+from plugins.reloader import PluginReloader
+from plugins.router import build_router
+
+
+def default_handle(msg, plugins):
+    # 如果没有一个插件捕获这个消息，可以做 default 处理
+    llm_plugin = plugins.get('llm')
+    if llm_plugin is not None and llm_plugin.is_for_me(msg, is_default=True):
+        llm_plugin.handle_msg(msg)
 
 
 def main():
@@ -12,41 +24,87 @@ def main():
         exc_value,
         exc_traceback,
     )
+    boot = time.perf_counter()
     state._init_wcf()
+    wcf_time = time.perf_counter() - boot
 
     plugins = load_plugins(state)
     plugin_usable = getattr(state, 'plugin_usable', None)
     if isinstance(plugin_usable, dict):
         plugins = {name: plugin for name, plugin in plugins.items() if plugin_usable.get(name, True)}
     init_plugins(plugins)
+    router = build_router(plugins, state)
+    plugin_time = time.perf_counter() - boot - wcf_time
+    default = lambda msg: default_handle(msg, plugins)
+
+    # 按会话分片并行处理，会话内保持顺序；dispatch_workers 为 0 时在主循环里逐条处理
+    dispatch_workers = int(state.config.get('dispatch_workers', 4) or 0)
+    dispatcher = None
+    if dispatch_workers > 0:
+        dispatcher = ShardedDispatcher(
+            lambda msg: dispatch_one(msg, plugins, default=default, router=router),
+            workers=dispatch_workers,
+            max_pending=int(state.config.get('dispatch_max_pending', 256) or 256),
+            metrics=state.wcf.metrics,
+        ).start()
 
     state.wcf.enable_receive_msg()
     print(f'WechatBot 已启动，共加载 {len(plugins)} 个 plugin')
+    print(
+        f'[启动耗时] {time.perf_counter() - boot:.2f}s（Wcf {wcf_time:.2f}s，插件 {plugin_time:.2f}s）\n'
+        + report_plugin_times(plugins)
+    )
+    # 延迟加载的插件在后台依次加载，先到的消息会当场加载它需要的插件
+    if state.config.get('plugin_warmup', True):
+        warm_up(plugins)
+    # 改了插件代码不用重启：只重新导入改动的插件，替换进 plugins 字典并重建触发词索引
+    reloader = None
+    if state.config.get('plugin_hot_reload', False):
+        reloader = PluginReloader(
+            plugins,
+            state,
+            router=router,
+            interval=float(state.config.get('plugin_reload_interval', 1.0) or 1.0),
+            metrics=state.wcf.metrics,
+        ).start()
 
+    report_interval = float(state.config.get('metrics_report_interval', 0) or 0)
+    msg_batch_size = int(state.config.get('msg_batch_size', 64) or 64)
+    last_report = time.time()
     try:
         while True:
-            _, msg = state.wcf.get_msg(timeout=1.0)
-            if msg is None:
-                continue
-            if state.wcf.is_msg_from_me(msg):
-                continue
-
-            print()
-            print('来信：' + U.ZIP(msg.content))
-            print('来信人：' + msg.sender)
-
-            handled = dispatch_msg(msg, plugins)
-            if not handled:
-                # 如果没有一个插件捕获这个消息，可以做 default 处理
-                llm_plugin = plugins.get('llm')
-                if llm_plugin is not None and llm_plugin.is_for_me(msg, is_default=True):
-                    llm_plugin.handle_msg(msg)
+            if report_interval > 0 and time.time() - last_report >= report_interval:
+                last_report = time.time()
+                print('\n[运行指标]\n' + state.wcf.report_metrics())
+                if dispatcher is not None:
+                    print('\n[分发]\n' + dispatcher.report())
+
+            # 一次取走所有会话的新消息，按会话分组、组内按到达顺序
+            batch = state.wcf.get_msgs(max_batch=msg_batch_size, timeout=1.0)
+            batch = {name: [msg for msg in msgs if not state.wcf.is_msg_from_me(msg)] for name, msgs in batch.items()}
+            for msgs in batch.values():
+                for msg in msgs:
+                    print()
+                    # 图片等大块内容只打印引用，不在主循环里读盘
+                    ref = msg.content_ref
+                    print('来信：' + (repr(ref) if ref is not None else U.ZIP(msg.content)))
+                    print('来信人：' + msg.sender)
+
+            if dispatcher is not None:
+                dispatcher.submit_batch(batch)
+            else:
+                dispatch_msgs(batch, plugins, default=default, router=router)
 
             if state.stop_requested:
                 break
     except KeyboardInterrupt:
         print('ctrl + c exiting...')
     finally:
+        if reloader is not None:
+            reloader.stop()
+        if dispatcher is not None:
+            dispatcher.stop(timeout=5.0)
+        aio.shutdown()
         state.wcf.disable_receive_msg()
 
 
@@ -0,0 +1,136 @@
+'''
+异步插件用的共享事件循环：所有 async def 的 init / is_for_me / handle_msg 跑在同一个后台线程的事件循环里，
+成千上万个正在等网络的请求共用这一个线程，而不是每个请求占一个系统线程。
+异步插件里要调用阻塞的接口（wcf.send_text、读写文件等）时用 await run_sync(...) 放到线程池里执行，不要卡住事件循环。
+'''
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread, get_ident
+
+
+class LoopThreadError(RuntimeError):
+    '''在事件循环线程里同步等待协程：等的协程要在同一个线程里跑，永远等不到'''
+
+
+class PluginLoop:
+    def __init__(self, executor_workers: int = 8, name='PluginLoop'):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(executor_workers)), thread_name_prefix=f'{name}Exec')
+        self.loop.set_default_executor(self.executor)
+        self._started = Event()
+        self._thread_id = None
+        self._thread = Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        self._thread_id = get_ident()
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        '''把协程交给事件循环，返回 concurrent.futures.Future，可以在任意线程里等待或挂回调'''
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def in_loop_thread(self) -> bool:
+        return get_ident() == self._thread_id
+
+    def run(self, coro, timeout=None):
+        '''在事件循环里跑完协程并返回结果，调用方线程阻塞等待；在事件循环线程里调用时抛出 LoopThreadError'''
+        if self.in_loop_thread():
+            coro.close()
+            raise LoopThreadError(
+                f'不能在事件循环线程里同步等待 {getattr(coro, "__qualname__", coro)}，会死锁；'
+                f'异步插件里请直接 await，或者用 await run_sync(...) 放到线程池里调用'
+            )
+        return self.submit(coro).result(timeout)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self._thread.is_alive():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.executor.shutdown(wait=False)
+
+
+_shared = None
+_shared_lock = Lock()
+
+
+def get_loop() -> PluginLoop:
+    '''共享的事件循环，第一次用到时才创建'''
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PluginLoop()
+        return _shared
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    global _shared
+    with _shared_lock:
+        loop, _shared = _shared, None
+    if loop is not None:
+        loop.stop(timeout)
+
+
+def in_loop_thread() -> bool:
+    '''当前线程是不是共享事件循环的线程（还没创建时一定不是）'''
+    loop = _shared
+    return loop is not None and loop.in_loop_thread()
+
+
+def is_async(method) -> bool:
+    return inspect.iscoroutinefunction(method)
+
+
+def call(method, *args):
+    '''同步地调用插件方法：async def 的在共享事件循环里跑完再返回；在事件循环线程里调用 async def 会抛出 LoopThreadError'''
+    if is_async(method):
+        return get_loop().run(method(*args))
+    return method(*args)
+
+
+async def run_sync(fn, *args, **kwargs):
+    '''在事件循环的线程池里执行阻塞函数，例如 await run_sync(self.state.wcf.send_text, text, receiver)'''
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+if __name__ == '__main__':
+    import time
+
+    try:
+        from .dispatcher import ShardedDispatcher
+    except ImportError:
+        from dispatcher import ShardedDispatcher
+
+    # 1000 个会话各来一条消息，每条要等 0.5 秒的“模型请求”：
+    # 同步插件在 4 个分发线程上排队，异步插件的请求在共享事件循环里一起等
+    N, LATENCY, WORKERS = 1000, 0.5, 4
+
+    def sync_handle(msg):
+        time.sleep(LATENCY)
+        return True
+
+    async def async_handle(msg):
+        await asyncio.sleep(LATENCY)
+
+    def run(handle, n):
+        d = ShardedDispatcher(handle, workers=WORKERS, max_pending=n).start()
+        start = time.perf_counter()
+        d.submit_batch({f'会话{i}': [i] for i in range(n)})
+        d.join()
+        cost = time.perf_counter() - start
+        d.stop()
+        return cost
+
+    loop = get_loop()
+    cost = run(sync_handle, 40) * N / 40
+    print(f'同步插件：{N} 条消息，{WORKERS} 个分发线程，约 {cost:.1f}s（按前 40 条估算）')
+    cost = run(lambda msg: loop.submit(async_handle(msg)), N)
+    print(f'异步插件：{N} 条消息，{WORKERS} 个分发线程 + 1 个事件循环，{cost:.2f}s')
+    shutdown()
@@ -15,13 +15,14 @@ class Plugin:
 
     def init(self):
         self.images_dir.mkdir(parents=True, exist_ok=True)
+        self.state.wcf.add_hot_text(help_documentation)
         print('[commander_ops] init 完成')
 
     def is_for_me(self, msg) -> bool:
         if msg is None or msg.type != 0 or not isinstance(msg.content, str):
             return False
 
-        if msg.sender not in set(self.state.group.get('commander', [])):
+        if msg.sender not in self.state.role_members('commander'):
             return False
 
         content = msg.content.strip()
@@ -95,10 +96,10 @@ class Plugin:
 
 
     def _at_sb(self, room_name, name, text):
-        self.state.wcf.send_text('@' + name + ' ' + text, room_name)
+        self.state.wcf.send_text(text, room_name, urgent=True, at=name)
 
     def send(self, msg, text):
         if msg.from_group():
             self._at_sb(msg.roomid, msg.sender, text)
         else:
-            self.state.wcf.send_text(text, msg.sender)
\ No newline at end of file
+            self.state.wcf.send_text(text, msg.sender, urgent=True)
\ No newline at end of file
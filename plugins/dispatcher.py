@@ -0,0 +1,198 @@
+'''
+按会话分片的并发分发：同一个会话（群名或私聊对象）的消息严格按到达顺序一条条处理，
+不同会话在有限的几个工作线程上并行，某个插件的 handle_msg 慢（发图片、等网络）只拖住它自己的会话。
+'''
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+
+
+class ShardedDispatcher:
+    '''
+    handle(msg) 处理一条消息（通常是 pipeline.dispatch_one）；返回 concurrent.futures.Future 时
+    （异步插件正在事件循环里处理）工作线程立即去处理别的会话，这个会话等 Future 完成后再处理下一条。
+    每个会话一条队列，同一时刻最多一个线程在处理它；线程每处理完一条就把会话放回就绪队列末尾，
+    消息多的会话不会饿死其它会话。积压超过 max_pending 条时 submit 阻塞，新消息留在 Wcf 的队列里。
+    '''
+
+    def __init__(self, handle, workers: int = 4, max_pending: int = 256, metrics=None, name='Dispatcher'):
+        self.handle = handle
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.metrics = metrics
+        self.name = name
+        self._cond = Condition()
+        self._shards = {}       # 会话 -> deque[(msg, 入队时刻)]
+        self._scheduled = set() # 在就绪队列里或者正在处理的会话
+        self._ready = deque()
+        self._pending = 0
+        self._stats = {}        # 会话 -> [处理条数, 总耗时, 最大耗时]
+        self._stopped = False
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = Thread(target=self._loop, name=f'{self.name}-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, key, msg) -> None:
+        with self._cond:
+            while self._pending >= self.max_pending and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return
+            self._shards.setdefault(key, deque()).append((msg, time.perf_counter()))
+            self._pending += 1
+            if key not in self._scheduled:
+                self._scheduled.add(key)
+                self._ready.append(key)
+                self._cond.notify_all()
+
+    def submit_batch(self, batch: dict) -> None:
+        '''batch 为 wcf.get_msgs() 的返回值 {chat_name: [WxMsg...]}，会话名就是分片键'''
+        for key, msgs in batch.items():
+            for msg in msgs:
+                self.submit(key, msg)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                key = self._ready.popleft()
+                msg, enqueued = self._shards[key].popleft()
+            start = time.perf_counter()
+            result = None
+            try:
+                result = self.handle(msg)
+            except Exception as e:
+                print(f'[分发错误] {key}: {e}')
+                traceback.print_exc()
+            if isinstance(result, Future) and not result.done():
+                result.add_done_callback(lambda _, key=key, enqueued=enqueued, start=start: self._finish(key, enqueued, start))
+            else:
+                self._finish(key, enqueued, start)
+
+    def _finish(self, key, enqueued, start):
+        cost = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.observe('dispatch.wait', start - enqueued)
+            self.metrics.observe('dispatch.handle', cost)
+        with self._cond:
+            s = self._stats.setdefault(key, [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += cost
+            s[2] = max(s[2], cost)
+            self._pending -= 1
+            if self._shards[key]:
+                self._ready.append(key)
+            else:
+                del self._shards[key]
+                self._scheduled.discard(key)
+            self._cond.notify_all()
+
+    def join(self, timeout=None) -> bool:
+        '''等积压的消息处理完，超时返回 False'''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while self._pending and not self._stopped:
+                left = None if deadline is None else deadline - time.perf_counter()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+            return not self._pending
+
+    def stop(self, timeout=5.0) -> None:
+        '''先尽量处理完积压，再停掉工作线程；正在处理的那条不会被打断'''
+        self.join(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=0.1)
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return self._pending
+
+    def depths(self) -> dict:
+        '''每个会话还没处理的消息数（不含正在处理的那条）'''
+        with self._cond:
+            return {key: len(q) for key, q in self._shards.items() if q}
+
+    def stats(self) -> dict:
+        '''每个会话的 {depth, handled, avg, max}，耗时单位为秒'''
+        with self._cond:
+            return {
+                key: {
+                    'depth': len(self._shards.get(key, ())),
+                    'handled': s[0],
+                    'avg': s[1] / s[0] if s[0] else 0.0,
+                    'max': s[2],
+                }
+                for key, s in self._stats.items()
+            }
+
+    def report(self, top: int = 5) -> str:
+        stats = self.stats()
+        lines = [f'积压 {self.pending} 条，{self.workers} 个线程，{len(stats)} 个会话处理过消息']
+        for key, s in sorted(stats.items(), key=lambda kv: (kv[1]['depth'], kv[1]['max']), reverse=True)[:top]:
+            lines.append(f'{key}: depth={s["depth"]} n={s["handled"]} avg={s["avg"] * 1000:.1f}ms max={s["max"] * 1000:.1f}ms')
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import random
+    import threading
+
+    # 假 Wcf：send_text 按固定耗时阻塞（相当于 UI 排队 + 键入），记下每个会话收到的回复顺序；
+    # 对比逐条分发和分片分发的总耗时，并核对每个会话内的顺序
+    class FakeWcf:
+        def __init__(self, cost):
+            self.cost = cost
+            self.sent = {}
+            self.lock = threading.Lock()
+
+        def send_text(self, text, receiver):
+            time.sleep(self.cost)
+            with self.lock:
+                self.sent.setdefault(receiver, []).append(text)
+
+    class Msg:
+        def __init__(self, chat, seq):
+            self.chat = chat
+            self.seq = seq
+
+    def run(workers, batch, cost=0.02):
+        wcf = FakeWcf(cost)
+        handle = lambda msg: wcf.send_text(msg.seq, msg.chat)
+        start = time.perf_counter()
+        if workers <= 0:
+            for msgs in batch.values():
+                for msg in msgs:
+                    handle(msg)
+        else:
+            d = ShardedDispatcher(handle, workers=workers).start()
+            d.submit_batch(batch)
+            d.stop(timeout=60)
+        cost = time.perf_counter() - start
+        for chat, msgs in batch.items():
+            assert wcf.sent.get(chat) == [m.seq for m in msgs], chat
+        return cost
+
+    rng = random.Random(0)
+    chats = [f'会话{i}' for i in range(20)]
+    batch = {}
+    for seq in range(200):
+        chat = rng.choice(chats)
+        batch.setdefault(chat, []).append(Msg(chat, seq))
+    for workers in (0, 1, 4, 8, 16):
+        label = '逐条分发' if workers <= 0 else f'{workers} 个线程'
+        print(f'{label}：200 条消息 / 20 个会话，耗时 {run(workers, batch):.2f}s，会话内顺序一致')
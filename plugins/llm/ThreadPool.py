@@ -27,6 +27,8 @@ class ThreadPool:
         self._idx_lock = threading.Lock()
         self._response_lock = threading.Lock()
         self.msg_queues = {friend: MsgQueue(memory_len) for friend in friend_names}
+        self.config = config
+        self.memory_len = memory_len
         other_config = (config or {}).get('other', {}) or {}
         try:
             self.request_timeout = float(other_config.get('request_timeout', 30))
@@ -41,28 +43,55 @@ class ThreadPool:
             return self.thread_idx
 
     def _run_model(self, idx, sender):
+        queue, model = self.msg_queues.get(sender), self.models.get(sender)
+        if queue is None or model is None:
+            # 请求发出后好友被删掉了，不再有回复
+            return
         prompt_type = self.user_sys_prompt_type.get(sender, 'None')
-        msgs = self.msg_queues[sender].content(type=prompt_type)
-        response = self.models[sender].sending_list(msgs)
+        msgs = queue.content(type=prompt_type)
+        response = model.sending_list(msgs)
         with self._response_lock:
             if idx in self.threads:
                 self.model_response[idx] = response
 
-    def add_msg(self, sender, msg):
-        self.msg_queues[sender].put(msg)
+    def add_friend(self, friend, provider_name):
+        if friend in self.models:
+            return
+        self.msg_queues[friend] = MsgQueue(self.memory_len)
+        self.models[friend] = API(config=self.config, provider_name=provider_name)
+
+    def remove_friend(self, friend):
+        self.models.pop(friend, None)
+        self.msg_queues.pop(friend, None)
+
+    def add_msg(self, sender, msg) -> bool:
+        '''好友可能在请求进行中被删掉（通讯录后台刷新），这时丢掉这条消息，返回 False'''
+        queue = self.msg_queues.get(sender)
+        if queue is None:
+            print(f'{sender} 已不在好友列表中，丢弃这条消息')
+            return False
+        queue.put(msg)
+        return True
 
     def clear(self, reloader):
-        self.msg_queues[reloader].clear()
+        queue = self.msg_queues.get(reloader)
+        if queue is not None:
+            queue.clear()
 
     def send_msg(self, msg, sender):
         '''
         创建发送这个 msg 的线程
 
         :param: msg, sender
-        :return: 这个 msg 对应的编号
+        :return: 这个 msg 对应的编号，sender 不在好友列表中时返回 None
         '''
-        self.add_msg(sender, msg)
-        self.msg_queues[sender].check_len()
+        # 只查一次队列：两次查找之间好友可能被通讯录刷新线程删掉
+        queue = self.msg_queues.get(sender)
+        if queue is None:
+            print(f'{sender} 已不在好友列表中，丢弃这条消息')
+            return None
+        queue.put(msg)
+        queue.check_len()
         idx = self._get_idx()
         thread = threading.Thread(target=self._run_model, args=(idx, sender), daemon=True)
         thread.start()
@@ -2,18 +2,19 @@
 from queue import Queue, Empty
 import os
 import sys
+import traceback
 from pathlib import Path
 import yaml
 
 try:
     from .ThreadPool import ThreadPool
-    from .sys_prompt import is_call
+    from .sys_prompt import is_call, Keywords
 except ImportError:
     CURRENT_DIR = Path(__file__).resolve().parent
     if str(CURRENT_DIR) not in sys.path:
         sys.path.insert(0, str(CURRENT_DIR))
     from ThreadPool import ThreadPool
-    from sys_prompt import is_call
+    from sys_prompt import is_call, Keywords
 
 
 class Plugin:
@@ -22,7 +23,7 @@ class Plugin:
 
     def init(self):
         plugin_root = Path(__file__).resolve().parent
-        self.config = self.load_yaml(plugin_root / 'config' / 'config.yaml')
+        self.config = self.state.plugin_config('llm', plugin_root / 'config' / 'config.yaml')
         self.user_sys_prompt_type = {name: 'zhu' for name in self.state.friend_names}
         self.characters = [
             'fu',
@@ -43,6 +44,7 @@ class Plugin:
         all_providers = providers_config
         self.available_providers = [name for name, value in all_providers.items()]
         self.rcv_queue = Queue()
+        self.unloaded = False
         self.threadpool = ThreadPool(
             friend_names=self.state.friend_names,
             user_providers=self.user_providers,
@@ -52,6 +54,11 @@ class Plugin:
         )
         thread_checker = threading.Thread(target=self.check_msg_receive, daemon=True)
         thread_checker.start()
+        self.state.wcf.subscribe_contacts(self.on_contacts_changed)
+        # 上面读 friend_names 到订阅之间可能刚好刷新完一次通讯录，订阅后按最新名单补一次
+        names = set(self.state.friend_names)
+        known = set(self.threadpool.models)
+        self.on_contacts_changed(names - known, known - names)
 
         self.help_doc = '''【帮助文档】
 
@@ -95,13 +102,32 @@ fg 表示下在f行g列的位置
 “加密 key content”
 注意key只能是数字，空格不可以少
     '''
-
+        self.state.wcf.add_hot_text(self.help_doc)
+        # 群聊里只有 @ 或者叫到人格名字才会回话，让 Wcf 看预览时就能跳过无关的群
+        self.state.wcf.set_triage(keywords=[kw for c in self.characters for kw in Keywords(c)])
+
+
+    def unload(self):
+        # 热重载换下旧实例：不再接收好友变化，后台线程处理完已经收下的消息后退出
+        self.unloaded = True
+        self.state.wcf.unsubscribe_contacts(self.on_contacts_changed)
+
+    def on_contacts_changed(self, added, removed):
+        # 好友列表在后台刷新后有增删，按好友建立的结构跟着同步
+        for name in added:
+            self.user_sys_prompt_type.setdefault(name, 'zhu')
+            self.user_providers.setdefault(name, self.default_provider)
+            self.threadpool.add_friend(name, self.user_providers[name])
+        for name in removed:
+            self.threadpool.remove_friend(name)
+            self.user_sys_prompt_type.pop(name, None)
+            self.user_providers.pop(name, None)
 
     def is_for_me(self, msg, is_default=False) -> bool:
         if msg is None or msg.type != 0 or not isinstance(msg.content, str):
             return False
 
-        if msg.sender in set(self.state.group.get('commander', [])) and self._is_control_command(msg.content):
+        if msg.sender in self.state.role_members('commander') and self._is_control_command(msg.content):
             return True
 
         if is_default:
@@ -119,7 +145,7 @@ fg 表示下在f行g列的位置
         return False
 
     def handle_msg(self, msg):
-        if msg.sender in set(self.state.group.get('commander', [])) and self._handle_control_command(msg):
+        if msg.sender in self.state.role_members('commander') and self._handle_control_command(msg):
             return
 
         input_message = {
@@ -127,6 +153,8 @@ fg 表示下在f行g列的位置
             'content': msg.content,
         }
         idx = self.threadpool.send_msg(input_message, msg.sender)
+        if idx is None:
+            return
         self.rcv_queue.put((idx, msg))
 
     def _is_control_command(self, content: str) -> bool:
@@ -144,43 +172,43 @@ fg 表示下在f行g列的位置
 
         if '重置' in content:
             self.threadpool.clear(sender)
-            self.send(msg, '重置成功')
+            self.send(msg, '重置成功', urgent=True)
             return True
 
         if content == '查看人格':
             character = self.user_sys_prompt_type.get(sender, 'zhu')
-            self.send(msg, f'您当前的人格为：{character}')
+            self.send(msg, f'您当前的人格为：{character}', urgent=True)
             return True
 
         if content == '查看模型':
             provider = self.user_providers.get(sender, self.default_provider)
-            self.send(msg, f'您当前的模型为：{provider}')
+            self.send(msg, f'您当前的模型为：{provider}', urgent=True)
             return True
 
         if content.startswith('change'):
             if content.startswith('change model ') and len(content) >= 14:
                 to = content[13:]
                 if to in self.available_providers:
-                    self.send(msg, '更改为: ' + to + ' 模型')
+                    self.send(msg, '更改为: ' + to + ' 模型', urgent=True)
                     self.user_providers[sender] = to
                     self.threadpool.models[sender].provider_name = to
                     self.threadpool.models[sender].init()
                 else:
-                    self.send(msg, '模型无效')
+                    self.send(msg, '模型无效', urgent=True)
                 return True
 
             to = content[7:]
             if to in self.characters:
                 self.threadpool.clear(sender)
-                self.send(msg, '更改为: ' + to + ' 人格')
+                self.send(msg, '更改为: ' + to + ' 人格', urgent=True)
                 self.user_sys_prompt_type[sender] = to
                 self.threadpool.models[sender].sys_prompt_type = to
             else:
-                self.send(msg, '人格无效')
+                self.send(msg, '人格无效', urgent=True)
             return True
 
         if content == '查看帮助文档':
-            self.send(msg, self.help_doc)
+            self.send(msg, self.help_doc, urgent=True)
             return True
 
         return False
@@ -191,13 +219,15 @@ fg 表示下在f行g列的位置
             try:
                 idx, msg = self.rcv_queue.get(timeout=1)
             except Empty:
+                if self.unloaded:
+                    return
                 continue
             print('\n正在处理信息...')
 
             sender = msg.sender
             roomid = msg.roomid
             is_room = msg.from_group()
-            commanders = self.state.group.get('commander', [])
+            commanders = self.state.role_members('commander')
 
             def send_response():
                 response = self.threadpool.get_response(idx)
@@ -221,27 +251,31 @@ fg 表示下在f行g列的位置
                 self.send(msg, response)
                 return 0
 
-            if is_room and sender in commanders:
-                # 来自群消息
-                send_response()
-            elif sender in commanders:
-                # 其次考察是否是 commander 们发来的消息
-                send_response()
+            # 单条回复出错不能让这个线程退出，否则之后所有回复都发不出去
+            try:
+                if is_room and sender in commanders:
+                    # 来自群消息
+                    send_response()
+                elif sender in commanders:
+                    # 其次考察是否是 commander 们发来的消息
+                    send_response()
+            except Exception as e:
+                print(f'回复 {sender} 时出错：{e}')
+                traceback.print_exc()
 
-    def at_sb(self, room_name, name, str):
-        text = '@' + name + ' ' + str
-        self.state.wcf.send_text(text, room_name)
+    def at_sb(self, room_name, name, str, urgent=False):
+        self.state.wcf.send_text(str, room_name, urgent=urgent, at=name)
 
     def is_msg_at_sb(self, content, name):
         if not content:
             return False
         return content.startswith('@' + name)
 
-    def send(self, msg, str):
+    def send(self, msg, str, urgent=False):
         if msg.from_group():
-            self.at_sb(msg.roomid, msg.sender, str)
+            self.at_sb(msg.roomid, msg.sender, str, urgent=urgent)
         else:
-            self.state.wcf.send_text(str, msg.sender)
+            self.state.wcf.send_text(str, msg.sender, urgent=urgent)
 
     def ZIP(self, content: str) -> str:
         s = content.replace('\n', '')
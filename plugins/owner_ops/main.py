@@ -13,8 +13,7 @@ class Plugin:
     def is_for_me(self, msg) -> bool:
         if msg is None or msg.type != 0 or not isinstance(msg.content, str):
             return False
-        owner = (self.state.group.get('owner') or [None])[0] # 用列表了，允许添加多个候选 owner
-        if msg.sender != owner:
+        if msg.sender not in self.state.role_members('owner'): # 用列表了，允许添加多个候选 owner，只认第一个
             return False
         content = msg.content
         return (
@@ -37,7 +36,7 @@ class Plugin:
         owner = (self.state.group.get('owner') or [None])[0]
 
         if content == '我要去喝果茶了':
-            self.state.wcf.send_text('拜拜咯', receiver)
+            self.state.wcf.send_text('拜拜咯', receiver, urgent=True)
             self.state.stop_requested = True
             return
 
@@ -46,37 +45,38 @@ class Plugin:
         if content.startswith('change all model'):
             to = content[17:]
             if llm_plugin is None:
-                self.state.wcf.send_text('模型无效', receiver)
+                self.state.wcf.send_text('模型无效', receiver, urgent=True)
                 return
             if to in llm_plugin.available_providers:
-                for wxid in self.state.friend_names:
+                # 以 llm 自己的模型表为准：通讯录刷新时 state.friend_names 会先于它更新
+                for wxid, model in list(llm_plugin.threadpool.models.items()):
                     llm_plugin.user_providers[wxid] = to
-                    llm_plugin.threadpool.models[wxid].provider_name = to
-                    llm_plugin.threadpool.models[wxid].init()
-                self.state.wcf.send_text('全部更改为: ' + to + ' 模型', receiver)
+                    model.provider_name = to
+                    model.init()
+                self.state.wcf.send_text('全部更改为: ' + to + ' 模型', receiver, urgent=True)
             else:
-                self.state.wcf.send_text('模型无效', receiver)
+                self.state.wcf.send_text('模型无效', receiver, urgent=True)
             return
 
         if content.startswith('change all'):
             to = content[11:]
             if llm_plugin is None:
-                self.state.wcf.send_text('人格无效', receiver)
+                self.state.wcf.send_text('人格无效', receiver, urgent=True)
                 return
             if to in llm_plugin.characters:
-                for wxid in self.state.friend_names:
+                for wxid, model in list(llm_plugin.threadpool.models.items()):
                     llm_plugin.threadpool.clear(wxid)
                     llm_plugin.user_sys_prompt_type[wxid] = to
-                    llm_plugin.threadpool.models[wxid].sys_prompt_type = to
-                self.state.wcf.send_text('全部更改为: ' + to + ' 人格', receiver)
+                    model.sys_prompt_type = to
+                self.state.wcf.send_text('全部更改为: ' + to + ' 人格', receiver, urgent=True)
             else:
-                self.state.wcf.send_text('人格无效', receiver)
+                self.state.wcf.send_text('人格无效', receiver, urgent=True)
             return
 
         if content.startswith('need '):
             file_path = content[5:]
             target = msg.roomid if msg.from_group() else owner
-            res = self.state.wcf.send_image(file_path, target)
+            res = self.state.wcf.send_image(file_path, target, urgent=True)
             print(f'发送文件，结果为：{res}')
             if res:
                 print(f'发送文件错误，错误码：{res}\n')
@@ -91,10 +91,11 @@ class Plugin:
             else:
                 for person in person_list:
                     if person in commander:
-                        self.state.wcf.send_text(f'管理员{person}已经存在', receiver)
+                        self.state.wcf.send_text(f'管理员{person}已经存在', receiver, urgent=True)
                     else:
                         commander.append(person)
-            self.state.wcf.send_text('添加完毕', receiver)
+            self.state.invalidate_roles()
+            self.state.wcf.send_text('添加完毕', receiver, urgent=True)
             return
 
         if '删除管理员' in content:
@@ -107,12 +108,13 @@ class Plugin:
             else:
                 for person in person_list:
                     if person not in commander:
-                        self.state.wcf.send_text(f'管理员{person}不存在', receiver)
+                        self.state.wcf.send_text(f'管理员{person}不存在', receiver, urgent=True)
                     else:
                         commander.remove(person)
-            self.state.wcf.send_text('删除完毕', receiver)
+            self.state.invalidate_roles()
+            self.state.wcf.send_text('删除完毕', receiver, urgent=True)
             return
 
         if content == '查看管理员':
             people = '、'.join(commander)
-            self.state.wcf.send_text(f'管理员有：{people}', receiver)
+            self.state.wcf.send_text(f'管理员有：{people}', receiver, urgent=True)
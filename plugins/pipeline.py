@@ -1,10 +1,24 @@
 import importlib.util
 import inspect
+import threading
+import time
 import traceback
+from concurrent.futures import Future, wait
 from pathlib import Path
 
+import yaml
+
+try:
+    from . import aio
+except ImportError:
+    import aio
+
 
 PLUGINS_DIR = Path(__file__).resolve().parent
+MANIFEST_NAME = 'manifest.yaml'
+manifests = {}      # 插件名 -> manifest
+import_times = {}   # 插件名 -> 导入 + 实例化的耗时（秒）
+init_times = {}     # 插件名 -> bind_plugins + init 的耗时（秒）
 REQUIRED_METHODS = ('init', 'is_for_me', 'handle_msg')
 REQUIRED_ARGS = {
     'init': 0,
@@ -44,13 +58,15 @@ def _build_plugin_instance(main_py: Path, state):
 
     print(
         f'[Plugin 检测] {main_py.parent.name}: '
-        f'init{inspect.signature(plugin.init)} | '
-        f'is_for_me{inspect.signature(plugin.is_for_me)} | '
-        f'handle_msg{inspect.signature(plugin.handle_msg)}'
+        + ' | '.join(_describe(method_name, getattr(plugin, method_name)) for method_name in REQUIRED_METHODS)
     )
     return plugin
 
 
+def _describe(method_name, method) -> str:
+    return ('async ' if aio.is_async(method) else '') + f'{method_name}{inspect.signature(method)}'
+
+
 def _method_accepts_args(method, arg_count: int) -> bool:
     sig = inspect.signature(method)
     min_pos = 0
@@ -61,6 +77,9 @@ def _method_accepts_args(method, arg_count: int) -> bool:
         if param.kind == inspect.Parameter.VAR_POSITIONAL:
             has_var_pos = True
             continue
+        if param.kind == inspect.Parameter.KEYWORD_ONLY and param.default is inspect._empty:
+            # 管线只按位置传参，没有默认值的仅关键字参数永远调用不了
+            return False
         if param.kind not in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD):
             continue
         max_pos += 1
@@ -74,16 +93,156 @@ def _method_accepts_args(method, arg_count: int) -> bool:
     return True
 
 
+def load_manifest(plugin_dir: Path) -> dict:
+    '''
+    plugins/<name>/manifest.yaml：eager（启动时就加载，默认 true）、depends（先加载哪些插件）、
+    triggers（同 plugins/router.py，插件还没导入时就能路由）；没有 manifest 时按立即加载处理
+    '''
+    path = plugin_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            manifest = yaml.safe_load(file) or {}
+    except Exception as e:
+        print(f'[Plugin 警告] {plugin_dir.name}/{MANIFEST_NAME} 读取失败，按立即加载处理：{e}')
+        return {}
+    if not isinstance(manifest, dict):
+        print(f'[Plugin 警告] {plugin_dir.name}/{MANIFEST_NAME} 应该是字典，将忽略')
+        return {}
+    return manifest
+
+
+class LazyPlugin:
+    '''
+    还没导入的插件：放在 plugins 字典里占位，triggers 来自 manifest。
+    第一次需要它时（触发词命中、别的插件访问它的属性、后台预热）才导入、bind_plugins、init，之后所有属性转给真正的实例。
+    自己的字段都带下划线，避免挡住插件实例的同名属性
+    '''
+
+    def __init__(self, name, state, manifest: dict):
+        self._name = name
+        self._state = state
+        self._manifest = manifest
+        self._plugins = {}
+        self._target = None
+        self._failed = False
+        self._replaced = None  # 热重载换下这个占位后指向新的插件，还没加载的旧占位不再自己加载
+        self._lock = threading.RLock()  # 加载和热重载替换都拿这把锁
+        self.triggers = manifest.get('triggers')
+
+    @property
+    def loaded(self) -> bool:
+        return self._target is not None
+
+    def load(self):
+        '''
+        导入并初始化，返回真正的实例；失败返回 None（只试一次）。
+        在共享事件循环的线程里（异步插件的协程里）第一次访问时抛出 aio.LoopThreadError，
+        不算失败：init 可能是 async def，要在事件循环里跑完才能返回，在这个线程里同步等会死锁
+        '''
+        if self._target is not None or self._failed:
+            return self._target
+        if aio.in_loop_thread():
+            raise aio.LoopThreadError(f'插件 {self._name} 还没加载，不能在事件循环线程里加载，请用 await aio.run_sync(resolve, plugin)')
+        with self._lock:
+            if self._target is not None or self._failed:
+                return self._target
+            if self._replaced is not None:
+                return resolve(self._replaced)
+            for dep in self._manifest.get('depends') or []:
+                other = self._plugins.get(dep)
+                if isinstance(other, LazyPlugin) and other is not self:
+                    other.load()
+            try:
+                plugin = build_plugin(self._name, self._state, self._manifest)
+                if plugin is None:
+                    self._failed = True
+                    return None
+                start_plugin(self._name, plugin, self._plugins)
+            except Exception as e:
+                self._failed = True
+                print(f'[Plugin 错误] {self._name}: {e}')
+                traceback.print_exc()
+                return None
+            self._target = plugin
+            print(
+                f'[Plugin 加载] {self._name}（延迟加载，导入 {import_times[self._name] * 1000:.0f}ms，'
+                f'init {init_times[self._name] * 1000:.0f}ms）'
+            )
+            return plugin
+
+    def __getattr__(self, attr):
+        # 只有实例上没有的属性才会走到这里，也就是插件自己的方法和状态
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        target = self.load()
+        if target is None:
+            raise AttributeError(f'插件 {self._name} 加载失败，没有 {attr}')
+        return getattr(target, attr)
+
+
+def build_plugin(name, state, manifest: dict):
+    '''导入 plugins/<name>/main.py 并实例化（还没 bind_plugins / init），耗时记进 import_times；不满足契约返回 None'''
+    start = time.perf_counter()
+    plugin = _build_plugin_instance(PLUGINS_DIR / name / 'main.py', state)
+    import_times[name] = time.perf_counter() - start
+    # 插件类没有自己声明 triggers 时用 manifest 里的
+    if plugin is not None and manifest.get('triggers') is not None and getattr(plugin, 'triggers', None) is None:
+        plugin.triggers = manifest['triggers']
+    return plugin
+
+
+def start_plugin(name, plugin, plugins) -> None:
+    '''单个插件的 bind_plugins + init（async def init 在共享事件循环里跑完），耗时记进 init_times'''
+    start = time.perf_counter()
+    bind_plugins = getattr(plugin, 'bind_plugins', None)
+    if callable(bind_plugins):
+        bind_plugins(plugins)
+    aio.call(plugin.init)
+    init_times[name] = time.perf_counter() - start
+
+
+def resolve(plugin):
+    '''LazyPlugin 换成真正的实例（必要时当场加载），加载失败返回 None'''
+    return plugin.load() if isinstance(plugin, LazyPlugin) else plugin
+
+
+def _eager_names(manifests: dict) -> set:
+    # 立即加载的插件依赖的插件也要立即加载
+    eager = {name for name, m in manifests.items() if m.get('eager', True)}
+    todo = list(eager)
+    while todo:
+        for dep in manifests.get(todo.pop(), {}).get('depends') or []:
+            if dep in manifests and dep not in eager:
+                eager.add(dep)
+                todo.append(dep)
+    return eager
+
+
 def load_plugins(state):
-    plugins = {}
+    '''
+    立即加载的插件导入并实例化，其余的放 LazyPlugin 占位；返回的字典按目录名排序，也就是分发优先级。
+    每个插件的导入耗时记在 import_times 里，由 report_plugin_times 打印
+    '''
+    manifests.clear()
     for main_py in sorted(PLUGINS_DIR.glob('*/main.py')):
         plugin_name = main_py.parent.name
         plugin_usable = getattr(state, 'plugin_usable', None)
         if isinstance(plugin_usable, dict) and plugin_usable.get(plugin_name) is False:
             print(f'[Plugin 禁用] {plugin_name}')
             continue
+        manifests[plugin_name] = load_manifest(main_py.parent)
+    eager = _eager_names(manifests)
+
+    plugins = {}
+    for plugin_name, manifest in manifests.items():
+        if plugin_name not in eager:
+            plugins[plugin_name] = LazyPlugin(plugin_name, state, manifest)
+            print(f'[Plugin 延迟] {plugin_name}')
+            continue
         try:
-            plugin = _build_plugin_instance(main_py, state)
+            plugin = build_plugin(plugin_name, state, manifest)
             if plugin is not None:
                 plugins[plugin_name] = plugin
                 print(f'[Plugin 加载] {plugin_name}')
@@ -93,23 +252,135 @@ def load_plugins(state):
     return plugins
 
 
+def _init_order(plugins) -> list:
+    # 被依赖的先 init；依赖关系里有环时按原顺序兜底
+    order, seen = [], set()
+
+    def visit(name, path=()):
+        if name in seen or name not in plugins or name in path:
+            return
+        for dep in manifests.get(name, {}).get('depends') or []:
+            visit(dep, path + (name,))
+        seen.add(name)
+        order.append(name)
+
+    for name in plugins:
+        visit(name)
+    return order
+
+
 def init_plugins(plugins):
     for plugin in plugins.values():
+        if isinstance(plugin, LazyPlugin):
+            # 延迟加载的插件记下最终的插件字典，加载时再 bind_plugins
+            plugin._plugins = plugins
+            continue
         bind_plugins = getattr(plugin, 'bind_plugins', None)
         if callable(bind_plugins):
             bind_plugins(plugins)
 
-    for plugin in plugins.values():
-        plugin.init()
+    for name in _init_order(plugins):
+        plugin = plugins[name]
+        if isinstance(plugin, LazyPlugin):
+            continue
+        # async def init 在共享事件循环里跑完再初始化下一个
+        start = time.perf_counter()
+        aio.call(plugin.init)
+        init_times[name] = time.perf_counter() - start
+
 
+def warm_up(plugins, delay: float = 0.0) -> threading.Thread:
+    '''后台线程依次加载还没加载的插件，先到的消息仍然会当场加载它需要的插件'''
+    def run():
+        if delay > 0:
+            time.sleep(delay)
+        start = time.perf_counter()
+        lazy = [p for p in plugins.values() if isinstance(p, LazyPlugin) and not p.loaded]
+        for plugin in lazy:
+            plugin.load()
+        if lazy:
+            print(f'[Plugin 预热] {len(lazy)} 个延迟加载的插件已就绪，耗时 {time.perf_counter() - start:.2f}s')
 
-def dispatch_msg(msg, plugins):
-    for plugin_name, plugin in plugins.items():
+    thread = threading.Thread(target=run, name='PluginWarmUp', daemon=True)
+    thread.start()
+    return thread
+
+
+def report_plugin_times(plugins) -> str:
+    lines = []
+    for name, plugin in plugins.items():
+        if isinstance(plugin, LazyPlugin) and not plugin.loaded:
+            lines.append(f'{name}: 延迟加载')
+            continue
+        lines.append(
+            f'{name}: 导入 {import_times.get(name, 0.0) * 1000:.0f}ms，init {init_times.get(name, 0.0) * 1000:.0f}ms'
+        )
+    return '\n'.join(lines)
+
+
+def _report_async_error(plugin_name, future):
+    if future.cancelled():
+        return
+    e = future.exception()
+    if e is not None:
+        print(f'[Plugin 执行错误] {plugin_name}: {e}')
+        traceback.print_exception(type(e), e, e.__traceback__)
+
+
+def dispatch_msg(msg, plugins, router=None):
+    '''
+    返回 True / False 表示有没有插件接管；接管的插件 handle_msg 是 async def 时返回它在共享事件循环里的 Future，
+    调用方据此决定要不要等它处理完（同一会话的下一条消息要等）
+    '''
+    # 有 router 时只看触发词命中的插件和没声明触发词的插件，顺序不变
+    candidates = router.route(msg) if router is not None else ((name, plugin, False) for name, plugin in plugins.items())
+    for plugin_name, plugin, checked in candidates:
         try:
-            if plugin.is_for_me(msg):
+            # 延迟加载的插件第一次被路由到时才导入
+            plugin = resolve(plugin)
+            if plugin is None:
+                continue
+            if checked or aio.call(plugin.is_for_me, msg):
+                if aio.is_async(plugin.handle_msg):
+                    future = aio.get_loop().submit(plugin.handle_msg(msg))
+                    future.add_done_callback(lambda f, name=plugin_name: _report_async_error(name, f))
+                    return future
                 plugin.handle_msg(msg)
                 return True
         except Exception as e:
             print(f'[Plugin 执行错误] {plugin_name}: {e}')
             traceback.print_exc()
     return False
+
+
+def dispatch_one(msg, plugins, default=None, router=None):
+    '''分发一条消息，没有插件接管时交给 default(msg)；返回值同 dispatch_msg'''
+    handled = dispatch_msg(msg, plugins, router=router)
+    if handled:
+        return handled
+    if default is not None:
+        try:
+            default(msg)
+        except Exception as e:
+            print(f'[默认处理错误] {e}')
+            traceback.print_exc()
+    return False
+
+
+def dispatch_msgs(batch, plugins, default=None, router=None):
+    '''
+    batch 为 {chat_name: [WxMsg...]}，逐会话按顺序分发；
+    没有插件接管的消息立刻交给 default(msg)（保持与后续消息的先后顺序），并作为返回值；
+    router 为 plugins.router.build_router(plugins, state) 编译出的触发词索引。
+    需要不同会话并行处理时用 plugins.dispatcher.ShardedDispatcher
+    '''
+    unhandled = []
+    for msgs in batch.values():
+        for msg in msgs:
+            handled = dispatch_one(msg, plugins, default=default, router=router)
+            if isinstance(handled, Future):
+                # 逐条分发时等异步插件处理完，保持会话内的顺序
+                wait([handled])
+            elif not handled:
+                unhandled.append(msg)
+    return unhandled
@@ -0,0 +1,188 @@
+'''
+插件热重载：后台线程盯着 plugins/<name>/ 下的 .py / .yaml，文件的修改时间变了且内容哈希确实不同，
+就只重新导入这个插件的模块，新实例 bind_plugins + init 成功后替换进插件字典，不用重启机器人、
+不用重新连接微信和抓通讯录。正在处理的消息继续用旧实例处理完；新版本加载失败时保留旧实例。
+'''
+import contextlib
+import hashlib
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+try:
+    from . import aio
+    from .pipeline import PLUGINS_DIR, LazyPlugin, build_plugin, load_manifest, manifests, start_plugin
+except ImportError:
+    import aio
+    from pipeline import PLUGINS_DIR, LazyPlugin, build_plugin, load_manifest, manifests, start_plugin
+
+
+WATCH_SUFFIXES = ('.py', '.yaml', '.yml')
+
+
+def _file_hash(path: Path) -> str:
+    try:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+    except OSError:
+        return ''
+
+
+def _purge_modules(name) -> int:
+    '''从 sys.modules 里去掉这个插件目录下的模块（包括 ThreadPool 这类子模块），下次 import 时重新执行'''
+    plugin_dir = (PLUGINS_DIR / name).resolve()
+    prefix = f'plugins.{name}.'
+    dropped = 0
+    for mod_name, module in list(sys.modules.items()):
+        file = getattr(module, '__file__', None)
+        inside = False
+        if file:
+            try:
+                inside = Path(file).resolve().is_relative_to(plugin_dir)
+            except (OSError, ValueError):
+                inside = False
+        if mod_name.startswith(prefix) or inside:
+            sys.modules.pop(mod_name, None)
+            dropped += 1
+    return dropped
+
+
+class PluginReloader:
+    '''
+    每隔 interval 秒比较一次各插件目录的文件修改时间；变化后再等一轮确认不再变（编辑器可能分几次写完），
+    然后比较内容哈希，只是 touch 过的不重载。
+    router 为 plugins.router.Router，替换插件后重建触发词索引；metrics 记录 plugin.reload 耗时
+    '''
+
+    def __init__(self, plugins: dict, state, router=None, interval: float = 1.0, metrics=None):
+        self.plugins = plugins
+        self.state = state
+        self.router = router
+        self.interval = max(0.1, float(interval))
+        self.metrics = metrics
+        self._mtimes = {}   # 插件名 -> {路径: mtime_ns}
+        self._hashes = {}   # 路径 -> 内容哈希
+        self._pending = {}  # 插件名 -> 上一轮看到的新 mtimes
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _scan(self, name) -> dict:
+        files = {}
+        for path in (PLUGINS_DIR / name).rglob('*'):
+            if path.suffix not in WATCH_SUFFIXES or '__pycache__' in path.parts:
+                continue
+            try:
+                files[str(path)] = path.stat().st_mtime_ns
+            except OSError:
+                continue
+        return files
+
+    def start(self):
+        for name in list(self.plugins):
+            self._mtimes[name] = self._scan(name)
+            for path in self._mtimes[name]:
+                self._hashes[path] = _file_hash(Path(path))
+        self._thread = threading.Thread(target=self._run, name='PluginReloader', daemon=True)
+        self._thread.start()
+        print(f'[Plugin 热重载] 监视 {len(self._mtimes)} 个插件目录，间隔 {self.interval:g}s')
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f'[Plugin 热重载] 检查出错：{e}')
+                traceback.print_exc()
+
+    def poll(self) -> list:
+        '''检查一轮，返回这轮重载了的插件名'''
+        reloaded = []
+        for name in list(self.plugins):
+            mtimes = self._scan(name)
+            if mtimes == self._mtimes.get(name):
+                self._pending.pop(name, None)
+                continue
+            if self._pending.get(name) != mtimes:
+                self._pending[name] = mtimes
+                continue
+            del self._pending[name]
+            old = self._mtimes.get(name, {})
+            changed = []
+            for path in set(old) | set(mtimes):
+                if old.get(path) == mtimes.get(path):
+                    continue
+                digest = _file_hash(Path(path)) if path in mtimes else ''
+                if digest != self._hashes.get(path, ''):
+                    changed.append(path)
+                if digest:
+                    self._hashes[path] = digest
+                else:
+                    self._hashes.pop(path, None)
+            self._mtimes[name] = mtimes
+            if changed:
+                files = ', '.join(sorted(Path(p).relative_to(PLUGINS_DIR / name).as_posix() for p in changed))
+                print(f'[Plugin 热重载] {name} 有改动：{files}')
+                if self.reload(name):
+                    reloaded.append(name)
+        return reloaded
+
+    def reload(self, name) -> bool:
+        '''
+        重新导入并初始化 name，成功后替换进插件字典；失败时旧实例继续服务。
+        旧的是延迟加载的占位时，整个替换和 unload 都拿着它的加载锁，不会和第一次加载同时进行
+        '''
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(self._lock)
+            old = self.plugins.get(name)
+            if isinstance(old, LazyPlugin):
+                # 先拿重载锁再拿加载锁；LazyPlugin.load 不会反过来拿重载锁，不会死锁
+                stack.enter_context(old._lock)
+            start = time.perf_counter()
+            manifest = load_manifest(PLUGINS_DIR / name)
+            try:
+                _purge_modules(name)
+                if isinstance(old, LazyPlugin) and not old.loaded:
+                    # 还没加载过，换一个读了新 manifest 的占位就行
+                    new = LazyPlugin(name, self.state, manifest)
+                    new._plugins = self.plugins
+                else:
+                    new = build_plugin(name, self.state, manifest)
+                    if new is None:
+                        print(f'[Plugin 重载失败] {name}：新版本不满足插件契约，继续使用旧版本')
+                        return False
+                    start_plugin(name, new, self.plugins)
+            except Exception as e:
+                print(f'[Plugin 重载失败] {name}：{e}，继续使用旧版本')
+                traceback.print_exc()
+                return False
+
+            manifests[name] = manifest
+            # 字典里单个键的赋值是原子的：已经拿到旧实例的消息在旧实例上处理完，之后的消息路由到新实例
+            self.plugins[name] = new
+            if self.router is not None:
+                self.router.rebuild(self.plugins)
+            cost = time.perf_counter() - start
+
+            if isinstance(old, LazyPlugin):
+                # 拿着旧占位、正等这把锁的线程醒来后转到新插件，不会再加载一遍旧版本
+                old._replaced = new
+                previous = old._target
+            else:
+                previous = old
+            unload = getattr(previous, 'unload', None)
+            if callable(unload):
+                try:
+                    aio.call(unload)
+                except Exception as e:
+                    print(f'[Plugin 重载] {name} 旧实例 unload 出错：{e}')
+                    traceback.print_exc()
+        if self.metrics is not None:
+            self.metrics.observe('plugin.reload', cost)
+        print(f'[Plugin 重载] {name} 完成，耗时 {cost * 1000:.0f}ms')
+        return True
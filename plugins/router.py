@@ -0,0 +1,286 @@
+'''
+触发词路由：插件声明 triggers，加载时编译成一份索引，一条消息走一遍就得到候选插件，
+不再对每条消息挨个调用所有插件的 is_for_me。
+
+triggers 写在插件的 manifest.yaml 里，或者是插件的属性（类属性或在 init 里赋值），例如：
+
+    triggers = {
+        'types': [0],                 # 消息类型，不写表示不限
+        'roles': ['commander'],       # 发送者所在的权限组（state.group 的键），不写表示不限
+        'exact': ['查看人格'],         # 内容完全相等
+        'prefix': ['change'],         # 内容以此开头
+        'contains': ['重置'],          # 内容包含
+        'strip': True,                # 先去掉首尾空白再匹配
+    }
+
+exact / prefix / contains 都不写时，只要类型和权限组符合就算命中。
+没有 triggers 的插件照旧每条消息调用 is_for_me。
+'''
+from collections import deque
+
+
+TEXT_KEYS = ('exact', 'prefix', 'contains')
+
+
+class _TextIndex:
+    '''exact 用哈希表，prefix 用字典树，contains 用 Aho-Corasick 自动机；匹配结果是插件位掩码'''
+
+    def __init__(self):
+        self.exact = {}
+        self.trie = {}          # 字符 -> 子节点；子节点里键 None 存该前缀的掩码
+        self.goto = [{}]        # Aho-Corasick：状态 -> {字符: 状态}
+        self.fail = [0]
+        self.out = [0]
+        self.any = 0            # 有 exact / prefix / contains 的插件
+
+    def add(self, bit, spec):
+        for text in spec.get('exact') or ():
+            self.exact[text] = self.exact.get(text, 0) | bit
+        for text in spec.get('prefix') or ():
+            node = self.trie
+            for ch in text:
+                node = node.setdefault(ch, {})
+            node[None] = node.get(None, 0) | bit
+        for text in spec.get('contains') or ():
+            s = 0
+            for ch in text:
+                nxt = self.goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(0)
+                    self.goto[s][ch] = nxt
+                s = nxt
+            self.out[s] |= bit
+        self.any |= bit
+
+    def build(self):
+        # 按层建失败指针，输出沿失败指针合并，匹配时每个字符只查一次
+        queue = deque(self.goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, t in self.goto[s].items():
+                f = self.fail[s]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                nxt = self.goto[f].get(ch, 0)
+                self.fail[t] = nxt if nxt != t else 0
+                self.out[t] |= self.out[self.fail[t]]
+                queue.append(t)
+        # 空串前缀 / 空串包含：任何内容都命中
+        self.always = self.trie.get(None, 0) | self.out[0]
+        return self
+
+    def match(self, content: str) -> int:
+        mask = self.always | self.exact.get(content, 0)
+        node = self.trie
+        for ch in content:
+            node = node.get(ch)
+            if node is None:
+                break
+            mask |= node.get(None, 0)
+        if len(self.goto) > 1:
+            goto, fail, out = self.goto, self.fail, self.out
+            s = 0
+            for ch in content:
+                while s and ch not in goto[s]:
+                    s = fail[s]
+                s = goto[s].get(ch, 0)
+                mask |= out[s]
+        return mask
+
+
+class _Compiled:
+    '''一份编译好的索引；重建时整个换掉，正在路由的消息继续用旧的'''
+
+    def __init__(self, plugins: dict):
+        self.entries = list(plugins.items())
+        self.raw = _TextIndex()
+        self.stripped = _TextIndex()
+        self.fallback = 0       # 没有 triggers 的插件
+        self.untyped = 0        # 不限类型
+        self.by_type = {}
+        self.unrestricted = 0   # 不限权限组
+        self.by_role = {}
+        self.textless = 0       # 只看类型 / 权限组
+        for i, (name, plugin) in enumerate(self.entries):
+            bit = 1 << i
+            spec = getattr(plugin, 'triggers', None)
+            if not isinstance(spec, dict):
+                self.fallback |= bit
+                continue
+            unknown = set(spec) - set(TEXT_KEYS) - {'types', 'roles', 'strip'}
+            if unknown:
+                print(f'[Router 警告] {name}.triggers 有未知的键：{sorted(unknown)}，将忽略')
+            types = spec.get('types')
+            if types:
+                for t in types:
+                    self.by_type[t] = self.by_type.get(t, 0) | bit
+            else:
+                self.untyped |= bit
+            roles = spec.get('roles')
+            if roles:
+                for r in roles:
+                    self.by_role[r] = self.by_role.get(r, 0) | bit
+            else:
+                self.unrestricted |= bit
+            if any(spec.get(k) for k in TEXT_KEYS):
+                (self.stripped if spec.get('strip') else self.raw).add(bit, spec)
+            else:
+                self.textless |= bit
+        self.raw.build()
+        self.stripped.build()
+        self.text = self.raw.any | self.stripped.any
+
+
+class Router:
+    '''
+    plugins 为 {name: plugin}（按分发优先级排好序），roles_of(sender) 返回发送者所在的权限组。
+    route(msg) 按插件顺序给出 (name, plugin, checked)：checked 为 True 表示触发词已经确认，
+    False 表示这个插件没有声明 triggers，还要调用 is_for_me。
+    插件被替换（热重载）后调用 rebuild(plugins)。
+    '''
+
+    def __init__(self, plugins: dict, roles_of=None):
+        self.roles_of = roles_of or (lambda sender: ())
+        self._c = _Compiled(plugins)
+
+    @property
+    def entries(self):
+        return self._c.entries
+
+    def rebuild(self, plugins: dict) -> None:
+        self._c = _Compiled(plugins)
+
+    def candidates(self, msg, c=None) -> int:
+        '''触发词命中的插件掩码（不含 fallback）'''
+        c = c or self._c
+        mask = c.untyped | c.by_type.get(msg.type, 0)
+        allowed = c.unrestricted
+        if mask & ~allowed:
+            for r in self.roles_of(msg.sender):
+                allowed |= c.by_role.get(r, 0)
+        mask &= allowed
+        hit = mask & c.textless
+        if mask & c.text:
+            # 图片等大块内容是引用，不为了匹配去读盘
+            content = msg.content if msg.content_ref is None else None
+            if isinstance(content, str):
+                if mask & c.raw.any:
+                    hit |= c.raw.match(content)
+                if mask & c.stripped.any:
+                    hit |= c.stripped.match(content.strip())
+        return mask & hit
+
+    def route(self, msg):
+        c = self._c
+        mask = self.candidates(msg, c)
+        todo = mask | c.fallback
+        i = 0
+        while todo:
+            if todo & 1:
+                name, plugin = c.entries[i]
+                yield name, plugin, bool(mask >> i & 1)
+            todo >>= 1
+            i += 1
+
+
+def build_router(plugins: dict, state=None) -> Router:
+    router = Router(plugins, roles_of=getattr(state, 'roles_of', None))
+    routed = [name for name, plugin in router.entries if isinstance(getattr(plugin, 'triggers', None), dict)]
+    print(f'[Router] {len(routed)}/{len(router.entries)} 个插件声明了触发词：{", ".join(routed) or "无"}')
+    return router
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    # 合成 60 个插件：一半只写 is_for_me（逐个 startswith / in / ==），一半在此基础上声明同样的 triggers，
+    # 比较逐个调用 is_for_me 和编译后的索引在每条消息上的路由开销，并核对两者选中的插件一致
+    class Msg:
+        __slots__ = ('type', 'sender', 'content', 'content_ref')
+
+        def __init__(self, type, sender, content):
+            self.type = type
+            self.sender = sender
+            self.content = content
+            self.content_ref = None
+
+    GROUP = {'owner': ['老板'], 'commander': ['老板'] + [f'管理{i}号' for i in range(30)]}
+
+    def roles_of(sender):
+        return [r for r, members in GROUP.items() if sender in members]
+
+    class LinearPlugin:
+        def __init__(self, i, rng):
+            self.i = i
+            self.exact = [f'指令{i}-{k}' for k in range(3)]
+            self.prefix = [f'cmd{i}_{k} ' for k in range(2)]
+            self.contains = [f'关键{i}词{k}' for k in range(3)]
+            self.role = rng.choice([None, 'commander', 'owner'])
+
+        def is_for_me(self, msg):
+            if msg.type != 0 or not isinstance(msg.content, str):
+                return False
+            if self.role is not None and msg.sender not in set(GROUP.get(self.role, [])):
+                return False
+            content = msg.content
+            return (
+                any(content == s for s in self.exact)
+                or any(content.startswith(s) for s in self.prefix)
+                or any(s in content for s in self.contains)
+            )
+
+        def handle_msg(self, msg):
+            pass
+
+    class TriggerPlugin(LinearPlugin):
+        def __init__(self, i, rng):
+            super().__init__(i, rng)
+            self.triggers = {'types': [0], 'exact': self.exact, 'prefix': self.prefix, 'contains': self.contains}
+            if self.role is not None:
+                self.triggers['roles'] = [self.role]
+
+    N = 60
+    rng = random.Random(0)
+    linear = {f'p{i:02d}': LinearPlugin(i, rng) for i in range(N)}
+    rng = random.Random(0)
+    routed = {f'p{i:02d}': TriggerPlugin(i, rng) for i in range(N)}
+    router = Router(routed, roles_of=roles_of)
+
+    senders = ['老板', '管理3号', '管理17号', '路人甲', '路人乙']
+    msgs = []
+    for _ in range(20000):
+        r = rng.random()
+        i = rng.randrange(N)
+        if r < 0.05:
+            content = f'指令{i}-{rng.randrange(3)}'
+        elif r < 0.1:
+            content = f'cmd{i}_{rng.randrange(2)} 参数'
+        elif r < 0.15:
+            content = f'随便说点什么 关键{i}词{rng.randrange(3)} 然后呢'
+        else:
+            content = '今天天气不错，' * rng.randint(1, 6)
+        msgs.append(Msg(0 if rng.random() < 0.9 else 1, rng.choice(senders), content))
+
+    def first_linear(msg):
+        for name, plugin in linear.items():
+            if plugin.is_for_me(msg):
+                return name
+        return None
+
+    def first_routed(msg):
+        for name, plugin, checked in router.route(msg):
+            if checked or plugin.is_for_me(msg):
+                return name
+        return None
+
+    assert [first_linear(m) for m in msgs] == [first_routed(m) for m in msgs]
+
+    for label, fn in (('逐个 is_for_me', first_linear), ('编译索引', first_routed)):
+        start = time.perf_counter()
+        hits = sum(fn(m) is not None for m in msgs)
+        cost = time.perf_counter() - start
+        print(f'{label}：{N} 个插件，{len(msgs)} 条消息，命中 {hits} 条，每条 {cost / len(msgs) * 1e6:.1f}us')
@@ -0,0 +1,358 @@
+'''
+端到端压测：模拟微信（Wcf/backend/simulator.py）+ 本地假的 chat-completions 服务，
+跑真实的 WechatBot 主循环、plugins.pipeline 分发和 llm / owner_ops / commander_ops 插件，
+统计从消息到达到回复发出的延迟（p50 / p95 / p99）、没等到的回复和吞吐，结果写成 JSON 方便回归对比。
+每条注入的消息都要送达主循环恰好一次：没开分诊（--triage）时有任何一条没送达或重复送达，退出码为 1；
+开了分诊时跳过 / 延后的会话会少送达，对照 triage.skip / triage.defer 看。
+
+    python tools/bench_e2e.py --friends 50 --groups 10 --duration 60 --rate 3 --out bench_e2e.json
+    python tools/bench_e2e.py --trace my_trace.jsonl   # 回放录下来的对话，一行一个事件
+
+事件格式：{"t": 到达时刻（秒）, "chat": 会话名, "sender": 发送者, "content": 内容, "group": 是否群聊, "reply": 是否应该回复}
+'''
+import argparse
+import collections
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import utils as U
+from Wcf.backend import RealClock, VirtualClock
+from Wcf.backend.simulator import WeChatSim, SimBackend
+
+
+TAG = re.compile(r'#(\d+)')
+DECORATE_MARK = '语言风格大师'  # Wcf.decorate_text 的系统提示词里有这几个字
+OWNER_COMMAND = '查看管理员'
+
+
+class MockLLM:
+    '''本地假的 chat-completions 服务：润色请求原样返回，对话请求回复“收到 #编号”，每个请求等 latency ± jitter 秒'''
+
+    def __init__(self, latency=0.5, jitter=0.2, seed=0):
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.rng = random.Random(seed)
+        self.counts = {'chat': 0, 'decorate': 0}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def answer(self, messages) -> str:
+        decorate = any(m.get('role') == 'system' and DECORATE_MARK in (m.get('content') or '') for m in messages)
+        last = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+        with self.lock:
+            self.counts['decorate' if decorate else 'chat'] += 1
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        if decorate:
+            return last
+        m = TAG.search(last)
+        return f'收到 #{m.group(1)}' if m else '收到'
+
+    def start(self) -> str:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                text = mock.answer(body.get('messages') or [])
+                data = json.dumps({
+                    'id': 'chatcmpl-mock',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': body.get('model', 'mock'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+                }, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='MockLLM', daemon=True).start()
+        return f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def make_trace(friends, groups, *, wx_name, owner, commanders, duration, rate, group_share=0.5,
+               burst=(3, 8), at_share=0.3, command_share=0.03, seed=0) -> list:
+    '''
+    合成对话：私聊单条到达，群聊成串到达（burst 条，间隔零点几秒），夹杂 owner 的指令。
+    commander 私聊、commander 在群里 @ 机器人、owner 指令应该收到回复，其余只是负载。
+    '''
+    rng = random.Random(seed)
+    mean = group_share * (burst[0] + burst[1]) / 2 + (1 - group_share)
+    trace = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate / mean)
+        if t >= duration:
+            break
+        r = rng.random()
+        if r < command_share:
+            trace.append({'t': t, 'chat': owner, 'sender': owner, 'content': OWNER_COMMAND, 'group': False, 'reply': True})
+        elif r < command_share + group_share:
+            g = rng.choice(groups)
+            at = t
+            for _ in range(rng.randint(*burst)):
+                sender = rng.choice(friends[:20])
+                call = sender in commanders and rng.random() < at_share
+                content = (f'@{wx_name} 问个问题' if call else '闲聊') + f' #{len(trace)}'
+                trace.append({'t': at, 'chat': g, 'sender': sender, 'content': content, 'group': True, 'reply': call})
+                at += rng.uniform(0.1, 1.5)
+        else:
+            f = rng.choice(friends)
+            trace.append({'t': t, 'chat': f, 'sender': f, 'content': f'你好 #{len(trace)}', 'group': False,
+                          'reply': f in commanders})
+    trace.sort(key=lambda e: e['t'])
+    return trace
+
+
+def percentile(samples, q) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def run(args) -> dict:
+    wx_name = 'hihi'
+    # 名字不能以数字结尾，否则和“N条新消息”连在一起分不开
+    friends = [f'好友{i:02d}号' for i in range(args.friends)]
+    groups = [f'第{i}群' for i in range(args.groups)]
+    owner = friends[0]
+    commanders = friends[:args.commanders]
+    if args.trace:
+        trace = [json.loads(line) for line in Path(args.trace).read_text(encoding='utf-8').splitlines() if line.strip()]
+    else:
+        trace = make_trace(friends, groups, wx_name=wx_name, owner=owner, commanders=commanders,
+                           duration=args.duration, rate=args.rate, seed=args.seed)
+    if args.save_trace:
+        Path(args.save_trace).write_text(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in trace), encoding='utf-8')
+
+    mock = MockLLM(args.llm_latency, args.llm_jitter, seed=args.seed)
+    url = mock.start()
+    tmp = Path(tempfile.mkdtemp())
+
+    # State 在导入时读配置，所以先写好全局配置再导入 WechatBot
+    cfg = U.load_yaml(ROOT / 'config' / 'config-template.yaml')
+    cfg.update(group={'owner': [owner], 'commander': list(commanders)}, disabled_plugins=[],
+               metrics_report_interval=0, msg_batch_size=args.batch, dispatch_workers=args.workers)
+    (tmp / 'config.yaml').write_text(json.dumps(cfg, ensure_ascii=False), encoding='utf-8')
+    os.environ['WECHATBOT_CONFIG'] = str(tmp / 'config.yaml')
+    import WechatBot
+    from State import state
+
+    wcf_cfg = U.load_yaml(ROOT / 'Wcf' / 'config' / 'config-template.yaml')
+    wcf_cfg.update(wx_name=wx_name, ui_backend='sim', random_seed=args.seed, receive_mode='adaptive',
+                   contacts_cache=str(tmp / 'contacts.json'), enable_image_parse=False)
+    wcf_cfg['triage'] = dict(wcf_cfg.get('triage') or {}, enable=args.triage)
+    wcf_cfg['llm'] = {'provider': {'api_key': 'mock', 'url': url, 'model': 'mock'}, 'request_timeout': 10}
+    llm_cfg = U.load_yaml(ROOT / 'plugins' / 'llm' / 'config' / 'config-template.yaml')
+    llm_cfg['api']['providers'] = {'mock': {'url': url, 'api_key': 'mock', 'model': 'mock'}}
+    llm_cfg['other'].update(default_provider='mock', default_model='mock')
+
+    clock = VirtualClock(time.time()) if args.pacing == 'virtual' else RealClock()
+    sim = WeChatSim(wx_name, wcf_cfg['default_chat_name'], clock=clock)
+    for f in friends:
+        sim.add_friend(f)
+    for g in groups:
+        sim.add_group(g, friends[:20] + [wx_name])
+    state.wcf_options = {'backend': SimBackend(sim), 'config': wcf_cfg}
+    state.plugin_configs['llm'] = llm_cfg
+
+    # 回复按消息里的编号对应；没有编号的（owner 指令）按会话先进先出
+    lock = threading.Lock()
+    arrived = {}     # 事件序号 -> 到达时刻
+    replied = {}     # 事件序号 -> 回复时刻
+    untagged = {}    # 会话 -> [等回复的事件序号]
+    stray = []
+    tagged = {}
+    for i, e in enumerate(trace):
+        if e['reply']:
+            m = TAG.search(e['content'])
+            if m:
+                tagged[int(m.group(1))] = i
+
+    def on_send(chat, content):
+        now = time.perf_counter()
+        with lock:
+            m = TAG.search(content)
+            i = tagged.get(int(m.group(1))) if m else None
+            if i is None and untagged.get(chat):
+                i = untagged[chat].pop(0)
+            if i is None or i in replied or i not in arrived:
+                stray.append(content)
+                return
+            replied[i] = now
+    sim.on_send.append(on_send)
+
+    # 送达主循环的消息按 (会话, 内容) 计数，和注入的逐条核对；内容里有编号，只有 owner 指令会重复
+    injected = collections.Counter((e['chat'], e['content']) for e in trace)
+    delivered = collections.Counter()
+
+    # 在类上包一层：主循环启动后第一次取消息就要算上
+    from Wcf import Wcf
+    get_msgs = Wcf.get_msgs
+
+    def watch_delivery(self, *a, **kw):
+        batch = get_msgs(self, *a, **kw)
+        with lock:
+            for chat, msgs in batch.items():
+                delivered.update((chat, m.content) for m in msgs)
+        return batch
+    Wcf.get_msgs = watch_delivery
+
+    out = open(os.devnull, 'w', encoding='utf-8') if not args.verbose else sys.stdout
+    with contextlib.redirect_stdout(out):
+        bot = threading.Thread(target=WechatBot.main, name='WechatBotMain', daemon=True)
+        bot.start()
+        deadline = time.perf_counter() + 60
+        while getattr(getattr(state, 'wcf', None), 'recv_thread', None) is None:
+            if time.perf_counter() > deadline or not bot.is_alive():
+                raise RuntimeError('WechatBot 没能启动')
+            time.sleep(0.05)
+
+        stop_ticking = threading.Event()
+        if args.pacing == 'virtual':
+            # 虚拟时间跟着墙钟走，拟人停顿额外往前拨；分诊延后、兜底扫描这些计时仍然按真实的时间流逝
+            def tick():
+                last = time.perf_counter()
+                while not stop_ticking.wait(0.05):
+                    now = time.perf_counter()
+                    clock.advance(now - last)
+                    last = now
+            threading.Thread(target=tick, daemon=True).start()
+
+        expected = [i for i, e in enumerate(trace) if e['reply']]
+        start = time.perf_counter()
+        slept = clock.slept
+        for i, e in enumerate(trace):
+            delay = start + e['t'] / args.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with lock:
+                arrived[i] = time.perf_counter()
+                if e['reply'] and not TAG.search(e['content']):
+                    untagged.setdefault(e['chat'], []).append(i)
+            sim.receive(e['chat'], e['sender'] if e['group'] else None, e['content'])
+        inject_end = time.perf_counter()
+
+        drain = inject_end + args.drain
+        while time.perf_counter() < drain:
+            with lock:
+                if all(i in replied for i in expected) and (args.triage or not injected - delivered):
+                    break
+            time.sleep(0.05)
+        end = time.perf_counter()
+        state.stop_requested = True
+        bot.join(timeout=5)
+        stop_ticking.set()
+        state.wcf.ui.stop()
+        mock.stop()
+
+    latency = sorted(replied[i] - arrived[i] for i in expected if i in replied)
+    wcf = state.wcf
+    undelivered = injected - delivered
+    duplicated = delivered - injected
+    return {
+        'config': vars(args),
+        'injected': len(trace),
+        'delivered': wcf.metrics.count('recv.delivered'),
+        'undelivered': [{'chat': chat, 'content': content, 'count': n} for (chat, content), n in undelivered.items()],
+        'duplicated': [{'chat': chat, 'content': content, 'count': n} for (chat, content), n in duplicated.items()],
+        'triage': {k: wcf.metrics.count(f'triage.{k}') for k in ('open', 'skip', 'defer')},
+        'expected_replies': len(expected),
+        'replied': len(latency),
+        'dropped': len(expected) - len(latency),
+        'missing': [trace[i] for i in expected if i not in replied],
+        'stray_sends': len(stray),
+        'latency': {
+            'p50': percentile(latency, 0.50),
+            'p95': percentile(latency, 0.95),
+            'p99': percentile(latency, 0.99),
+            'max': latency[-1] if latency else 0.0,
+            'mean': sum(latency) / len(latency) if latency else 0.0,
+        },
+        'throughput': {
+            'injected_per_s': len(trace) / max(1e-9, inject_end - start),
+            'delivered_per_s': wcf.metrics.count('recv.delivered') / max(1e-9, end - start),
+            'replies_per_s': len(sim.sent) / max(1e-9, end - start),
+        },
+        'llm_requests': dict(mock.counts),
+        'sent': len(sim.sent),
+        'modeled_ui_time': clock.slept - slept,
+        'pauses': clock.pauses(),
+        'wall': end - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WechatBot 端到端压测')
+    parser.add_argument('--friends', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--commanders', type=int, default=10, help='前几个好友是 commander（第一个同时是 owner）')
+    parser.add_argument('--duration', type=float, default=60, help='合成对话的时长（秒）')
+    parser.add_argument('--rate', type=float, default=3, help='平均每秒到达多少条消息')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速')
+    parser.add_argument('--trace', help='回放录下来的对话（JSONL），不再合成')
+    parser.add_argument('--save-trace', help='把这次用的对话存成 JSONL')
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--llm-jitter', type=float, default=0.2)
+    parser.add_argument('--pacing', choices=('virtual', 'real'), default='virtual',
+                        help='virtual：拟人停顿不真的等（只统计模拟耗时）；real：和真实环境一样等')
+    parser.add_argument('--batch', type=int, default=64, help='msg_batch_size')
+    parser.add_argument('--workers', type=int, default=4, help='dispatch_workers，0 表示主循环逐条分发')
+    parser.add_argument('--drain', type=float, default=30, help='注入完后最多再等多少秒回复和送达')
+    parser.add_argument('--triage', action='store_true', help='开启群聊预览分诊（默认关闭，和配置模板一致）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench_e2e.json')
+    parser.add_argument('--verbose', action='store_true', help='保留机器人自己的日志输出')
+    args = parser.parse_args()
+
+    res = run(args)
+    Path(args.out).write_text(json.dumps(res, ensure_ascii=False, indent=2), encoding='utf-8')
+    lat = res['latency']
+    print(f'注入 {res["injected"]} 条，送达主循环 {res["delivered"]} 条，应回复 {res["expected_replies"]} 条，'
+          f'回复 {res["replied"]} 条，丢失 {res["dropped"]} 条')
+    print(f'到达 -> 回复：p50={lat["p50"]:.2f}s p95={lat["p95"]:.2f}s p99={lat["p99"]:.2f}s max={lat["max"]:.2f}s')
+    tp = res['throughput']
+    print(f'吞吐：注入 {tp["injected_per_s"]:.1f} 条/秒，送达 {tp["delivered_per_s"]:.1f} 条/秒，发出 {tp["replies_per_s"]:.2f} 条/秒')
+    print(f'模型请求：{res["llm_requests"]}，拟人停顿的模拟耗时 {res["modeled_ui_time"]:.1f}s，墙钟 {res["wall"]:.1f}s')
+    print(f'结果已写入 {args.out}')
+
+    lost = sum(e['count'] for e in res['undelivered'])
+    extra = sum(e['count'] for e in res['duplicated'])
+    if args.triage:
+        print(f'分诊：{res["triage"]}，因此少送达 {lost} 条，重复送达 {extra} 条')
+    elif lost or extra:
+        print(f'没开分诊，却有 {lost} 条没送达、{extra} 条重复送达：')
+        for e in res['undelivered'] + res['duplicated']:
+            print(f'  {e["chat"]}: {e["content"]} x{e["count"]}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()